@@ -17,7 +17,14 @@ import re
 import textwrap
 from io import StringIO
 import base64
-import chardet
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from viewer_modules.column_search import build_search_index, search_columns
+from viewer_modules.column_catalog import build_column_catalog, role_cols, first_col, get_core_types, default_cols, axis_title
+from viewer_modules.range_stats import build_range_stats, range_summary, named_range_table, index_range_for_clock
+from viewer_modules.figure_cache import file_digest, figure_key, get_or_build
+from viewer_modules.derived_columns import derived_column, mw_channels, materialize_channels, attach_channels
+from viewer_modules.log_readers import read_csv_table
 st.set_page_config(layout="wide")
 
 top_col_right = st.columns([8, 1])
@@ -43,36 +50,9 @@ with top_col_right[1]:
 # ✅ 画像ファイルのパスを指定（アプリと同じディレクトリにある想定）
 
 # set_background("1938176.jpg")
+# 列の役割と数はプロファイルの default_plots["power"]
 def get_default_power_cols():
-    preferred = [
-        "TCPU_D0_Current Power(W)",
-        "TCPU_PL1 Limit(W)",
-        "TCPU_PL1 Min Power Limit(W)",
-        "TCPU_PL1 Max Power Limit(W)",
-        "TCPU_PL2 Limit(W)"
-    ]
-    # 列名の正規化：全体でstrip（空白削除）
-    cleaned_cols = {col.strip(): col for col in df.columns}
-    available = []
-    seen = set()
-    for name in preferred:
-        if name in cleaned_cols and cleaned_cols[name] not in seen:
-            available.append(cleaned_cols[name])
-            seen.add(cleaned_cols[name])
-
-    # 補完（重複防止付き）
-    if len(available) < 5:
-        extra = [
-            col for col in df.columns
-            if "(W)" in col and "power" in col.lower() and col not in seen
-        ]
-        for col in extra:
-            if len(available) >= 5:
-                break
-            available.append(col)
-            seen.add(col)
-
-    return available
+    return default_cols(catalog, "power")
 
 def sanitize_key(text: str) -> str:
     return re.sub(r'\W+', '_', text)
@@ -141,37 +121,83 @@ with st.sidebar.expander("1️⃣ Choose your csv file", expanded=True):
 
 @st.cache_data
 def load_csv(file_obj):
-    # UTF-8（最速）
-    try:
-        return pd.read_csv(file_obj, on_bad_lines='skip')
-    except UnicodeDecodeError:
-        pass
-
-    # Shift_JIS（日本語Windows対策）
-    file_obj.seek(0)
-    try:
-        return pd.read_csv(file_obj, encoding="shift_jis", on_bad_lines='skip')
-    except UnicodeDecodeError:
-        pass
+    # pyarrow（マルチスレッド）で読み、壊れた行があれば on_bad_lines='skip' で読み直す
+    # 文字コード（UTF-8 / Shift_JIS / CP949 ...）は先頭のバイトだけで1回判定（ファイル全体を何度も読み直さない）
+    return read_csv_table(file_obj, encoding_errors="replace")
+
+# ===== 列カタログ（列名の分類と検索インデックスはファイル毎に1回だけ） =====
+# 読み取り専用で使うので cache_resource（rerun毎のコピーを避ける）
+@st.cache_resource(show_spinner=False)
+def get_column_catalog(columns):
+    catalog = build_column_catalog(columns, "DTT")
+    catalog["search"] = build_search_index(catalog["columns"])
+    return catalog
+
+# ===== 派生列（EPP% など、変換結果はファイル毎に1回だけ計算して使い回す） =====
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_derived_cache(file_id):
+    return {}
+
+# ===== mW列の変換処理（(W)列はまとめて1ブロックで追加） =====
+df = load_csv(uploaded_file)
+derived_cache = get_derived_cache(uploaded_file.file_id)
+mw_cols = [col for col in role_cols(get_column_catalog(tuple(df.columns)), "mw") if df[col].dtype != "O"]
+df = attach_channels(df, materialize_channels(derived_cache, df, mw_channels(mw_cols)))
+
+# ===== 計算チャンネル（和・差・移動平均をユーザー定義） =====
+if "computed_channels" not in st.session_state:
+    st.session_state.computed_channels = []
+with st.sidebar.expander("🧮 Computed channels", expanded=False):
+    channel_source_cols = df.select_dtypes(include="number").columns.tolist()
+    channel_op = st.selectbox("Operation", ["sum", "diff", "rolling_mean"], key="channel_op")
+    channel_window = None
+    if channel_op == "sum":
+        channel_cols = st.multiselect("Columns (A + B + ...)", channel_source_cols, key="channel_sum_cols")
+    elif channel_op == "diff":
+        channel_cols = [
+            st.selectbox("A", channel_source_cols, key="channel_diff_a"),
+            st.selectbox("B (A - B)", channel_source_cols, key="channel_diff_b"),
+        ]
+    else:
+        channel_cols = [st.selectbox("Column", channel_source_cols, key="channel_rolling_col")]
+        channel_window = st.number_input("Window (samples)", min_value=1, value=30, step=1, key="channel_window")
+    channel_name = st.text_input("Channel name", value="", key="channel_name")
+
+    if st.button("➕ Add channel", key="add_channel"):
+        if not channel_name or channel_name in df.columns:
+            st.warning("Enter a new channel name")
+        elif channel_name in {c["name"] for c in st.session_state.computed_channels}:
+            st.warning(f"Channel '{channel_name}' already exists")
+        elif not channel_cols or None in channel_cols:
+            st.warning("Choose the source columns")
+        else:
+            channel = {"name": channel_name, "op": channel_op, "cols": list(channel_cols)}
+            if channel_window:
+                channel["window"] = int(channel_window)
+            st.session_state.computed_channels.append(channel)
+
+    for channel in st.session_state.computed_channels:
+        st.caption(f"{channel['name']} = {channel['op']}({', '.join(channel['cols'])})")
+    if st.session_state.computed_channels and st.button("🗑️ Clear channels", key="clear_channels"):
+        st.session_state.computed_channels = []
+        st.rerun()
 
-    # 最後の手段として chardet
-    file_obj.seek(0)
-    raw = file_obj.read(100_000)  # ✅ 全体ではなく先頭10万バイトだけに制限（高速化）
-    result = chardet.detect(raw)
-    encoding = result["encoding"]
+df = attach_channels(df, materialize_channels(derived_cache, df, st.session_state.computed_channels))
 
-    file_obj.seek(0)
-    return pd.read_csv(file_obj, encoding=encoding, on_bad_lines='skip')
+# (W)列を追加した後の列でカタログを確定
+catalog = get_column_catalog(tuple(df.columns))
 
-# ===== mW列の変換処理 =====
-df = load_csv(uploaded_file)
-for col in df.columns:
-    if "(mW)" in col and df[col].dtype != "O":
-        new_col = col.replace("(mW)", "(W)")
-        df[new_col] = df[col] / 1000
+# ===== ファイルハッシュ（図キャッシュのキー、ファイル毎に1回だけ計算） =====
+if st.session_state.get("file_hash_id") != uploaded_file.file_id:
+    st.session_state.file_hash = file_digest(uploaded_file.getvalue())
+    st.session_state.file_hash_id = uploaded_file.file_id
+file_hash = st.session_state.file_hash
+if "figure_cache" not in st.session_state:
+    st.session_state.figure_cache = {}
+figure_cache = st.session_state.figure_cache
 
 # ===== Time列の取得 =====
-time_col_candidates = [col for col in df.columns if "time" in col.lower()]
+time_col_candidates = role_cols(catalog, "time")
 if not time_col_candidates:
     st.error("Not found Time column.")
     st.stop()
@@ -184,10 +210,7 @@ except:
     time_vals = df[time_col]
 
 # CPU温度の列を抽出（DTS形式に限定せず、TempやCPU+温度のような名前も対象に）
-temp_cols = [
-    col for col in df.columns
-    if "TCPU_D0_Temperature(C)" in col or re.match(r"SEN\d+_D0_Temperature\(C\)", col)
-]
+temp_cols = role_cols(catalog, "cpu_temp")
 
 # ===== デフォルト縦軸列取得関数 =====
 
@@ -200,14 +223,14 @@ def reset_secondary_y_cols():
 if file != previous_file:
     reset_selected_y_cols()
     reset_secondary_y_cols()
+    st.session_state.named_ranges = []
     st.session_state.last_selected_file = file
 elif "selected_y_cols" not in st.session_state:
     reset_selected_y_cols()
 # ===== 第一縦軸列選択（ExpanderでまとめてUI整理） =====
-df_unique_columns = pd.Index(dict.fromkeys(df.columns))
 with st.sidebar.expander("2️⃣ Setting for 1st Y-axis column", expanded=True):
     search_query = st.text_input("Searching (Y-axis)", value="Power", key="primary_search_input")
-    y_axis_candidates = [col for col in df_unique_columns if search_query.lower() in col.lower() and col != time_col]
+    y_axis_candidates = search_columns(catalog["search"], search_query, exclude=(time_col,))
 
     if "selected_y_cols" not in st.session_state:
         st.session_state.selected_y_cols = get_default_power_cols()
@@ -303,7 +326,7 @@ with st.sidebar.expander("4️⃣ 2nd Y-axis setting", expanded=True):
 
         st.markdown("**Search and attend 2nd Y-axis column**")
         y2_search = st.text_input("Searching（2nd Y-axis）", value="Temp", key="y2_search")
-        y2_candidates = [col for col in df.columns if y2_search.lower() in col.lower() and col != time_col]
+        y2_candidates = search_columns(catalog["search"], y2_search, exclude=(time_col,))
 
         if "secondary_y_cols" not in st.session_state:
             st.session_state.secondary_y_cols = []
@@ -328,14 +351,8 @@ with st.sidebar.expander("4️⃣ 2nd Y-axis setting", expanded=True):
             key="y2_remove"
         )
         st.session_state.secondary_y_cols = y2_remove_cols
-# Powerlimit用の列（tabs[1]でも使っている同じ列セット）
-power_cols = [
-    "TCPU_D0_Current Power(W)", "TCPU_D1_Current Power(W)", "TCPU_D2_Current Power(W)",
-    "TCPU_PL1 Limit(W)", "TCPU_PL1 Min Power Limit(W)", "TCPU_PL1 Max Power Limit(W)",
-    "TCPU_PL2 Limit(W)"
-]
-
-power_cols = [col for col in power_cols if col in df.columns]  # 実在列だけ抽出
+# Powerlimit用の列（tabs[1]でも使っている同じ列セット、プロファイルの default_plots["powerlimit"]）
+power_cols = default_cols(catalog, "powerlimit")  # 実在列だけ
 # colormap_name = st.session_state["colormap_name"]
 # colormap = cm.get_cmap(colormap_name)
 # plot_cols = list(dict.fromkeys(col for col in all_plot_cols if col in df.columns))
@@ -600,8 +617,8 @@ div.stDownloadButton > button:hover {
 </style>
 """, unsafe_allow_html=True)
 
-epp_col = next((col for col in df.columns if "epp" in col.lower()), None)
-os_power_col = next((col for col in df.columns if "os power slider" in col.lower()), None)
+epp_col = first_col(catalog, "epp")
+os_power_col = first_col(catalog, "mode")
 towrite = export_xlsx(df, selected_y_cols, time_vals, fig, temp_cols, power_cols, epp_col, os_power_col, secondary_y_cols, color_map_ui)
 
 xlsx_filename = file.replace(".csv", ".xlsx")
@@ -611,11 +628,19 @@ st.download_button(
     file_name=xlsx_filename,
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 )
+# ===== 選択範囲の統計（累積和テーブルはファイル毎に1回だけ作る） =====
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_range_stats(file_id, _df, _time_vals):
+    return build_range_stats(_df, _time_vals)
+
 # ==== 📏 平均値と垂線表示用 toggle（Expanderの代替） ====
 show_avg = st.toggle("📏 Show the average value of the selected range", value=False)
 
 
+if "named_ranges" not in st.session_state:
+    st.session_state.named_ranges = []
 if show_avg:
+    range_stats = get_range_stats(uploaded_file.file_id, df, time_vals)
     midpoint = len(df) // 2
     col1, col2, col3, col4 = st.columns([1, 1, 2, 2])
     with col1:
@@ -624,12 +649,53 @@ if show_avg:
         idx_end = st.number_input("End index", min_value=0, max_value=len(df)-1, value=midpoint, step=1, key="idx_end")
     with col3:
         available_avg_cols = st.session_state.selected_y_cols or df.select_dtypes(include='number').columns.tolist()
-        avg_target_col = st.selectbox("Target column", options=available_avg_cols, index=0, key="avg_col")
-
-    if idx_start < idx_end and avg_target_col in df.columns:
-        avg_val = df[avg_target_col].iloc[idx_start:idx_end+1].mean()
-        with col4:
-            st.success(f"📏 {avg_target_col} : {idx_start}〜{idx_end} Average: {avg_val:.2f}")
+        avg_target_cols = st.multiselect("Target columns", options=available_avg_cols, default=available_avg_cols[:1], key="avg_cols")
+
+    # 時刻指定（hh:mm:ss）で範囲を上書き
+    by_time = st.checkbox("Select the range by time (hh:mm:ss)", value=False, key="avg_by_time")
+    if by_time:
+        time_col1, time_col2 = st.columns(2)
+        with time_col1:
+            start_text = st.text_input("Start time", value=str(time_vals.iloc[idx_start]), key="avg_time_start")
+        with time_col2:
+            end_text = st.text_input("End time", value=str(time_vals.iloc[idx_end]), key="avg_time_end")
+        try:
+            time_range = index_range_for_clock(range_stats, start_text, end_text)
+        except ValueError:
+            time_range = None
+            st.warning("Time must be hh:mm:ss")
+        if time_range:
+            idx_start, idx_end = time_range
+
+    if idx_start < idx_end and avg_target_cols:
+        range_summary_df = range_summary(range_stats, avg_target_cols, idx_start, idx_end, role_cols(catalog, "power"))
+        if not range_summary_df.empty:
+            with col4:
+                first_row = range_summary_df.iloc[0]
+                st.success(f"📏 {first_row['Column']} : {idx_start}〜{idx_end} Average: {first_row['Mean']:.2f}")
+        st.dataframe(range_summary_df, hide_index=True, use_container_width=True)
+
+        # 名前付き範囲（例: PL1 steady / PL2 burst）を溜めて一覧・出力
+        name_col, add_col, clear_col = st.columns([3, 1, 1])
+        with name_col:
+            range_name = st.text_input("Range name", value=f"Range {len(st.session_state.named_ranges) + 1}", key="range_name")
+        with add_col:
+            if st.button("➕ Add range", key="add_named_range"):
+                st.session_state.named_ranges.append({"name": range_name, "start": int(idx_start), "end": int(idx_end)})
+        with clear_col:
+            if st.button("🗑️ Clear ranges", key="clear_named_ranges"):
+                st.session_state.named_ranges = []
+
+        if st.session_state.named_ranges:
+            named_df = named_range_table(range_stats, st.session_state.named_ranges, avg_target_cols, role_cols(catalog, "power"))
+            st.dataframe(named_df, hide_index=True, use_container_width=True)
+            st.download_button(
+                label="📥 Named ranges (CSV)",
+                data=named_df.to_csv(index=False).encode("utf-8-sig"),
+                file_name=file.replace(".csv", "_ranges.csv"),
+                mime="text/csv",
+                key="named_ranges_download"
+            )
 
         x_start = time_vals.iloc[idx_start] if hasattr(time_vals, "iloc") else time_vals[idx_start]
         x_end = time_vals.iloc[idx_end] if hasattr(time_vals, "iloc") else time_vals[idx_end]
@@ -873,10 +939,10 @@ tab_headers = {
     "EPP&Mode": ":battery: EPP & PowerMode",
 }
 
-# ==== ✅ タブのフォントサイズを大きくする ====
+# ==== ✅ タブ（ラジオ）のフォントサイズを大きくする ====
 st.markdown("""
 <style>
-button[data-baseweb="tab"] > div[data-testid="stMarkdownContainer"] > p {
+div[data-testid="stRadio"] label div[data-testid="stMarkdownContainer"] > p {
     font-size: 19px !important;
     font-weight: bold;
     text-align: center;
@@ -885,316 +951,321 @@ button[data-baseweb="tab"] > div[data-testid="stMarkdownContainer"] > p {
 """, unsafe_allow_html=True)
 
 # ==== タブ表示・タイトル表示 ====
-tabs = st.tabs(tab_labels)
-for i, tab in enumerate(tabs):
-    with tab:
-        st.session_state["tab_index"] = i
+# st.tabs は非表示のタブも毎回すべて実行されるため、選択中のタブだけを描画する
+active_tab = st.radio("Tab", tab_labels, horizontal=True, key="active_tab", label_visibility="collapsed")
+st.session_state["tab_index"] = tab_labels.index(active_tab)
+
+# ==== タブの図（トレース構成が同じならキャッシュ済みの図を再利用） ====
+def build_temp_figure(temp_cols):
+    fig_warnings = []
+    fig_temp = go.Figure()
+    temp_abnormal = False
+    for col in temp_cols:
+        fig_temp.add_trace(go.Scatter(
+            x=time_vals,
+            y=df[col],
+            mode='lines',
+            name=col,
+            line=dict(color=color_map_ui[col])
+        ))
+        if df[col].max() > 130:
+            temp_abnormal = True
+            fig_warnings.append(f" {col} over 130deg")
+
+    fig_temp.update_layout(
+        xaxis_title="Time",
+        yaxis_title=axis_title(catalog, "cpu_temp", "Temperature"),
+        height=600, 
+        width=1400,
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend=dict(x=1.05, y=1,font=dict(size=st.session_state.get("legend_font", 50)),traceorder="normal"),
+        font=dict(size=14),
+        xaxis=dict(
+            title=dict(text="Time", font=dict(size=18)),
+            tickfont=dict(size=16)
+            ),
+        yaxis=dict(
+            title=dict(text=axis_title(catalog, "cpu_temp", "Temperature"), font=dict(size=18)),
+            tickfont=dict(size=16),
+            range=[0, 130] if temp_abnormal else None
+            ),
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": True,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": False,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+    return fig_temp, fig_warnings
+
+
+def build_power_figure(plot_cols):
+    fig_warnings = []
+    fig_power = go.Figure()
+    power_abnormal = False
+
+    for col in plot_cols:
+        y_data = pd.to_numeric(df[col], errors="coerce")
+        fig_power.add_trace(go.Scatter(
+            x=time_vals,
+            y=y_data,
+            mode='lines',
+            name=col,
+            line=dict(color=color_map_ui[col])
+        ))
+        if (y_data < 0).any() or (y_data > 250).any():
+            power_abnormal = True
+            fig_warnings.append(f"{col} found below 0deg or over 250deg")
+
+    yaxis_range = [0, 100] if power_abnormal else None
+
+    fig_power.update_layout(
+        xaxis_title="Time",
+        yaxis_title="Power(W)",
+        height=600,
+        width=1400,
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 50)), traceorder="normal"),
+        font=dict(size=14),
+        xaxis=dict(
+            title=dict(text="Time", font=dict(size=18)),
+            tickfont=dict(size=16)
+        ),
+        yaxis=dict(
+            title=dict(text="Power(W)", font=dict(size=18)),
+            tickfont=dict(size=16),
+            range=yaxis_range
+        ),
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": True,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": False,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+    return fig_power, fig_warnings
+
+
+def build_epp_figure(epp_col, os_power_col):
+    os_power_labels = derived_column(derived_cache, df, "os_slider_label", os_power_col)
+    epp_values = derived_column(derived_cache, df, "epp_percent", epp_col)
+
+    fig_epp = go.Figure()
+
+    fig_epp.add_trace(go.Scatter(
+        x=time_vals,
+        y=epp_values,
+        mode="lines",
+        name=epp_col,
+        yaxis="y1",
+        line=dict(color="purple")
+    ))
+
+    fig_epp.add_trace(go.Scatter(
+        x=time_vals,
+        y=df[os_power_col],
+        mode="markers",
+        name="Power Mode",
+        yaxis="y2",
+        text=os_power_labels,
+        textposition="top center",
+        marker=dict(color="green", size=8)
+    ))
+
+    fig_epp.update_layout(
+        height=600,
+        width=1400,
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 50)), traceorder="normal"),
+        xaxis=dict(title="Time", tickfont=dict(size=18)),
+        yaxis=dict(
+        title=dict(text=epp_col, font=dict(size=18)),
+        tickfont=dict(size=16),
+        dtick=5,
+        gridcolor='rgba(200, 150, 255, 0.17)'
+        ),
+        yaxis2=dict(
+        title=dict(text="Power Mode", font=dict(size=18)),
+        tickfont=dict(size=16),
+        overlaying='y',
+        side='right',
+        showgrid=False,
+        tickmode='array',
+        tickvals=[25, 50, 75, 100],
+        ticktext=["Energy saver", "Best Power Efficiency", "Balanced", "Best Performance"],
+        tick0=0,
+        dtick=25          # 目盛間隔を1に
+        ),
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": True,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": False,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+    return fig_epp, []
+
 
 # ==== タブ処理 ====
-with tabs[0]:
+if active_tab == tab_labels[0]:
     st.markdown(f"## {tab_headers['CPU&sensors temp']}")
     for idx, col in enumerate(temp_cols):
         if col not in color_map_ui:
             color_map_ui[col] = get_color_hex(colormap, idx, len(temp_cols))
 
     if temp_cols:
-        fig_temp = go.Figure()
-        temp_abnormal = False
-        for col in temp_cols:
-            fig_temp.add_trace(go.Scatter(
-                x=time_vals,
-                y=df[col],
-                mode='lines',
-                name=col,
-                line=dict(color=color_map_ui[col])
-            ))
-            if df[col].max() > 130:
-                temp_abnormal = True
-                st.warning(f" {col} over 130deg", icon="⚠️")
-
-
-
-        fig_temp.update_layout(
-            xaxis_title="Time",
-            yaxis_title="Temperature (°C)",
-            height=600, 
-            width=1400,
-            margin=dict(l=40, r=40, t=40, b=40),
-            legend=dict(x=1.05, y=1,font=dict(size=st.session_state.get("legend_font", 50)),traceorder="normal"),
-            font=dict(size=14),
-            xaxis=dict(
-                title=dict(text="Time", font=dict(size=18)),
-                tickfont=dict(size=16)
-                ),
-            yaxis=dict(
-                title=dict(text="Temperature (°C)", font=dict(size=18)),
-                tickfont=dict(size=16),
-                range=[0, 130] if temp_abnormal else None
-                ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
+        fig_temp, fig_warnings = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "cpu_temp", temp_cols, [color_map_ui[col] for col in temp_cols], st.session_state.get("legend_font", 50)),
+            lambda: build_temp_figure(temp_cols)
         )
-
+        for message in fig_warnings:
+            st.warning(message, icon="⚠️")
         st.plotly_chart(fig_temp, use_container_width=True)
     else:
         st.info("No found")
 
 # === 追加: Powerlimitタブ ===
-with tabs[1]:
+if active_tab == tab_labels[1]:
     st.markdown(f"## {tab_headers['Powerlimit']}")
     for idx, col in enumerate(power_cols):
         if col not in color_map_ui:
             color_map_ui[col] = get_color_hex(colormap, idx, len(power_cols))
 
-    # 描画対象の明示的な列指定
-    target_cols = [
-        "TCPU_D0_Current Power(W)",
-        "TCPU_D1_Current Power(W)",
-        "TCPU_D2_Current Power(W)",
-        "TCPU_PL1 Limit(W)",
-        "TCPU_PL1 Min Power Limit(W)",
-        "TCPU_PL1 Max Power Limit(W)",
-        "TCPU_PL2 Limit(W)"
-    ]
-
-    # 存在する列だけ抽出（ファイルによっては存在しない列もあり得るため）
-    plot_cols = [col for col in target_cols if col in df.columns]
+    # 描画対象の列（ファイルに存在する列だけ）
+    plot_cols = power_cols
 
     if plot_cols:
-        fig_power = go.Figure()
-        power_abnormal = False
-
-        for col in plot_cols:
-            y_data = pd.to_numeric(df[col], errors="coerce")
-            fig_power.add_trace(go.Scatter(
-                x=time_vals,
-                y=y_data,
-                mode='lines',
-                name=col,
-                line=dict(color=color_map_ui[col])
-            ))
-            if (y_data < 0).any() or (y_data > 250).any():
-                power_abnormal = True
-                st.warning(f"{col} found below 0deg or over 250deg", icon="⚠️")
-
-        yaxis_range = [0, 100] if power_abnormal else None
-
-        fig_power.update_layout(
-            xaxis_title="Time",
-            yaxis_title="Power(W)",
-            height=600,
-            width=1400,
-            margin=dict(l=40, r=40, t=40, b=40),
-            legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 50)), traceorder="normal"),
-            font=dict(size=14),
-            xaxis=dict(
-                title=dict(text="Time", font=dict(size=18)),
-                tickfont=dict(size=16)
-            ),
-            yaxis=dict(
-                title=dict(text="Power(W)", font=dict(size=18)),
-                tickfont=dict(size=16),
-                range=yaxis_range
-            ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
+        fig_power, fig_warnings = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "powerlimit", plot_cols, [color_map_ui[col] for col in plot_cols], st.session_state.get("legend_font", 50)),
+            lambda: build_power_figure(plot_cols)
         )
-
+        for message in fig_warnings:
+            st.warning(message, icon="⚠️")
         st.plotly_chart(fig_power, use_container_width=True)
     else:
         st.info("No found")
 
 
-with tabs[2]:
+if active_tab == tab_labels[2]:
     st.markdown(f"## {tab_headers['EPP&Mode']}")
 
-    epp_col = next((col for col in df.columns if "epp" in col.lower()), None)
-    os_power_col = next((col for col in df.columns if "os power slider" in col.lower()), None)
-    if os_power_col:
-        mapping = {25: "Energy saver", 50: "Best Power Efficiency", 75: "Balanced", 100: "Best Performance"}
-        df[os_power_col + "_str"] = df[os_power_col].map(mapping)
-
-
-    if epp_col:
-        df[epp_col] = df[epp_col].apply(lambda x: round(x / 2.55) if pd.notnull(x) else x)
-
     if epp_col and os_power_col:
-        fig_epp = go.Figure()
-
-        fig_epp.add_trace(go.Scatter(
-            x=time_vals,
-            y=df[epp_col],
-            mode="lines",
-            name=epp_col,
-            yaxis="y1",
-            line=dict(color="purple")
-        ))
-
-        fig_epp.add_trace(go.Scatter(
-            x=time_vals,
-            y=df[os_power_col],
-            mode="markers",
-            name="Power Mode",
-            yaxis="y2",
-            text=df[os_power_col + "_str"],
-            textposition="top center",
-            marker=dict(color="green", size=8)
-        ))
-
-        fig_epp.update_layout(
-            height=600,
-            width=1400,
-            margin=dict(l=40, r=40, t=40, b=40),
-            legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 50)), traceorder="normal"),
-            xaxis=dict(title="Time", tickfont=dict(size=18)),
-            yaxis=dict(
-            title=dict(text=epp_col, font=dict(size=18)),
-            tickfont=dict(size=16),
-            dtick=5,
-            gridcolor='rgba(200, 150, 255, 0.17)'
-            ),
-            yaxis2=dict(
-            title=dict(text="Power Mode", font=dict(size=18)),
-            tickfont=dict(size=16),
-            overlaying='y',
-            side='right',
-            showgrid=False,
-            tickmode='array',
-            tickvals=[25, 50, 75, 100],
-            ticktext=["Energy saver", "Best Power Efficiency", "Balanced", "Best Performance"],
-            tick0=0,
-            dtick=25          # 目盛間隔を1に
-            ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
-    )
-
+        fig_epp, _ = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "epp", epp_col, os_power_col, st.session_state.get("legend_font", 50)),
+            lambda: build_epp_figure(epp_col, os_power_col)
+        )
         st.plotly_chart(fig_epp, use_container_width=True)
 
     else:
         st.warning("No found")
 
 # ===== CoreType表示（段組＋カラーマップ対応）を成功風UIで表示 =====
-core_type_map = {}
-for col in df.columns:
-    if "core type" in col.lower():
-        core_id = col.split("-")[0]
-        core_type = df[col].iloc[0]
-        core_type_map[core_id] = core_type
+core_type_map = get_core_types(catalog, df)
 
 if core_type_map:
     grouped = {}
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from io import BytesIO, StringIO
+from io import BytesIO
 import plotly.graph_objects as go # type: ignore
 import plotly.express as px
 from plotly.subplots import make_subplots
@@ -12,6 +12,14 @@ import matplotlib.pyplot as plt
 import matplotlib as mpl
 import matplotlib.colors as mcolors  # mcolorsをインポート
 from streamlit_tags import st_tags  # 必要に応じてインポート
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from viewer_modules.derived_columns import materialize_channels, mw_channels
+from functools import partial
+from viewer_modules.log_readers import (
+    clock_seconds, clock_text, fanck_clock_seconds, find_column, guess_time_format, read_csv_after_header,
+    read_csv_table, read_table_file, detect_encoding,
+)
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
@@ -83,41 +91,43 @@ def convert_thi_txt_to_df(file_content: str) -> pd.DataFrame:
 def convert_wistron_tool_file(uploaded_file):
     if uploaded_file is None:
         st.warning("⚠️ Wistron Tool file not uploaded.")
-        return None, None
+        return None
 
     try:
-        content = uploaded_file.read().decode('utf-8', errors='ignore')
-        df = pd.read_csv(StringIO(content), sep="\t")
+        # 바이트를 그대로 파서에 전달 (인코딩은 앞부분 바이트로 한 번만 판정)
+        df = read_csv_table(uploaded_file, sep="\t", encoding_errors="ignore")
 
-        # ✅ Time 컬럼을 문자열 "HH:MM:SS" 형식으로 변환
+        # ✅ Time 컬럼을 한 번만 파싱해서 "HH:MM:SS" 형식으로 변환
         time_col = df.columns[0]
-        df[time_col] = pd.to_datetime(df[time_col], format="%H:%M:%S", errors='coerce')
-        df[time_col] = df[time_col].dt.strftime("%H:%M:%S")
+        df[time_col] = clock_text(clock_seconds(df[time_col]))
 
     except Exception as e:
         st.error(f"❌ Failed to read Wistron Tool file: {e}")
-        return None, None
+        return None
 
-    def convert_df_to_excel(df):
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Wistron Tool Log')
-        return output.getvalue()
+    df = sanitize_numeric_columns(df, exclude_columns=[time_col])
+    return df
 
-    excel_data = convert_df_to_excel(df)
-    df[time_col] = df[time_col].dt.strftime("%H:%M:%S")
-    df = sanitize_numeric_columns(df, exclude_columns=["Time"])
-    return df, excel_data
+# XLSX 는 다운로드 버튼을 눌렀을 때만 생성
+def convert_wistron_tool_to_excel(df: pd.DataFrame) -> bytes:
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name='Wistron Tool Log')
+    return output.getvalue()
 
 # === GPUmon tool Parser ===
 def convert_gpumon_file(file) -> pd.DataFrame:
     try:
-        # 64행이 헤더니까 그 전 줄은 건너뛰기
-        df = pd.read_csv(file, encoding='utf-8', sep=",", engine="python", skiprows=63)
+        # 프리앰블 길이가 달라도 date/time 이 있는 행을 찾아서 헤더로 사용 (C 엔진)
+        file.seek(0)
+        df = read_csv_after_header(file.read(), required=("date", "time"))
+        date_col, time_col = find_column(df.columns, "date"), find_column(df.columns, "time")
 
-        df["Time"] = pd.to_datetime(df["date"] + " " + df["time"], errors='coerce')
-        df = df.dropna(subset=["Time"]).copy()
-        df["Time"] = df["Time"].dt.strftime("%H:%M:%S")
+        # 시각 열은 명시적 포맷으로 한 번만 파싱 (date 가 없는 행은 제외)
+        time_text = df[time_col].astype(str).str.strip()
+        seconds = clock_seconds(time_text, fmt=guess_time_format(time_text))
+        df["Time"] = clock_text(seconds)
+        df = df[df[date_col].notna() & df["Time"].notna()].copy()
 
         time_col = df.pop("Time")
         df.insert(0, "Time", time_col)
@@ -131,29 +141,15 @@ def convert_gpumon_file(file) -> pd.DataFrame:
         return pd.DataFrame()
 
 # === Logger Parser ===
-def convert_to_utf8_csv(input_file):
-    filename, ext = os.path.splitext(input_file.name)
-    ext = ext.lower()
+def read_logger_file(input_file):
+    # CSV / XLS / XLSX は先頭バイトで判定して1回で読む
     try:
-        try:
-            first_bytes = input_file.read(3)
-            input_file.seek(0)
-            encoding = 'utf-8-sig' if first_bytes.startswith(b'\xef\xbb\xbf') else 'cp949'
-            df = pd.read_csv(input_file, encoding=encoding, low_memory=False, header=None)
-        except Exception:
-            input_file.seek(0)
-            if ext == '.xls':
-                df = pd.read_excel(input_file, engine='xlrd', header=None)
-            elif ext == '.xlsx':
-                df = pd.read_excel(input_file, engine='openpyxl', header=None)
-            else:
-                raise
-        return df
+        return read_table_file(input_file, header=None)
     except Exception as e:
         return None
 
 def extract_logger_columns_with_conversion(uploaded_file, min_val=0, max_val=75, time_label="Time"):
-    df = convert_to_utf8_csv(uploaded_file)
+    df = read_logger_file(uploaded_file)
     if df is None:
         return None, "Unsupported logger file format or read error."
 
@@ -191,7 +187,8 @@ def extract_logger_columns_with_conversion(uploaded_file, min_val=0, max_val=75,
                 selected_data[col] = pd.to_numeric(selected_data[col], errors="coerce").round(1)
 
       
-        selected_data["Time"] = pd.to_datetime(selected_data["Time"], format="%H:%M:%S", errors="coerce")
+        # Excel の時刻セルは datetime.time で来るので文字列にしてからパース
+        selected_data["Time"] = pd.to_datetime(selected_data["Time"].astype(str), format="%H:%M:%S", errors="coerce")
         selected_data = selected_data.dropna(subset=["Time"]).sort_values("Time").reset_index(drop=True)
 
     
@@ -210,17 +207,10 @@ def extract_logger_columns_with_conversion(uploaded_file, min_val=0, max_val=75,
 
 # === FanCK Parser ===
 def convert_fanck_file(file) -> pd.DataFrame:
-    df = pd.read_csv(file, encoding_errors='ignore')
-
-    def convert_to_time(timestamp):
-        timestamp_str = str(int(timestamp))
-        time_digits = timestamp_str[-6:]
-        hours = int(time_digits[:2])
-        minutes = int(time_digits[2:4])
-        seconds = int(time_digits[4:])
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    df = read_csv_table(file, encoding_errors='ignore')
 
-    df.iloc[:, 0] = df.iloc[:, 0].apply(convert_to_time).astype(str)
+    # 列全体を整数演算で hh:mm:ss に変換（不正・欠損の時刻は NaN）
+    df[df.columns[0]] = clock_text(fanck_clock_seconds(df.iloc[:, 0]))
     original_cols = df.columns.tolist()
     renamed_cols = ["Time"] + [f"{col}" for col in original_cols[1:]]
     df.columns = renamed_cols
@@ -229,17 +219,19 @@ def convert_fanck_file(file) -> pd.DataFrame:
 
 # === Generic CSV Reader (pTAT, DTT) ===
 def read_generic_csv(file, label: str) -> pd.DataFrame:
-    df = pd.read_csv(file, encoding_errors='ignore')
+    df = read_csv_table(file, encoding_errors='ignore')
 
     if label == "pTAT":
         if "Time" in df.columns:
             df["Time"] = df["Time"].astype(str).str.extract(r'(\d{2}:\d{2}:\d{2})')[0]
         
     elif label == "DTT":
-        for col in df.columns:
-            if "power" in col.lower() and "(mW)" in col:
-                df[col] = pd.to_numeric(df[col], errors='coerce') / 1000
-                df.rename(columns={col: col.replace("(mW)", "(W)")}, inplace=True)
+        # (mW)の電力列は1ブロックでW換算して、列名も1回でまとめて置き換える
+        mw_cols = [col for col in df.columns if "power" in col.lower() and "(mW)" in col]
+        if mw_cols:
+            w_block = materialize_channels({}, df, mw_channels(mw_cols))
+            df[mw_cols] = w_block.to_numpy()
+            df = df.rename(columns=dict(zip(mw_cols, w_block.columns)))
 
     renamed_cols = []
     for col in df.columns:
@@ -328,7 +320,8 @@ for i, label in enumerate(file_labels):
             for idx, f in enumerate(uploaded_files):
                 try:
                     if label == "THI":
-                        file_str = f.read().decode('utf-8', errors='ignore')
+                        raw = f.read()
+                        file_str = raw.decode(detect_encoding(raw), errors='ignore')
                         df = convert_thi_txt_to_df(file_str)
                         df.columns = [col if col.lower() == "time" else f"{col} ({label})" for col in df.columns]
                     elif label == "logger":
@@ -373,7 +366,7 @@ with cols[0]:
         uploaded_data[label] = []
         for idx, f in enumerate(uploaded_files):
             try:
-                df, _ = convert_wistron_tool_file(f)
+                df = convert_wistron_tool_file(f)
                 if df is not None:
                     df.columns = [col if col.lower() == "time" else f"{col} ({label})" for col in df.columns]
                     uploaded_data[label].append(df)
@@ -384,6 +377,12 @@ with cols[0]:
                         file_name=f"{label}_{idx+1}_converted.csv",
                         mime='text/csv'
                     )
+                    st.download_button(
+                        label=f"📥 {label}_{idx+1} download converted file (XLSX)",
+                        data=partial(convert_wistron_tool_to_excel, df),
+                        file_name=f"{label}_{idx+1}_converted.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
             except Exception as e:
                 st.warning(f"❗ Error processing {label}: {e}")
                 continue
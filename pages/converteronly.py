@@ -2,9 +2,15 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from io import BytesIO
+from functools import partial
 import openpyxl
 import re
 from openpyxl.styles import PatternFill
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from viewer_modules.table_view import paged_table
+from viewer_modules.log_readers import read_csv_table
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
@@ -28,23 +34,79 @@ uploader_cols = st.columns(2)
 uploaded_gpu_file = uploader_cols[0].file_uploader("GPUmon ログファイル (.txt)", type="txt")
 uploaded_ppm_file = uploader_cols[1].file_uploader("PPM ログファイル (.txt)", type="txt")
 
-# Runボタン
+# ===== 読み込み・変換（ファイル毎に1回だけ。表のページ送り・フィルタのrerunでは再パースしない） =====
+# 中身は file_id で区別する（_data はキャッシュのキーにしない＝毎回ハッシュしない）
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_gpumon(file_id, _data):
+    return read_csv_table(_data, sep="\t")
+
+
+def get_indent_index(indent):
+    return indent // 2 * 2  # Always even index: 0, 2, 4, 6, etc.
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_ppm(file_id, _data):
+    try:
+        text = _data.decode("utf-8")
+    except UnicodeDecodeError:
+        text = _data.decode("shift_jis", errors="replace")
+
+    data_rows = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line:
+            data_rows.append({})
+            continue
+        indent = len(line) - len(line.lstrip())
+        if ":" not in line:
+            continue
+        key, value = map(str.strip, line.split(":", 1))
+        col_key = chr(65 + get_indent_index(indent))  # A, C, E, G
+        col_val = chr(65 + get_indent_index(indent) + 1)  # B, D, F, H
+        data_rows.append({col_key: key, col_val: value})
+    return pd.DataFrame(data_rows)
+
+
+# XLSXはダウンロードボタンを押した時だけ作る（download_button に partial を渡す）
+def convert_df_to_excel(df):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name='GPUmon Log')
+    return output.getvalue()
+
+
+def convert_ppm_to_excel(df_ppm):
+    output_ppm = BytesIO()
+    with pd.ExcelWriter(output_ppm, engine="openpyxl") as writer:
+        df_ppm.to_excel(writer, index=False)
+        worksheet = writer.sheets["Sheet1"]
+        for col in worksheet.columns:
+            worksheet.column_dimensions[col[0].column_letter].width = 47
+        fill_gray = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
+        for row in worksheet.iter_rows():
+            if all(cell.value == "" for cell in row):
+                for cell in row:
+                    cell.fill = fill_gray
+    return output_ppm.getvalue()
+
+
+# Runボタン（表のページ送り等でrerunしても結果を表示し続ける。アップロードが変わったら押し直すまで表示しない）
+upload_ids = tuple(file.file_id if file else None for file in (uploaded_gpu_file, uploaded_ppm_file))
+if st.session_state.get("converteronly_upload_ids") != upload_ids:
+    st.session_state["converteronly_upload_ids"] = upload_ids
+    st.session_state["converteronly_ran"] = False
 if st.button("▶️ Run Conversion"):
+    st.session_state["converteronly_ran"] = True
+if st.session_state.get("converteronly_ran"):
     # ===== GPUmon処理 =====
     if uploaded_gpu_file:
-        df_gpu = pd.read_csv(uploaded_gpu_file, sep="\t")
+        df_gpu = load_gpumon(uploaded_gpu_file.file_id, uploaded_gpu_file.getvalue())
         st.success("✅ GPUmonファイルを読み込みました！")
         st.subheader("📄 GPUmon テーブル表示")
-        st.dataframe(df_gpu, use_container_width=True)
+        paged_table(df_gpu, key="gpumon_table", frame_id=uploaded_gpu_file.file_id)
 
-        def convert_df_to_excel(df):
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='GPUmon Log')
-            return output.getvalue()
-
-        excel_data_gpu = convert_df_to_excel(df_gpu)
-        st.download_button("📥 GPUmon Excel出力", data=excel_data_gpu, file_name="GPUmon_Output.xlsx")
+        st.download_button("📥 GPUmon Excel出力", data=partial(convert_df_to_excel, df_gpu), file_name="GPUmon_Output.xlsx")
 
         st.subheader("📊 GPUmon Plotlyグラフ")
         col_x = st.selectbox("X軸を選択 (GPUmon)", options=df_gpu.columns, index=0)
@@ -56,49 +118,13 @@ if st.button("▶️ Run Conversion"):
     # ===== PPM処理 =====
     if uploaded_ppm_file:
         try:
-            content = uploaded_ppm_file.read()
-            try:
-                text = content.decode("utf-8")
-            except UnicodeDecodeError:
-                text = content.decode("shift_jis", errors="replace")
-            lines = text.splitlines()
+            df_ppm = load_ppm(uploaded_ppm_file.file_id, uploaded_ppm_file.getvalue())
         except Exception as e:
             st.error(f"ファイル読み込み中にエラーが発生しました: {e}")
-            lines = []
-
-        def get_indent_index(indent):
-            return indent // 2 * 2  # Always even index: 0, 2, 4, 6, etc.
-
-        data_rows = []
-        for line in lines:
-            line = line.rstrip()
-            if not line:
-                data_rows.append({})
-                continue
-            indent = len(line) - len(line.lstrip())
-            if ":" not in line:
-                continue
-            key, value = map(str.strip, line.split(":", 1))
-            col_key = chr(65 + get_indent_index(indent))  # A, C, E, G
-            col_val = chr(65 + get_indent_index(indent) + 1)  # B, D, F, H
-            data_rows.append({col_key: key, col_val: value})
-
-        df_ppm = pd.DataFrame(data_rows)
+            df_ppm = pd.DataFrame()
+
         st.success("✅ PPMファイルを読み込みました！")
         st.subheader("📄 PPM テーブル表示")
-        st.dataframe(df_ppm, use_container_width=True)
-
-        output_ppm = BytesIO()
-        with pd.ExcelWriter(output_ppm, engine="openpyxl") as writer:
-            df_ppm.to_excel(writer, index=False)
-            workbook = writer.book
-            worksheet = writer.sheets["Sheet1"]
-            for col in worksheet.columns:
-                worksheet.column_dimensions[col[0].column_letter].width = 47
-            fill_gray = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-            for row in worksheet.iter_rows():
-                if all(cell.value == "" for cell in row):
-                    for cell in row:
-                        cell.fill = fill_gray
-
-        st.download_button("📥 PPM Excel出力", data=output_ppm.getvalue(), file_name="PPM_Output.xlsx")
+        paged_table(df_ppm, key="ppm_table", frame_id=uploaded_ppm_file.file_id)
+
+        st.download_button("📥 PPM Excel出力", data=partial(convert_ppm_to_excel, df_ppm), file_name="PPM_Output.xlsx")
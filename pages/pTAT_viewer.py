@@ -9,9 +9,22 @@ from io import BytesIO
 import matplotlib.colors as mcolors
 import re  
 import textwrap
+from html import escape
 import matplotlib.font_manager as fm
 import xlsxwriter
-import chardet
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from viewer_modules.column_search import build_search_index, search_columns
+from viewer_modules.column_catalog import build_column_catalog, role_cols, first_col, get_core_types, normalize_core_id, default_cols, axis_title, lookup_table
+from viewer_modules.range_stats import build_range_stats, range_summary, named_range_table, index_range_for_clock
+from viewer_modules.figure_cache import file_digest, figure_key, get_or_build
+from viewer_modules.derived_columns import derived_column
+from viewer_modules.clip_reason import (
+    encode_clip_timeline, clip_duration_table, clock_ticks, sample_durations,
+    build_clip_flags, flag_duration_table, flag_co_occurrence
+)
+from viewer_modules.log_readers import read_csv_table
 st.set_page_config(layout="wide")
 
 top_col_right = st.columns([8, 1])
@@ -133,40 +146,45 @@ with st.sidebar.expander("1️⃣ Choose your csv file", expanded=True):
 
 @st.cache_data
 def load_csv(file_obj):
-    # UTF-8（最速）
-    try:
-        return pd.read_csv(file_obj, on_bad_lines='skip')
-    except UnicodeDecodeError:
-        pass
+    # pyarrow（マルチスレッド）で読み、壊れた行があれば on_bad_lines='skip' で読み直す
+    # 文字コード（UTF-8 / Shift_JIS / CP949 ...）は先頭のバイトだけで1回判定（ファイル全体を何度も読み直さない）
+    return read_csv_table(file_obj, encoding_errors="replace")
 
-    # Shift_JIS（日本語Windows対策）
-    file_obj.seek(0)
-    try:
-        return pd.read_csv(file_obj, encoding="shift_jis", on_bad_lines='skip')
-    except UnicodeDecodeError:
-        pass
+df = load_csv(uploaded_file)
 
-    # 最後の手段として chardet
-    file_obj.seek(0)
-    raw = file_obj.read(100_000)  # ✅ 全体ではなく先頭10万バイトだけに制限（高速化）
-    result = chardet.detect(raw)
-    encoding = result["encoding"]
+# ===== 列カタログ（列名の分類と検索インデックスはファイル毎に1回だけ） =====
+# 読み取り専用で使うので cache_resource（rerun毎のコピーを避ける）
+@st.cache_resource(show_spinner=False)
+def get_column_catalog(columns):
+    catalog = build_column_catalog(columns, "pTAT")
+    catalog["search"] = build_search_index(catalog["columns"])
+    return catalog
 
-    file_obj.seek(0)
-    return pd.read_csv(file_obj, encoding=encoding, on_bad_lines='skip')
+catalog = get_column_catalog(tuple(df.columns))
 
-df = load_csv(uploaded_file)
+# ===== ファイルハッシュ（図キャッシュのキー、ファイル毎に1回だけ計算） =====
+if st.session_state.get("file_hash_id") != uploaded_file.file_id:
+    st.session_state.file_hash = file_digest(uploaded_file.getvalue())
+    st.session_state.file_hash_id = uploaded_file.file_id
+file_hash = st.session_state.file_hash
+if "figure_cache" not in st.session_state:
+    st.session_state.figure_cache = {}
+figure_cache = st.session_state.figure_cache
+
+# ===== 派生列（EPP% など、変換結果はファイル毎に1回だけ計算して使い回す） =====
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_derived_cache(file_id):
+    return {}
+
+derived_cache = get_derived_cache(uploaded_file.file_id)
 
 # ===== CoreType表示（段組＋カラーマップ対応）を成功風UIで表示 =====
-core_type_map = {}
-for col in df.columns:
-    if "core type" in col.lower(): 
-        core_id_raw = col.split("-")[0]
-        core_id = re.sub(r"CPU0*(\d+)", r"CPU\1", core_id_raw)  # ← これを追加
-        core_type = str(df[col].iloc[0]).strip().lower()
-        core_type_map[core_id] = core_type
+core_type_map = {
+    normalize_core_id(core_id_raw): str(core_type).strip().lower()
+    for core_id_raw, core_type in get_core_types(catalog, df).items()
+}
 # ===== Time列の取得 =====
-time_col_candidates = [col for col in df.columns if "time" in col.lower()]
+time_col_candidates = role_cols(catalog, "time")
 if not time_col_candidates:
     st.error("Not found Time column.")
     st.stop()
@@ -245,19 +263,19 @@ def create_excel_combined_charts(df, time_col, chart_defs, color_map, secondary_
     additional_groups = [
         {
             "label": "IA Clip Reason",
-            "columns": [col for col in df.columns if "ia clip reason" in col.lower()]
+            "columns": role_cols(catalog, "ia_clip")
         },
         {
             "label": "GT Clip Reason",
-            "columns": [col for col in df.columns if "gt clip reason" in col.lower()]
+            "columns": role_cols(catalog, "gt_clip")
         },
         {
             "label": "Phidget Temp",
-            "columns": [col for col in df.columns if "phidget" in col.lower() and "degree" in col.lower()]
+            "columns": role_cols(catalog, "phidget")
         },
         {
             "label": "EPP and Mode",
-            "columns": [col for col in df.columns if "performance preference" in col.lower() or "oem18" in col.lower()]
+            "columns": role_cols(catalog, "epp_mode")
         }
     ]
     # ✅ すべての追加列を1ブロックとして並べる（ヘッダー1行、以降データ）
@@ -289,35 +307,9 @@ except Exception as e:
     time_vals = df[time_col]
 
 
-# ===== デフォルト縦軸列取得関数 =====
+# ===== デフォルト縦軸列取得関数（列の役割と数はプロファイルの default_plots["power"]） =====
 def get_default_power_cols():
-    preferred = [
-        next((col for col in df.columns if "package power" in col.lower()), None),
-        next((col for col in df.columns if "ia power" in col.lower()), None),
-        next((col for col in df.columns if "rest of package" in col.lower()), None),
-        next((col for col in df.columns if "mmio" in col.lower() and "1" in col.lower() and "watts" in col.lower()), None),
-        next((col for col in df.columns if "mmio" in col.lower() and "2" in col.lower() and "watts" in col.lower()), None)
-    ]
-
-    selected = []
-    seen = set()
-    for col in preferred:
-        if col and col not in seen:
-            selected.append(col)
-            seen.add(col)
-
-    other_power_cols = [
-        col for col in df.columns
-        if "power" in col.lower() and col not in seen and col != time_col
-    ]
-
-    for col in other_power_cols:
-        if len(selected) >= 7:
-            break
-        selected.append(col)
-        seen.add(col)
-
-    return selected
+    return default_cols(catalog, "power", exclude=[time_col])
 
 
 def reset_selected_y_cols():
@@ -330,6 +322,7 @@ def reset_secondary_y_cols():
 if file != previous_file:
     reset_selected_y_cols()
     reset_secondary_y_cols()
+    st.session_state.named_ranges = []
     st.session_state.last_selected_file = file
 
 # ✅ 明示的に初回だけ定義（上書きされない）
@@ -339,10 +332,9 @@ if "secondary_y_cols" not in st.session_state:
     st.session_state.secondary_y_cols = []
 
 # ===== 第一縦軸列選択（ExpanderでまとめてUI整理） =====
-df_unique_columns = pd.Index(dict.fromkeys(df.columns))
 with st.sidebar.expander("2️⃣ Setting for 1st Y-axis column", expanded=True):
     search_query = st.text_input("Searching (Y-axis)", value="Power", key="primary_search_input")
-    y_axis_candidates = [col for col in df_unique_columns if search_query.lower() in col.lower() and col != time_col]
+    y_axis_candidates = search_columns(catalog["search"], search_query, exclude=(time_col,))
 
     if "selected_y_cols" not in st.session_state:
         st.session_state.selected_y_cols = get_default_power_cols()
@@ -372,7 +364,7 @@ with st.sidebar.expander("2️⃣ Setting for 1st Y-axis column", expanded=True)
         st.session_state.selected_y_cols = updated_selection
         st.rerun()
 
-    priority_col = "Power-Package Power(Watts)"
+    priority_col = first_col(catalog, "package_power")
     if priority_col in st.session_state.selected_y_cols:
         st.session_state.selected_y_cols.remove(priority_col)
         st.session_state.selected_y_cols.insert(0, priority_col)
@@ -444,7 +436,7 @@ with st.sidebar.expander("4️⃣ 2nd Y-axis setting", expanded=True):
 
         st.markdown("**Search and attend 2nd Y-axis column**")
         y2_search = st.text_input("Searching（2nd Y-axis）", value="Temp", key="y2_search")
-        y2_candidates = [col for col in df.columns if y2_search.lower() in col.lower() and col != time_col]
+        y2_candidates = search_columns(catalog["search"], y2_search, exclude=(time_col,))
 
         if "secondary_y_cols" not in st.session_state:
             st.session_state.secondary_y_cols = []
@@ -470,16 +462,9 @@ with st.sidebar.expander("4️⃣ 2nd Y-axis setting", expanded=True):
         st.session_state.secondary_y_cols = y2_remove_cols
 
 # === Frequency列の取得（タブ描画にもExcelにも共通で使う） ===
-frequency_cols = [col for col in df.columns if re.fullmatch(r"CPU\d+-Frequency\(MHz\)", col, flags=re.IGNORECASE)]
+frequency_cols = role_cols(catalog, "frequency")
 # === CPU温度列の抽出（タブ描画とExcel出力で共通使用） ===
-temp_cols = [
-    col for col in df.columns
-    if (
-        (re.search(r"CPU\d+-DTS", col) or
-        (("temp" in col.lower() or "temperature" in col.lower()) and "cpu" in col.lower()))
-        and not col.startswith("TCPU")
-    )
-]
+temp_cols = role_cols(catalog, "cpu_temp")
 # ===== Plotlyグラフ描画 =====
 selected_y_cols = list(dict.fromkeys(st.session_state.selected_y_cols))  # 重複除去
 secondary_y_cols = (
@@ -558,12 +543,12 @@ xlsx_io = create_excel_combined_charts(
         {
             "title": "Frequency Plot",
             "columns": frequency_cols,
-            "y_axis_title": "Frequency (MHz)"
+            "y_axis_title": axis_title(catalog, "frequency", "Frequency")
         },
         {
             "title": "CPU Temperature Plot",  # ← NEW
             "columns": temp_cols,
-            "y_axis_title": "Temperature (°C)"
+            "y_axis_title": axis_title(catalog, "cpu_temp", "Temperature")
         }
     ],
     color_map=color_map_excel,
@@ -572,37 +557,6 @@ xlsx_io = create_excel_combined_charts(
     }
 )
 
-fig = go.Figure()
-
-for col in selected_y_cols:
-    style = style_options.get(st.session_state["style_map"].get(col, "lines"), {})
-    fig.add_trace(go.Scatter(
-        x=time_vals,
-        y=df[col],
-        name=col,
-        line=dict(
-            color=color_map_ui[col],
-            dash=style.get("dash")
-        ),
-        mode="lines+markers" if style.get("marker") else "lines",
-        marker=dict(symbol=style.get("marker")) if style.get("marker") else None,
-        yaxis="y1",
-        showlegend=True
-    ))
-
-# ✅ 第二軸のプロットはすべて markers のみに統一
-for col in secondary_y_cols:
-    fig.add_trace(go.Scatter(
-        x=time_vals,
-        y=df[col],
-        name=col,
-        mode="markers",
-        marker=dict(color=color_map_ui[col], symbol="circle"),
-        line=dict(color=color_map_ui[col]),
-        yaxis="y2",
-        showlegend=True
-    ))
-
 xlsx_filename = file.replace(".csv", ".xlsx")
 st.download_button(
     label="📥 To XLSX Output (with Charts)",
@@ -610,9 +564,18 @@ st.download_button(
     file_name=xlsx_filename,
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 )
+# ===== 選択範囲の統計（累積和テーブルはファイル毎に1回だけ作る） =====
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_range_stats(file_id, _df, _time_vals):
+    return build_range_stats(_df, _time_vals)
+
 # ==== 📏 平均値と垂線表示用 toggle（Expanderの代替） ====
 show_avg = st.toggle("📏 Show the average value of the selected range", value=False)
+avg_vlines = None
+if "named_ranges" not in st.session_state:
+    st.session_state.named_ranges = []
 if show_avg:
+    range_stats = get_range_stats(uploaded_file.file_id, df, time_vals)
     midpoint = len(df) // 2
     col1, col2, col3, col4 = st.columns([1, 1, 2, 2])
     with col1:
@@ -621,96 +584,191 @@ if show_avg:
         idx_end = st.number_input("End index", min_value=0, max_value=len(df)-1, value=midpoint, step=1, key="idx_end")
     with col3:
         available_avg_cols = st.session_state.selected_y_cols or df.select_dtypes(include='number').columns.tolist()
-        avg_target_col = st.selectbox("Target column", options=available_avg_cols, index=0, key="avg_col")
-
-    if idx_start < idx_end and avg_target_col in df.columns:
-        avg_val = df[avg_target_col].iloc[idx_start:idx_end+1].mean()
-        with col4:
-            st.success(f"📏 {avg_target_col} : {idx_start}〜{idx_end} Average: {avg_val:.2f}")
+        avg_target_cols = st.multiselect("Target columns", options=available_avg_cols, default=available_avg_cols[:1], key="avg_cols")
+
+    # 時刻指定（hh:mm:ss）で範囲を上書き
+    by_time = st.checkbox("Select the range by time (hh:mm:ss)", value=False, key="avg_by_time")
+    if by_time:
+        time_col1, time_col2 = st.columns(2)
+        with time_col1:
+            start_text = st.text_input("Start time", value=str(time_vals.iloc[idx_start]), key="avg_time_start")
+        with time_col2:
+            end_text = st.text_input("End time", value=str(time_vals.iloc[idx_end]), key="avg_time_end")
+        try:
+            time_range = index_range_for_clock(range_stats, start_text, end_text)
+        except ValueError:
+            time_range = None
+            st.warning("Time must be hh:mm:ss")
+        if time_range:
+            idx_start, idx_end = time_range
+
+    if idx_start < idx_end and avg_target_cols:
+        range_summary_df = range_summary(range_stats, avg_target_cols, idx_start, idx_end, role_cols(catalog, "power"))
+        if not range_summary_df.empty:
+            with col4:
+                first_row = range_summary_df.iloc[0]
+                st.success(f"📏 {first_row['Column']} : {idx_start}〜{idx_end} Average: {first_row['Mean']:.2f}")
+        st.dataframe(range_summary_df, hide_index=True, use_container_width=True)
+
+        # 名前付き範囲（例: PL1 steady / PL2 burst）を溜めて一覧・出力
+        name_col, add_col, clear_col = st.columns([3, 1, 1])
+        with name_col:
+            range_name = st.text_input("Range name", value=f"Range {len(st.session_state.named_ranges) + 1}", key="range_name")
+        with add_col:
+            if st.button("➕ Add range", key="add_named_range"):
+                st.session_state.named_ranges.append({"name": range_name, "start": int(idx_start), "end": int(idx_end)})
+        with clear_col:
+            if st.button("🗑️ Clear ranges", key="clear_named_ranges"):
+                st.session_state.named_ranges = []
+
+        if st.session_state.named_ranges:
+            named_df = named_range_table(range_stats, st.session_state.named_ranges, avg_target_cols, role_cols(catalog, "power"))
+            st.dataframe(named_df, hide_index=True, use_container_width=True)
+            st.download_button(
+                label="📥 Named ranges (CSV)",
+                data=named_df.to_csv(index=False).encode("utf-8-sig"),
+                file_name=file.replace(".csv", "_ranges.csv"),
+                mime="text/csv",
+                key="named_ranges_download"
+            )
 
         x_start = time_vals.iloc[idx_start] if hasattr(time_vals, "iloc") else time_vals[idx_start]
         x_end = time_vals.iloc[idx_end] if hasattr(time_vals, "iloc") else time_vals[idx_end]
 
+        avg_vlines = (x_start, x_end)
+
+# ===== メイン図（列・色・スタイル・軸設定が同じならキャッシュ済みの図を再利用） =====
+def build_main_figure(avg_vlines):
+    fig = go.Figure()
+
+    for col in selected_y_cols:
+        style = style_options.get(st.session_state["style_map"].get(col, "lines"), {})
+        fig.add_trace(go.Scatter(
+            x=time_vals,
+            y=df[col],
+            name=col,
+            line=dict(
+                color=color_map_ui[col],
+                dash=style.get("dash")
+            ),
+            mode="lines+markers" if style.get("marker") else "lines",
+            marker=dict(symbol=style.get("marker")) if style.get("marker") else None,
+            yaxis="y1",
+            showlegend=True
+        ))
+
+    # ✅ 第二軸のプロットはすべて markers のみに統一
+    for col in secondary_y_cols:
+        fig.add_trace(go.Scatter(
+            x=time_vals,
+            y=df[col],
+            name=col,
+            mode="markers",
+            marker=dict(color=color_map_ui[col], symbol="circle"),
+            line=dict(color=color_map_ui[col]),
+            yaxis="y2",
+            showlegend=True
+        ))
+
+    if avg_vlines:
+        x_start, x_end = avg_vlines
         # 垂線の追加（同期済み）
         fig.add_vline(x=x_start, line=dict(dash="dot", width=5, color="red"))
         fig.add_vline(x=x_end, line=dict(dash="dot", width=5, color="blue"))
 
-layout_dict = dict(
-    title=dict(
-    text=f"{file}",
-    font=dict(size=18),
-    x=0.09,  # 👈 完全に左寄せ
-    xanchor="left",  # 👈 左基準にする
-    y=0.95,  # （オプション）縦位置調整（気になるなら）
-    pad=dict(t=10, b=10)  # （オプション）上と下に少しだけ余白
-    ),
-    xaxis=dict(title=dict(text=x_axis_title, font=dict(size=18)),tickfont=dict(size=16)),
-    yaxis=dict(
-        title=dict(text=y_axis_title, font=dict(size=18)),
-        tickfont=dict(size=16),
-        side='left',
-        tickmode='linear',
-        tick0=0,
-        dtick=st.session_state.get("ytick_step", 5),
-        range=[0, st.session_state.get("y_max", 100)],
-        tickangle=0
-    ),
-    legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 15)), traceorder="normal"),
-    margin=dict(l=50, r=100, t=50, b=50),
-    height=st.session_state.get("plot_height", 7) * 100,
-    width=st.session_state.get("plot_width", 14) * 100,
-    updatemenus=[
-        dict(
-            type="buttons",
-            direction="right",
-            xanchor="right",
-            x=1.0,
-            yanchor="top",
-            y=1.08,
-            showactive=True,
-            pad={"r": 0, "t": 0},
-            buttons=[
-                dict(
-                    label="Legend on",
-                    method="relayout",
-                    args=[{
-                        "showlegend": True,
-                        "updatemenus[0].x": 1.0,
-                        "updatemenus[0].xanchor": "right",
-                        "updatemenus[0].y": 1.08,
-                        "updatemenus[0].yanchor": "top"
-                    }],
-                ),
-                dict(
-                    label="Legend off",
-                    method="relayout",
-                    args=[{
-                        "showlegend": False,
-                        "updatemenus[0].x": 1.0,
-                        "updatemenus[0].xanchor": "right",
-                        "updatemenus[0].y": 1.08,
-                        "updatemenus[0].yanchor": "top"
-                    }]
-                )
-            ]
-        )
-    ]
-)
-# 第二縦軸を使用する場合だけ追加
-if st.session_state.get("use_secondary_axis", False):
-    layout_dict["yaxis2"] = dict(
-        title=dict(text=st.session_state.get("y2_title", ""), font=dict(size=18)),
-        tickfont=dict(size=16),
-        overlaying='y',
-        side='right',
-        tickmode='linear',
-        tick0=0,
-        dtick=int(st.session_state.get("secondary_tick_step", 5)),
-        range=[0, int(st.session_state.get("y2_max", 100))],
-        showgrid=False 
+    layout_dict = dict(
+        title=dict(
+        text=f"{file}",
+        font=dict(size=18),
+        x=0.09,  # 👈 完全に左寄せ
+        xanchor="left",  # 👈 左基準にする
+        y=0.95,  # （オプション）縦位置調整（気になるなら）
+        pad=dict(t=10, b=10)  # （オプション）上と下に少しだけ余白
+        ),
+        xaxis=dict(title=dict(text=x_axis_title, font=dict(size=18)),tickfont=dict(size=16)),
+        yaxis=dict(
+            title=dict(text=y_axis_title, font=dict(size=18)),
+            tickfont=dict(size=16),
+            side='left',
+            tickmode='linear',
+            tick0=0,
+            dtick=st.session_state.get("ytick_step", 5),
+            range=[0, st.session_state.get("y_max", 100)],
+            tickangle=0
+        ),
+        legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 15)), traceorder="normal"),
+        margin=dict(l=50, r=100, t=50, b=50),
+        height=st.session_state.get("plot_height", 7) * 100,
+        width=st.session_state.get("plot_width", 14) * 100,
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[{
+                            "showlegend": True,
+                            "updatemenus[0].x": 1.0,
+                            "updatemenus[0].xanchor": "right",
+                            "updatemenus[0].y": 1.08,
+                            "updatemenus[0].yanchor": "top"
+                        }],
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[{
+                            "showlegend": False,
+                            "updatemenus[0].x": 1.0,
+                            "updatemenus[0].xanchor": "right",
+                            "updatemenus[0].y": 1.08,
+                            "updatemenus[0].yanchor": "top"
+                        }]
+                    )
+                ]
+            )
+        ]
     )
+    # 第二縦軸を使用する場合だけ追加
+    if st.session_state.get("use_secondary_axis", False):
+        layout_dict["yaxis2"] = dict(
+            title=dict(text=st.session_state.get("y2_title", ""), font=dict(size=18)),
+            tickfont=dict(size=16),
+            overlaying='y',
+            side='right',
+            tickmode='linear',
+            tick0=0,
+            dtick=int(st.session_state.get("secondary_tick_step", 5)),
+            range=[0, int(st.session_state.get("y2_max", 100))],
+            showgrid=False 
+        )
+
+    fig.update_layout(**layout_dict)
+    return fig
 
-fig.update_layout(**layout_dict)
+main_axis_settings = {
+    key: st.session_state.get(key)
+    for key in ("ytick_step", "y_max", "legend_font", "plot_height", "plot_width",
+                "use_secondary_axis", "y2_title", "secondary_tick_step", "y2_max")
+}
+fig = get_or_build(
+    figure_cache,
+    figure_key(
+        file_hash, "main", file, x_axis_title, y_axis_title, selected_y_cols, secondary_y_cols,
+        [color_map_ui[col] for col in plot_cols],
+        {col: st.session_state["style_map"].get(col) for col in plot_cols},
+        main_axis_settings, avg_vlines
+    ),
+    lambda: build_main_figure(avg_vlines)
+)
 
 st.plotly_chart(fig, use_container_width=True)
 
@@ -885,10 +943,10 @@ tab_headers = {
     "EPP&Mode": ":battery: EPP & PowerMode"
 }
 
-# ==== ✅ タブのフォントサイズを大きくする ====
+# ==== ✅ タブ（ラジオ）のフォントサイズを大きくする ====
 st.markdown("""
 <style>
-button[data-baseweb="tab"] > div[data-testid="stMarkdownContainer"] > p {
+div[data-testid="stRadio"] label div[data-testid="stMarkdownContainer"] > p {
     font-size: 19px !important;
     font-weight: bold;
     text-align: center;
@@ -897,530 +955,407 @@ button[data-baseweb="tab"] > div[data-testid="stMarkdownContainer"] > p {
 """, unsafe_allow_html=True)
 
 # ==== タブ表示・タイトル表示 ====
-tabs = st.tabs(tab_labels)
-for i, tab in enumerate(tabs):
-    with tab:
-        st.session_state["tab_index"] = i
-
-# ==== タブ処理 ====
-with tabs[0]:
-    st.markdown(f"## {tab_headers['Frequency']}")
-    # Frequency タブ専用の処理
-    frequency_cols = [
-    col for col in df.columns
-    if re.fullmatch(r"CPU\d+-Frequency\(MHz\)", col, flags=re.IGNORECASE)
-]
-    
-    if frequency_cols:
-        fig_freq = go.Figure()
-        freq_abnormal = False
-        for idx, col in enumerate(frequency_cols):
-            core_id_raw = col.split("-")[0]
-            core_id = re.sub(r"CPU0*(\d+)", r"CPU\1", core_id_raw)  # ← 追加
-            is_pcore = core_type_map.get(core_id, "").startswith("p")  # ← 修正
-
-            fig_freq.add_trace(go.Scatter(
-                x=time_vals,
-                y=df[col],
-                mode='lines',
-                name=col,
-                line=dict(color=color_map_ui[col]),
-                marker=dict(symbol="circle", size=8),
-                ### Ecoreをmarkerにする以下行
-                # mode='lines' if is_pcore else 'markers',
-                # line=dict(color=color_map_ui[col]) if is_pcore else dict(color=color_map_ui[col], width=0),
-                # marker=dict(symbol="circle" if is_pcore else "circle", size=8),
-            ))
-
-        if df[col].max() > 8000:
-            freq_abnormal = True
-            st.warning(f" {col} Existence of over 8000MHz", icon="⚠️")
-
-
-
-        fig_freq.update_layout(
-            xaxis_title="Time",
-            yaxis_title="Frequency (MHz)",
-            height=600, 
-            width=1400,
-            margin=dict(l=40, r=40, t=40, b=40),
-            legend=dict(x=1.05, y=1,font=dict(size=st.session_state.get("legend_font", 15)),traceorder="normal"),
-            font=dict(size=14),
-            xaxis=dict(
-                title=dict(text="Time", font=dict(size=18)),
-                tickfont=dict(size=16)
-                ),
-            yaxis=dict(
-                title=dict(text="Frequency (MHz)", font=dict(size=18)),
-                tickfont=dict(size=16),
-                range=[0, 8000] if freq_abnormal else None
-            ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
+# st.tabs は非表示のタブも毎回すべて実行されるため、選択中のタブだけを描画する
+active_tab = st.radio("Tab", tab_labels, horizontal=True, key="active_tab", label_visibility="collapsed")
+st.session_state["tab_index"] = tab_labels.index(active_tab)
+
+# ==== タブの図（トレース構成が同じならキャッシュ済みの図を再利用） ====
+def build_freq_figure(frequency_cols):
+    fig_warnings = []
+    fig_freq = go.Figure()
+    freq_abnormal = False
+    for idx, col in enumerate(frequency_cols):
+        fig_freq.add_trace(go.Scatter(
+            x=time_vals,
+            y=df[col],
+            mode='lines',
+            name=col,
+            line=dict(color=color_map_ui[col]),
+            marker=dict(symbol="circle", size=8),
+            ### Ecoreをmarkerにする以下行
+            # mode='lines' if is_pcore else 'markers',
+            # line=dict(color=color_map_ui[col]) if is_pcore else dict(color=color_map_ui[col], width=0),
+            # marker=dict(symbol="circle" if is_pcore else "circle", size=8),
+        ))
 
-        st.plotly_chart(fig_freq, use_container_width=True)
-    else:
-        st.info("No found the column")
-with tabs[1]:
-    st.markdown(f"## {tab_headers['CPU temp']}")
+    if df[col].max() > 8000:
+        freq_abnormal = True
+        fig_warnings.append(f" {col} Existence of over 8000MHz")
 
-# CPU温度の列を抽出（DTS形式に限定せず、TempやCPU+温度のような名前も対象に）
-    temp_cols = [
-        col for col in df.columns
-        if (
-            (re.search(r"CPU\d+-DTS", col) or
-            (("temp" in col.lower() or "temperature" in col.lower()) and "cpu" in col.lower()))
-            and not col.startswith("TCPU")
-        )
-    ]
-    if temp_cols:
-        fig_temp = go.Figure()
-        temp_abnormal = False
-        for col in temp_cols:
-            core_id_raw = col.split("-")[0]
-            core_id = re.sub(r"CPU0*(\d+)", r"CPU\1", core_id_raw)  # ← 追加
-            is_pcore = core_type_map.get(core_id, "").startswith("p")  # ← 修正
-            fig_temp.add_trace(go.Scatter(
-                x=time_vals,
-                y=df[col],
-                mode='lines',
-                name=col,
-                line=dict(color=color_map_ui[col]),
-                marker=dict(symbol="circle", size=8),
-                ### Ecoreをmarkerにする以下行
-                # mode='lines' if is_pcore else 'markers',
-                # line=dict(color=color_map_ui[col]) if is_pcore else dict(color=color_map_ui[col], width=0),
-                # marker=dict(symbol="circle" if is_pcore else "circle", size=8),
-            ))
-
-            if df[col].max() > 130:
-                temp_abnormal = True
-                st.warning(f" {col} over 130deg", icon="⚠️")
-
-
-
-        fig_temp.update_layout(
-            xaxis_title="Time",
-            yaxis_title="Temperature (°C)",
-            height=600, 
-            width=1400,
-            margin=dict(l=40, r=40, t=40, b=40),
-            legend=dict(x=1.05, y=1,font=dict(size=st.session_state.get("legend_font", 35)),traceorder="normal"),
-            font=dict(size=14),
-            xaxis=dict(
-                title=dict(text="Time", font=dict(size=18)),
-                tickfont=dict(size=16)
-                ),
-            yaxis=dict(
-                title=dict(text="Temperature (°C)", font=dict(size=18)),
-                tickfont=dict(size=16),
-                range=[0, 130] if temp_abnormal else None
-                ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
 
-        st.plotly_chart(fig_temp, use_container_width=True)
-    else:
-        st.info("No found")
 
-with tabs[2]:
-    st.markdown(f"## {tab_headers['IA-clip reason']}")
-    ia_clip_col = next((col for col in df.columns if "ia clip reason" in col.lower()), None)
+    fig_freq.update_layout(
+        xaxis_title="Time",
+        yaxis_title=axis_title(catalog, "frequency", "Frequency"),
+        height=600, 
+        width=1400,
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend=dict(x=1.05, y=1,font=dict(size=st.session_state.get("legend_font", 15)),traceorder="normal"),
+        font=dict(size=14),
+        xaxis=dict(
+            title=dict(text="Time", font=dict(size=18)),
+            tickfont=dict(size=16)
+            ),
+        yaxis=dict(
+            title=dict(text=axis_title(catalog, "frequency", "Frequency"), font=dict(size=18)),
+            tickfont=dict(size=16),
+            range=[0, 8000] if freq_abnormal else None
+        ),
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": True,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": False,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+    return fig_freq, fig_warnings
 
-    if ia_clip_col:
-        ia_reasons = sorted(df[ia_clip_col].dropna().unique())
-        ia_map = {v: i+1 for i, v in enumerate(ia_reasons)}
-        df["IA_ClipReason_Mapped"] = df[ia_clip_col].map(ia_map)
 
-        fig_ia = go.Figure()
-        fig_ia.add_trace(go.Scatter(
+def build_temp_figure(temp_cols):
+    fig_warnings = []
+    fig_temp = go.Figure()
+    temp_abnormal = False
+    for col in temp_cols:
+        fig_temp.add_trace(go.Scatter(
             x=time_vals,
-            y=df["IA_ClipReason_Mapped"],
-            mode="lines+markers",
-            line=dict(color="orange"),
-            showlegend=False
+            y=df[col],
+            mode='lines',
+            name=col,
+            line=dict(color=color_map_ui[col]),
+            marker=dict(symbol="circle", size=8),
+            ### Ecoreをmarkerにする以下行
+            # mode='lines' if is_pcore else 'markers',
+            # line=dict(color=color_map_ui[col]) if is_pcore else dict(color=color_map_ui[col], width=0),
+            # marker=dict(symbol="circle" if is_pcore else "circle", size=8),
         ))
 
-        # ✅ ここが追加された部分（update_layoutの外）
-        if priority_col in df.columns:
-            fig_ia.add_trace(go.Scatter(
-                x=time_vals,
-                y=df[priority_col],
-                mode="lines",
-                name=priority_col,
-                yaxis="y2",
-                line=dict(color="red"),
-                showlegend=True
-            ))
-
-            fig_ia.update_layout(
-                yaxis2=dict(
-                    title=dict(text="Package Power (W)", font=dict(size=16)),  
-                    tickfont=dict(size=14),
-                    overlaying='y',
-                    side='right'
-                )
-            )
+        if df[col].max() > 130:
+            temp_abnormal = True
+            fig_warnings.append(f" {col} over 130deg")
 
-        # ✅ 元の update_layout はここでOK
-        fig_ia.update_layout(
-            height=600, width=1400,bargap=0,
-            margin=dict(l=50, r=100, t=50, b=50),
-            xaxis=dict(
-                title=dict(text="Time", font=dict(size=18)),
-                tickfont=dict(size=16)
-            ),
-            yaxis=dict(
-                title=dict(text="IA Clip Reason", font=dict(size=18)),
-                tickmode="array",
-                tickvals=list(ia_map.values()),
-                ticktext=[f"   {label}" for label in ia_map.keys()],
-                tickfont=dict(size=16),
-                gridcolor='rgba(255, 165, 0, 0.3)'
+
+
+    fig_temp.update_layout(
+        xaxis_title="Time",
+        yaxis_title=axis_title(catalog, "cpu_temp", "Temperature"),
+        height=600, 
+        width=1400,
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend=dict(x=1.05, y=1,font=dict(size=st.session_state.get("legend_font", 35)),traceorder="normal"),
+        font=dict(size=14),
+        xaxis=dict(
+            title=dict(text="Time", font=dict(size=18)),
+            tickfont=dict(size=16)
             ),
-            yaxis2=dict(
-                title=dict(text="Package Power (W)", font=dict(size=16)),
-                tickfont=dict(size=14),
-                overlaying='y',
-                side='right',
-                showgrid=False  # ← グリッド非表示
+        yaxis=dict(
+            title=dict(text=axis_title(catalog, "cpu_temp", "Temperature"), font=dict(size=18)),
+            tickfont=dict(size=16),
+            range=[0, 130] if temp_abnormal else None
             ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-        st.plotly_chart(fig_ia, use_container_width=True)
-    else:
-        st.info("No found")
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": True,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": False,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+    return fig_temp, fig_warnings
 
-with tabs[3]:
-    st.markdown(f"## {tab_headers['GT-clip reason']}")
-    gt_clip_col = next((col for col in df.columns if "gt clip reason" in col.lower()), None)
-    if gt_clip_col:
-        gt_reasons = sorted(df[gt_clip_col].dropna().unique())
-        gt_map = {v: i+1 for i, v in enumerate(gt_reasons)}
-        df["GT_ClipReason_Mapped"] = df[gt_clip_col].map(gt_map)
 
-        fig_gt = go.Figure()
-        fig_gt.add_trace(go.Scatter(
-            x=time_vals,
-            y=df["GT_ClipReason_Mapped"],
-            mode="lines+markers",
-            line=dict(color='rgba(0, 206, 209, 1)'),
-            showlegend=False
-        ))
+# ===== Clip reason のフラグ分解（"PL1,Thermal" -> PL1 / Thermal、ファイル・列毎に1回だけ作る） =====
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_clip_flags(file_id, clip_col, _values):
+    return build_clip_flags(_values)
 
-                # ✅ ここが追加された部分（update_layoutの外）
-        if priority_col in df.columns:
-            fig_gt.add_trace(go.Scatter(
-                x=time_vals,
-                y=df[priority_col],
-                mode="lines",
-                name=priority_col,
-                yaxis="y2",
-                line=dict(color="red"),
-                showlegend=True
-            ))
-
-            fig_gt.update_layout(
-                yaxis2=dict(
-                    title=dict(text="Package Power (W)", font=dict(size=16)),  
-                    tickfont=dict(size=14),
-                    overlaying='y',
-                    side='right',
-                    showgrid=False  # ← グリッド非表示
-                )
-            )
 
-        # ✅ 元の update_layout はここでOK
-        fig_gt.update_layout(
-            height=600, width=1400,bargap=0,
-            xaxis=dict(title=dict(text="Time",font=dict(size=18)),tickfont=dict(size=16)),
-            yaxis=dict(
-                title=dict(text="GT Clip Reason",font=dict(size=18)),
-                tickmode="array",
-                tickvals=list(gt_map.values()),
-                ticktext=[f"   {label}" for label in gt_map.keys()],  # 👈 空白で左ラベルを中央寄せ風に
-                tickfont=dict(size=16),
-                gridcolor='rgba(0, 206, 209, 0.3)',
-                showgrid=True  # ← グリッド非表示
-            ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-        st.plotly_chart(fig_gt, use_container_width=True)
-    else:
-        st.info("No found")
+def show_clip_flag_queries(clip_col, key_prefix):
+    clip_flags = get_clip_flags(uploaded_file.file_id, clip_col, df[clip_col])
+    durations = sample_durations(get_range_stats(uploaded_file.file_id, df, time_vals)["time_seconds"])
 
-# === 追加: Phidgetタブ ===
-with tabs[4]:
-    st.markdown(f"## {tab_headers['Phidget']}")
+    with st.expander("🔎 Individual reason flags", expanded=False):
+        power_mask = None
+        if priority_col in df.columns:
+            power_threshold = st.number_input(
+                f"Only while {priority_col} >", min_value=0.0, value=0.0, step=1.0, key=f"{key_prefix}_power_threshold")
+            if power_threshold > 0:
+                power_mask = pd.to_numeric(df[priority_col], errors="coerce").to_numpy() > power_threshold
+        st.dataframe(flag_duration_table(clip_flags, durations, power_mask), hide_index=True, use_container_width=True)
+
+    ia_clip_col = first_col(catalog, "ia_clip")
+    gt_clip_col = first_col(catalog, "gt_clip")
+    if ia_clip_col and gt_clip_col:
+        with st.expander("🔗 IA × GT co-occurrence (s)", expanded=False):
+            st.dataframe(flag_co_occurrence(
+                get_clip_flags(uploaded_file.file_id, ia_clip_col, df[ia_clip_col]),
+                get_clip_flags(uploaded_file.file_id, gt_clip_col, df[gt_clip_col]),
+                durations
+            ), use_container_width=True)
+
+
+def build_clip_figure(clip_col, axis_title, color, grid_color):
+    # Clip reason を区間（start, end, reason）に圧縮して横棒で描画する
+    time_seconds = get_range_stats(uploaded_file.file_id, df, time_vals)["time_seconds"]
+    timeline = encode_clip_timeline(df[clip_col], time_seconds)
+    intervals = timeline["intervals"]
+
+    fig_clip = go.Figure()
+    fig_clip.add_trace(go.Bar(
+        base=intervals["start_s"],
+        x=intervals["duration_s"],
+        y=intervals["reason"],
+        orientation="h",
+        marker=dict(color=color),
+        customdata=list(zip(time_vals.iloc[intervals["start"]], time_vals.iloc[intervals["end"]])),
+        hovertemplate="%{y}<br>%{customdata[0]} - %{customdata[1]}<br>%{x:.0f} s<extra></extra>",
+        showlegend=False
+    ))
 
-    phidget_cols = [
-        col for col in df.columns
-        if "phidget" in col.lower() and "degree" in col.lower()
-    ]
+    # ✅ ここが追加された部分（update_layoutの外）
+    if priority_col in df.columns:
+        fig_clip.add_trace(go.Scatter(
+            x=time_seconds,
+            y=df[priority_col],
+            text=time_vals,
+            hovertemplate="%{text}<br>%{y:.2f}",
+            mode="lines",
+            name=priority_col,
+            yaxis="y2",
+            line=dict(color="red"),
+            showlegend=True
+        ))
 
-    if phidget_cols:
-        fig_phidget = go.Figure()
-        phidget_abnormal = False
-
-        for col in phidget_cols:
-            y_data = pd.to_numeric(df[col], errors="coerce")  # 数値変換してから使う
-            fig_phidget.add_trace(go.Scatter(
-                x=time_vals,
-                y=y_data,
-                mode='lines',
-                name=col
-            ))
-            if (y_data < 0).any() or (y_data > 100).any():  # ← ✅ 数値に変換した結果で比較
-                phidget_abnormal = True
-                st.warning(f"{col} found below 0deg or over 100deg", icon="⚠️")
-
-        yaxis_range = [0, 100] if phidget_abnormal else None
-
-        fig_phidget.update_layout(
-            xaxis_title="Time",
-            yaxis_title="Temperature (°C)",
-            height=600,
-            width=1400,
-            margin=dict(l=40, r=40, t=40, b=40),
-            legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 15)), traceorder="normal"),
-            font=dict(size=14),
-            xaxis=dict(
-                title=dict(text="Time", font=dict(size=18)),
-                tickfont=dict(size=16)
-            ),
-            yaxis=dict(
-                title=dict(text="Temperature (°C)", font=dict(size=18)),
-                tickfont=dict(size=16),
-                range=yaxis_range
-            ),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
+    tickvals, ticktext = clock_ticks(time_seconds, time_vals)
+    fig_clip.update_layout(
+        height=600, width=1400, barmode="overlay",
+        margin=dict(l=50, r=100, t=50, b=50),
+        xaxis=dict(
+            title=dict(text="Time", font=dict(size=18)),
+            tickmode="array",
+            tickvals=tickvals,
+            ticktext=ticktext,
+            range=[0, timeline["total_s"]],
+            tickfont=dict(size=16)
+        ),
+        yaxis=dict(
+            title=dict(text=axis_title, font=dict(size=18)),
+            type="category",
+            categoryorder="array",
+            categoryarray=timeline["categories"],
+            tickfont=dict(size=16),
+            gridcolor=grid_color
+        ),
+        yaxis2=dict(
+            title=dict(text="Package Power (W)", font=dict(size=16)),
+            tickfont=dict(size=14),
+            overlaying='y',
+            side='right',
+            showgrid=False  # ← グリッド非表示
+        ),
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": True,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": False,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+    return fig_clip, clip_duration_table(timeline)
 
-        st.plotly_chart(fig_phidget, use_container_width=True)
-    else:
-        st.info("No found")
+def build_phidget_figure(phidget_cols):
+    fig_warnings = []
+    fig_phidget = go.Figure()
+    phidget_abnormal = False
 
-with tabs[5]:
-    st.markdown(f"## {tab_headers['EPP&Mode']}")
+    for col in phidget_cols:
+        y_data = pd.to_numeric(df[col], errors="coerce")  # 数値変換してから使う
+        fig_phidget.add_trace(go.Scatter(
+            x=time_vals,
+            y=y_data,
+            mode='lines',
+            name=col
+        ))
+        if (y_data < 0).any() or (y_data > 100).any():  # ← ✅ 数値に変換した結果で比較
+            phidget_abnormal = True
+            fig_warnings.append(f"{col} found below 0deg or over 100deg")
+
+    yaxis_range = [0, 100] if phidget_abnormal else None
+
+    fig_phidget.update_layout(
+        xaxis_title="Time",
+        yaxis_title="Temperature (°C)",
+        height=600,
+        width=1400,
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend=dict(x=1.05, y=1, font=dict(size=st.session_state.get("legend_font", 15)), traceorder="normal"),
+        font=dict(size=14),
+        xaxis=dict(
+            title=dict(text="Time", font=dict(size=18)),
+            tickfont=dict(size=16)
+        ),
+        yaxis=dict(
+            title=dict(text="Temperature (°C)", font=dict(size=18)),
+            tickfont=dict(size=16),
+            range=yaxis_range
+        ),
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="right",
+                xanchor="right",
+                x=1.0,
+                yanchor="top",
+                y=1.08,
+                showactive=True,
+                pad={"r": 0, "t": 0},
+                buttons=[
+                    dict(
+                        label="Legend on",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": True,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    ),
+                    dict(
+                        label="Legend off",
+                        method="relayout",
+                        args=[
+                            {
+                                "showlegend": False,
+                                "updatemenus[0].x": 1.0,
+                                "updatemenus[0].xanchor": "right",
+                                "updatemenus[0].y": 1.08,
+                                "updatemenus[0].yanchor": "top"
+                            }
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+    return fig_phidget, fig_warnings
 
-    epp_col = next(
-    (col for col in df.columns
-     if all(k in col.lower() for k in ["pcore", "performance", "preference"])),
-    None
-)
-    oem_col = next((col for col in df.columns if "oem18" in col.lower()), None)
 
+def build_epp_figure(epp_col, oem_col):
     fig_epp = go.Figure()
 
-    has_data = False  # ← プロット有無の確認用フラグ
-
     # EPP → 第1軸
     if epp_col:
-        df[epp_col] = df[epp_col].apply(lambda x: round(x / 2.55) if pd.notnull(x) else x)
+        epp_values = derived_column(derived_cache, df, "epp_percent", epp_col)
         fig_epp.add_trace(go.Scatter(
             x=time_vals,
-            y=df[epp_col],
+            y=epp_values,
             mode="lines",
             name="EPP",
             yaxis="y1",
             line=dict(color="purple")
         ))
-        has_data = True
 
     # OEM18 → 第2軸
     if oem_col:
@@ -1432,123 +1367,167 @@ with tabs[5]:
             yaxis="y2",
             marker=dict(color="green")
         ))
-        has_data = True
-
-    if has_data:
-        layout = dict(
-            height=600,
-            width=1400,
-            margin=dict(l=50, r=100, t=50, b=50),
-            xaxis=dict(title="Time", tickfont=dict(size=16)),
-            yaxis=dict(
-                title=dict(text="EPP", font=dict(size=16)),
-                tickfont=dict(size=14),
-                dtick=5,
-                gridcolor='rgba(200, 150, 255, 0.17)'
-            )
+
+    layout = dict(
+        height=600,
+        width=1400,
+        margin=dict(l=50, r=100, t=50, b=50),
+        xaxis=dict(title="Time", tickfont=dict(size=16)),
+        yaxis=dict(
+            title=dict(text="EPP", font=dict(size=16)),
+            tickfont=dict(size=14),
+            dtick=5,
+            gridcolor='rgba(200, 150, 255, 0.17)'
         )
+    )
 
-        if epp_col and oem_col:
-            layout["yaxis2"] = dict(
-                title=dict(text=oem_col, font=dict(size=16)),
-                tickfont=dict(size=14),
-                overlaying='y',
-                side='right',
-                showgrid=False,
-                tickmode='linear',
-                tick0=0,
-                dtick=1
-            )
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    xanchor="right",
-                    x=1.0,
-                    yanchor="top",
-                    y=1.08,
-                    showactive=True,
-                    pad={"r": 0, "t": 0},
-                    buttons=[
-                        dict(
-                            label="Legend on",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": True,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        ),
-                        dict(
-                            label="Legend off",
-                            method="relayout",
-                            args=[
-                                {
-                                    "showlegend": False,
-                                    "updatemenus[0].x": 1.0,
-                                    "updatemenus[0].xanchor": "right",
-                                    "updatemenus[0].y": 1.08,
-                                    "updatemenus[0].yanchor": "top"
-                                }
-                            ]
-                        )
-                    ]
-                )
-            ]
-    
-        fig_epp.update_layout(**layout)
-        st.plotly_chart(fig_epp, use_container_width=True)
+    if epp_col and oem_col:
+        layout["yaxis2"] = dict(
+            title=dict(text=oem_col, font=dict(size=16)),
+            tickfont=dict(size=14),
+            overlaying='y',
+            side='right',
+            showgrid=False,
+            tickmode='linear',
+            tick0=0,
+            dtick=1
+        )
 
-        # 画像表示（DYTCテーブル）
-        dytc_html_table = """
+    fig_epp.update_layout(**layout)
+    return fig_epp, []
+
+# ==== タブ処理 ====
+if active_tab == tab_labels[0]:
+    st.markdown(f"## {tab_headers['Frequency']}")
+    # Frequency タブ専用の処理（列はカタログから取得済み）
+    if frequency_cols:
+        fig_freq, fig_warnings = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "frequency", frequency_cols, [color_map_ui[col] for col in frequency_cols], st.session_state.get("legend_font", 15)),
+            lambda: build_freq_figure(frequency_cols)
+        )
+        for message in fig_warnings:
+            st.warning(message, icon="⚠️")
+        st.plotly_chart(fig_freq, use_container_width=True)
+    else:
+        st.info("No found the column")
+if active_tab == tab_labels[1]:
+    st.markdown(f"## {tab_headers['CPU temp']}")
+
+    # CPU温度の列（DTS形式に限定せず、TempやCPU+温度のような名前も対象に）はカタログから取得済み
+    if temp_cols:
+        fig_temp, fig_warnings = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "cpu_temp", temp_cols, [color_map_ui[col] for col in temp_cols], st.session_state.get("legend_font", 35)),
+            lambda: build_temp_figure(temp_cols)
+        )
+        for message in fig_warnings:
+            st.warning(message, icon="⚠️")
+        st.plotly_chart(fig_temp, use_container_width=True)
+    else:
+        st.info("No found")
+
+if active_tab == tab_labels[2]:
+    st.markdown(f"## {tab_headers['IA-clip reason']}")
+    ia_clip_col = first_col(catalog, "ia_clip")
+
+    if ia_clip_col:
+        fig_ia, ia_durations = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "ia_clip", ia_clip_col, priority_col in df.columns),
+            lambda: build_clip_figure(ia_clip_col, "IA Clip Reason", "orange", 'rgba(255, 165, 0, 0.3)')
+        )
+        st.plotly_chart(fig_ia, use_container_width=True)
+        st.markdown("#### ⏱ Duration by reason")
+        st.dataframe(ia_durations, hide_index=True, use_container_width=True)
+        show_clip_flag_queries(ia_clip_col, "ia_clip")
+    else:
+        st.info("No found")
+
+if active_tab == tab_labels[3]:
+    st.markdown(f"## {tab_headers['GT-clip reason']}")
+    gt_clip_col = first_col(catalog, "gt_clip")
+    if gt_clip_col:
+        fig_gt, gt_durations = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "gt_clip", gt_clip_col, priority_col in df.columns),
+            lambda: build_clip_figure(gt_clip_col, "GT Clip Reason", 'rgba(0, 206, 209, 1)', 'rgba(0, 206, 209, 0.3)')
+        )
+        st.plotly_chart(fig_gt, use_container_width=True)
+        st.markdown("#### ⏱ Duration by reason")
+        st.dataframe(gt_durations, hide_index=True, use_container_width=True)
+        show_clip_flag_queries(gt_clip_col, "gt_clip")
+    else:
+        st.info("No found")
+
+# === 追加: Phidgetタブ ===
+if active_tab == tab_labels[4]:
+    st.markdown(f"## {tab_headers['Phidget']}")
+
+    phidget_cols = role_cols(catalog, "phidget")
+
+    if phidget_cols:
+        fig_phidget, fig_warnings = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "phidget", phidget_cols, st.session_state.get("legend_font", 15)),
+            lambda: build_phidget_figure(phidget_cols)
+        )
+        for message in fig_warnings:
+            st.warning(message, icon="⚠️")
+        st.plotly_chart(fig_phidget, use_container_width=True)
+    else:
+        st.info("No found")
+
+# ===== 参照テーブル（プロファイルの tables）をHTMLの表にする =====
+def lookup_table_html(table: dict) -> str:
+    header = "".join(f"<th>{escape(str(name))}</th>" for name in table["columns"])
+    body = "".join(
+        "<tr>" + "".join(f"<td>{escape(str(value))}</td>" for value in row) + "</tr>"
+        for row in table["rows"]
+    )
+    return f"""
         <style>
-        .table-custom {
+        .table-custom {{
         font-size: 18px;
         font-weight: bold;
         text-align: center;
-        }
-        .table-custom th, .table-custom td {
+        }}
+        .table-custom th, .table-custom td {{
         padding: 6px 12px;
         border: 1px solid #ccc;
-        }
+        }}
         </style>
 
         <table class="table-custom">
-        <thead>
-            <tr>
-            <th>Mode-oem18</th>
-            <th>DYTC 8 (AMO) - AC</th>
-            <th>DYTC 8 (AMO) - DC</th>
-            <th>DYTC9 (OSD) - AC</th>
-            <th>DYTC9 (OSD) - DC</th>
-            </tr>
-        </thead>
-        <tbody>
-            <tr><td>Energy saver</td><td>2</td><td>2</td><td>1</td><td>1</td></tr>
-            <tr><td>Best Power Efficiency</td><td>3</td><td>4</td><td>2</td><td>2</td></tr>
-            <tr><td>Balanced</td><td>5</td><td>6</td><td>3</td><td>3</td></tr>
-            <tr><td>Best Performance</td><td>7</td><td>8</td><td>4</td><td>4</td></tr>
-            <tr><td>Cool mode</td><td>9</td><td>10</td><td>5</td><td>5</td></tr>
-        </tbody>
+        <thead><tr>{header}</tr></thead>
+        <tbody>{body}</tbody>
         </table>
         """
 
-        st.markdown(dytc_html_table, unsafe_allow_html=True)
+if active_tab == tab_labels[5]:
+    st.markdown(f"## {tab_headers['EPP&Mode']}")
+
+    epp_col = first_col(catalog, "epp")
+    oem_col = first_col(catalog, "mode")
+
+    if epp_col or oem_col:
+        fig_epp, _ = get_or_build(
+            figure_cache,
+            figure_key(file_hash, "epp", epp_col, oem_col),
+            lambda: build_epp_figure(epp_col, oem_col)
+        )
+        st.plotly_chart(fig_epp, use_container_width=True)
+
+        # DYTCテーブル（中身はプロファイルの tables["dytc_modes"]）
+        dytc_table = lookup_table(catalog, "dytc_modes")
+        if dytc_table:
+            st.markdown(lookup_table_html(dytc_table), unsafe_allow_html=True)
 
     else:
         st.warning("No found")
 
 # ===== CoreType表示（段組＋カラーマップ対応）を成功風UIで表示 =====
-core_type_map = {}
-for col in df.columns:
-    if "core type" in col.lower():
-        core_id = col.split("-")[0]
-        core_type = df[col].iloc[0]
-        core_type_map[core_id] = core_type
+core_type_map = get_core_types(catalog, df)
 
 if core_type_map:
     grouped = {}
@@ -1,9 +1,12 @@
 import sys
 import os
+import re
+from functools import partial
 import plotly.express as px
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import tempfile
 import plotly.io as pio
@@ -21,6 +24,19 @@ from openpyxl.chart.shapes import GraphicalProperties
 from openpyxl.chart.marker import Marker
 from sensor_correlation_modules.pipeline_module_to_4 import full_logger_ptat_pipeline as pipeline_4
 from sensor_correlation_modules.pipeline_module_to_5 import full_logger_ptat_pipeline as pipeline_5
+from sensor_correlation_modules.segmentation import CHANGE_POINT_PENALTY, CHANGE_POINT_MIN_DURATION_S
+from sensor_correlation_modules.batch import (
+    batch_workbook, overlay_frame, pair_files, relabel_boundaries, relabel_experiments, run_batch, segment_correlations,
+)
+from sensor_correlation_modules.fit_stats import ALL_EXPERIMENTS, best_pairs, fit_table, sensor_ranking
+from sensor_correlation_modules.correlation_matrix import (
+    CORRELATION_METHODS, correlation_matrices, correlation_matrix_workbook, matrix_long,
+)
+from sensor_correlation_modules.lag_correlation import DEFAULT_MAX_LAG_S, lag_compensated, lag_table, lagged_name
+from viewer_modules.profile_registry import pipeline_profiles
+from viewer_modules.table_view import paged_table
+from viewer_modules.figure_cache import file_digest, figure_key, get_or_build
+from viewer_modules.range_stats import elapsed_seconds
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
@@ -110,6 +126,12 @@ with col1:
 with col2:
     st.markdown("### ")
     ptat_file = st.file_uploader("pTAT raw data", type=["csv"])
+    ptat_profile = st.selectbox(
+        "pTAT column profile",
+        [None] + list(pipeline_profiles()),
+        format_func=lambda key: "Auto-detect" if key is None else pipeline_profiles()[key]["label"],
+        key="ptat_profile",
+    )
 with radio_col:
     st.markdown("### 2️⃣ Select Experiment Split Mode")
     # 初期化フラグを使って、segment selectboxの初期化を制御
@@ -129,6 +151,40 @@ with radio_col:
         key="split_mode",
         on_change=reset_segment_defaults
     )
+    cluster_method_labels = {
+        "dp": "Exact 1-D k-means (DP)",
+        "histogram": "Histogram threshold (fast)",
+        "sklearn": "sklearn KMeans (legacy)",
+    }
+    cluster_method = st.selectbox(
+        "Power clustering",
+        list(cluster_method_labels),
+        format_func=cluster_method_labels.get,
+        key="cluster_method",
+    )
+    splitter_labels = {
+        "power_jump": "Power jump (legacy)",
+        "change_point": "Change-point detection",
+    }
+    splitter = st.selectbox(
+        "Segment splitter",
+        list(splitter_labels),
+        format_func=splitter_labels.get,
+        key="splitter",
+    )
+    cp_penalty, cp_min_duration_s = CHANGE_POINT_PENALTY, CHANGE_POINT_MIN_DURATION_S
+    if splitter == "change_point":
+        cp_cols = st.columns(2)
+        with cp_cols[0]:
+            cp_penalty = st.number_input(
+                "Penalty (× noise² · log n)", min_value=0.1, value=CHANGE_POINT_PENALTY, step=0.5, key="cp_penalty",
+                help="Higher = fewer, stronger boundaries (2 ≈ BIC)")
+        with cp_cols[1]:
+            cp_min_duration_s = st.number_input(
+                "Min segment (s)", min_value=1, value=CHANGE_POINT_MIN_DURATION_S, step=10, key="cp_min_duration_s")
+    graph_png = st.checkbox(
+        "Also embed PNG graph", value=False, key="graph_png",
+        help="The workbook always has a native Excel chart; the PNG needs Matplotlib and is slower")
 
 
 st.markdown("### 3️⃣ Select Segment Labels")
@@ -330,14 +386,27 @@ if logger_file and ptat_file:
                 with st.spinner("Processing..."):
                     full_logger_ptat_pipeline = pipeline_4 if split_mode == "4 segments" else pipeline_5
 
-                    merged_df, _ = full_logger_ptat_pipeline(
-                        logger_input_raw=logger_path,
-                        ptat_input_raw=ptat_path,
-                        merged_excel_output=output_excel
-                    )
+                    try:
+                        merged_df, logger_targets = full_logger_ptat_pipeline(
+                            logger_input_raw=logger_path,
+                            ptat_input_raw=ptat_path,
+                            merged_excel_output=output_excel,
+                            ptat_profile=ptat_profile,
+                            cluster_method=cluster_method,
+                            splitter=splitter,
+                            cp_penalty=cp_penalty,
+                            cp_min_duration_s=cp_min_duration_s,
+                            graph_png=graph_png
+                        )
+                    except ValueError as e:
+                        # pTAT の列がプロファイルに合わない（ヘッダーだけで判定、本体は読んでいない）
+                        st.error(f"❌ {e}")
+                        merged_df = None
 
                 if merged_df is not None:
                     st.success("✅ Analysis Complete!")
+                    st.session_state["segment_boundaries"] = merged_df.attrs.get("boundaries")
+                    st.session_state["logger_targets"] = list(logger_targets)
 
                     with open(output_excel, "rb") as f:
                         st.session_state["excel_bytes"] = f.read()
@@ -352,20 +421,86 @@ if "excel_bytes" in st.session_state:
 
     try:
         df = pd.read_excel(tmp_excel_path, sheet_name="Experiment Labeled")
+        excel_digest = file_digest(st.session_state["excel_bytes"])
         numeric_cols = df.select_dtypes(include='number').columns.tolist()
 
+        # 実験の境界（開始時刻・変化点の信頼度）
+        segment_boundaries = st.session_state.get("segment_boundaries")
+        if segment_boundaries is not None and len(segment_boundaries):
+            with st.expander("📍 Segment boundaries", expanded=False):
+                st.dataframe(segment_boundaries, hide_index=True, use_container_width=True)
+
         tabs = st.tabs(["Skintemp-Sensortemp", "Time-Power"])
 
         with tabs[0]:
             if len(numeric_cols) >= 2:
+                # 🧮 相関行列（全チャンネルを1回で計算してセッションにキャッシュ）。マスをクリックすると下の散布図の X/Y になる
+                picked_x, picked_y = None, None
+                with st.expander("🧮 Correlation matrix (click a cell to plot that pair)", expanded=False):
+                    matrix_cols = [col for col in numeric_cols if col != "Cluster"]
+                    matrices = get_or_build(
+                        st.session_state.setdefault("corr_matrix_cache", {}),
+                        figure_key("corr_matrix", excel_digest, matrix_cols),
+                        lambda: correlation_matrices(df, matrix_cols),
+                    )
+                    num_segments = 4 if split_mode == "4 segments" else 5
+                    matrix_exps = df["Experiment"].dropna().unique().tolist()[:num_segments] if "Experiment" in df.columns else []
+                    matrix_label_map = dict(zip(matrix_exps, selected_segments[:num_segments]))
+
+                    matrix_ctrl = st.columns(2)
+                    with matrix_ctrl[0]:
+                        matrix_method = st.radio("Method", CORRELATION_METHODS, horizontal=True, key="matrix_method")
+                    with matrix_ctrl[1]:
+                        matrix_exp = st.selectbox(
+                            "Experiment", [ALL_EXPERIMENTS] + matrix_exps, key="matrix_exp",
+                            format_func=lambda exp: matrix_label_map.get(exp, exp))
+
+                    cells = matrix_long(matrices[(matrix_method, matrix_exp)])
+                    cell_size = max(6, min(28, 640 // max(len(matrix_cols), 1)))
+                    fig_matrix = go.Figure(go.Scatter(
+                        x=cells["X"], y=cells["Y"], mode="markers",
+                        marker=dict(
+                            symbol="square", size=cell_size, color=cells["r"], cmin=-1, cmax=1,
+                            colorscale="RdBu_r", colorbar=dict(title="r"),
+                        ),
+                        customdata=cells["r"],
+                        hovertemplate="X: %{x}<br>Y: %{y}<br>r = %{customdata:.3f}<extra></extra>",
+                    ))
+                    fig_matrix.update_layout(
+                        template="simple_white", height=max(400, cell_size * len(matrix_cols) + 200),
+                        xaxis=dict(categoryorder="array", categoryarray=matrix_cols, tickangle=-45),
+                        yaxis=dict(categoryorder="array", categoryarray=matrix_cols[::-1]),
+                        title=f"{matrix_method} correlation - {matrix_label_map.get(matrix_exp, matrix_exp)}",
+                    )
+                    matrix_event = st.plotly_chart(
+                        fig_matrix, use_container_width=True, on_select="rerun", selection_mode="points", key="corr_matrix_chart")
+                    points = matrix_event.selection.points if matrix_event else []
+                    if points:
+                        pick = (points[0]["x"], points[0]["y"])
+                        # 新しくクリックされた時だけ X/Y を置き換える（以降はセレクトボックスで自由に変えられる）
+                        if pick[0] != pick[1] and pick != st.session_state.get("corr_pick_applied"):
+                            st.session_state["corr_pick_applied"] = pick
+                            st.session_state.pop("x1", None)
+                            st.session_state.pop("y1", None)
+                            picked_x, picked_y = pick
+
+                    st.download_button(
+                        label="📥 Output XLSX Correlation Matrix",
+                        data=partial(correlation_matrix_workbook, matrices, matrix_label_map),
+                        file_name="Correlation_Matrix.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        key="matrix-download",
+                    )
+
                 row1_col1, row1_col2 = st.columns(2)
 
                 with row1_col1:
-                    col_x = st.selectbox("Select X-axis column", numeric_cols, index=0, key="x1")
+                    x_index = numeric_cols.index(picked_x) if picked_x in numeric_cols else 0
+                    col_x = st.selectbox("Select X-axis column", numeric_cols, index=x_index, key="x1")
 
                 with row1_col2:
                     y_options = [col for col in numeric_cols if col != col_x]
-                    current_y = st.session_state.get("y1", y_options[0])
+                    current_y = st.session_state.get("y1", picked_y or y_options[0])
                     if current_y in y_options:
                         y_index = y_options.index(current_y)
                     else:
@@ -403,6 +538,28 @@ if "excel_bytes" in st.session_state:
                         df_filtered = df[df["Experiment"].isin(selected_exps)]
                     else:
                         df_filtered = df.copy()
+
+                # ⏱️ 時間遅れ（FFT相互相関）。補正ありの時は Y を区間毎に求めた遅れだけずらした列 "Y (+lag)" を X と対応づける
+                # （散布図・回帰・出力するシートはその列を使い、元の Y の列は書き換えない）
+                col_y_plot = col_y
+                _, elapsed_all = elapsed_seconds(df["Time"]) if "Time" in df.columns else (None, np.arange(len(df), dtype=float))
+                row4_col1, row4_col2, _ = st.columns([2, 2, 4])
+                with row4_col1:
+                    lag_compensate = st.checkbox(
+                        "⏱️ Lag-compensated scatter", value=False, key="lag_compensate",
+                        help="Pair X(t) with Y(t + lag), using the lag with the highest cross-correlation in each experiment")
+                with row4_col2:
+                    max_lag_s = st.number_input("Max lag (s)", min_value=5, value=DEFAULT_MAX_LAG_S, step=30, key="max_lag_s")
+                if lag_compensate:
+                    df_filtered, pair_lags = lag_compensated(
+                        df_filtered, elapsed_all[df_filtered.index.to_numpy()], col_x, col_y, max_lag_s)
+                    col_y_plot = lagged_name(col_y)
+                    lag_notes = [
+                        f"{exp_display_map.get(exp, exp) if 'Experiment' in df.columns else exp}: {lag:+.0f} s (r={r:.3f})"
+                        for exp, lag, r in pair_lags[["Experiment", "Lag (s)", "r at lag"]].itertuples(index=False)
+                    ]
+                    st.caption("Lag of Y behind X → " + " / ".join(lag_notes))
+
                 # 色をPlotlyの順番で固定
                 plotly_colors = px.colors.qualitative.Plotly
                 color_map = {seg: plotly_colors[i % len(plotly_colors)] for i, seg in enumerate(effective_segments)}
@@ -441,6 +598,9 @@ if "excel_bytes" in st.session_state:
                     opacity=0.7
                 )
 
+                # 選択中の X/Y の回帰直線（実験毎）
+                pair_fits = fit_table(df_filtered, [col_x], [col_y_plot]).set_index("Experiment")
+
                 if "Experiment" in df.columns:
                     unique_exps = df_filtered["Experiment"].dropna().unique().tolist()
                     px_colors = px.colors.qualitative.Plotly
@@ -452,12 +612,22 @@ if "excel_bytes" in st.session_state:
                         exp_df = df_filtered[df_filtered["Experiment"] == exp]
                         fig.add_trace(go.Scatter(
                             x=exp_df[col_x],
-                            y=exp_df[col_y],
+                            y=exp_df[col_y_plot],
                             mode="markers",
                             name=seg_label,
                             marker=dict(color=color_map[seg_label]),
                             opacity=point_opacity
                         ))
+                        fit = pair_fits.loc[exp] if exp in pair_fits.index else None
+                        if fit is not None and pd.notna(fit["Slope"]):
+                            x_range = pd.to_numeric(exp_df[col_x], errors="coerce").agg(["min", "max"]).to_numpy()
+                            fig.add_trace(go.Scatter(
+                                x=x_range,
+                                y=fit["Slope"] * x_range + fit["Intercept"],
+                                mode="lines",
+                                name=f"{seg_label} fit (R²={fit['R²']:.3f})",
+                                line=dict(color=color_map[seg_label], dash="dash", width=2),
+                            ))
 
                 fig.add_vline(
                     x=bal_val,
@@ -484,7 +654,7 @@ if "excel_bytes" in st.session_state:
 
                 fig.update_layout(
                     xaxis=dict(title=col_x, range=[25, 60], title_font=dict(size=18), tickfont=dict(size=14)),
-                    yaxis=dict(title=col_y, range=[25, 60], title_font=dict(size=18), tickfont=dict(size=14)),
+                    yaxis=dict(title=col_y_plot, range=[25, 60], title_font=dict(size=18), tickfont=dict(size=14)),
                     legend=dict(title="Experiment", font=dict(size=14)),
                     width=800,
                     height=870,
@@ -500,21 +670,21 @@ if "excel_bytes" in st.session_state:
                         excel_path=tmp_excel_path,
                         df_corr=df_filtered,
                         col_x=col_x,
-                        col_y=col_y
+                        col_y=col_y_plot
                     )
 
                     # Sensor Correlation グラフをA8に追加
                     add_sensor_correlation_chart(
                         excel_path=tmp_excel_path,
                         col_x=col_x,
-                        col_y=col_y,
+                        col_y=col_y_plot,
                         legend_names=effective_segments
                     )
 
                     add_sensor_correlation_chart_with_colors(
                         excel_path=tmp_excel_path,
                         col_x=col_x,
-                        col_y=col_y,
+                        col_y=col_y_plot,
                         legend_names=effective_segments,  # 例: ["pTAT+Fur", "pTAT", ...]
                         color_map=color_map               # Plotlyで使ったのと同じ辞書
                     )
@@ -530,6 +700,56 @@ if "excel_bytes" in st.session_state:
                         )
                     st.plotly_chart(fig, use_container_width=True)
 
+                    # 📐 回帰の統計（実験毎 + 全体）
+                    fit_view = pair_fits.reset_index()
+                    if "Experiment" in df.columns:
+                        fit_view["Experiment"] = fit_view["Experiment"].map(
+                            lambda exp: exp if exp == ALL_EXPERIMENTS else exp_display_map.get(exp, exp))
+                    st.markdown(f"##### 📐 Fit: {col_y_plot} = Slope × {col_x} + Intercept")
+                    st.dataframe(fit_view.drop(columns=["Skin", "Sensor"]), hide_index=True, use_container_width=True)
+
+                    # 🏆 表面温度を一番よく説明するセンサー（全センサー列 × 表面温度列を一括計算、ファイル毎にキャッシュ）
+                    with st.expander("🏆 Sensor ranking (best predictors of skin temperature)", expanded=False):
+                        skin_cols = [col for col in st.session_state.get("logger_targets", []) if col in numeric_cols]
+                        sensor_cols = [col for col in numeric_cols if col not in skin_cols and col != "Cluster" and "Power" not in col]
+                        if skin_cols and sensor_cols:
+                            fits = get_or_build(
+                                st.session_state.setdefault("fit_cache", {}),
+                                figure_key("fits", excel_digest, sensor_cols, skin_cols),
+                                lambda: fit_table(df, sensor_cols, skin_cols),
+                            )
+                            experiment_names = [ALL_EXPERIMENTS] + [exp for exp in fits["Experiment"].unique() if exp != ALL_EXPERIMENTS]
+                            rank_cols = st.columns(2)
+                            with rank_cols[0]:
+                                rank_skin = st.selectbox("Skin temperature", skin_cols, key="rank_skin")
+                            with rank_cols[1]:
+                                rank_experiment = st.selectbox(
+                                    "Experiment", experiment_names, key="rank_experiment",
+                                    format_func=lambda exp: exp_display_map.get(exp, exp) if "Experiment" in df.columns else exp)
+                            st.dataframe(sensor_ranking(fits, rank_skin, rank_experiment), hide_index=True, use_container_width=True)
+                            st.markdown("##### Best sensor for each skin temperature")
+                            st.dataframe(best_pairs(fits, rank_experiment), hide_index=True, use_container_width=True)
+                        else:
+                            st.info("Run the analysis to identify the logger (skin) columns.")
+
+                    # ⏱️ 全センサー × 表面温度の時間遅れ（区間毎、ファイル毎にキャッシュ）
+                    with st.expander("⏱️ Sensor lag (cross-correlation)", expanded=False):
+                        if skin_cols and sensor_cols:
+                            lags = get_or_build(
+                                st.session_state.setdefault("lag_cache", {}),
+                                figure_key("lags", excel_digest, sensor_cols, skin_cols, max_lag_s),
+                                lambda: lag_table(df, elapsed_all, sensor_cols, skin_cols, max_lag_s),
+                            )
+                            lag_skin = st.selectbox("Skin temperature", skin_cols, key="lag_skin")
+                            lag_view = lags[lags["Skin"] == lag_skin].drop(columns=["Skin"])
+                            if "Experiment" in df.columns:
+                                lag_view = lag_view.assign(Experiment=lag_view["Experiment"].map(lambda exp: exp_display_map.get(exp, exp)))
+                            st.dataframe(
+                                lag_view.sort_values(["Experiment", "r at lag"], ascending=[True, False]),
+                                hide_index=True, use_container_width=True)
+                        else:
+                            st.info("Run the analysis to identify the logger (skin) columns.")
+
                     # try:
                     #     png_bytes = pio.to_image(fig, format="png")
                     #     st.download_button("📥 Download Chart as PNG", data=png_bytes, file_name="chart.png", mime="image/png")
@@ -540,7 +760,7 @@ if "excel_bytes" in st.session_state:
                         cols_to_show = [col_x, col_y]
                         if "Experiment" in df.columns:
                             cols_to_show.append("Experiment")
-                        st.dataframe(df[cols_to_show])
+                        paged_table(df[cols_to_show], key="raw_data_table", frame_id=(excel_digest, tuple(cols_to_show)))
            
 
         with tabs[1]:
@@ -564,3 +784,134 @@ if "excel_bytes" in st.session_state:
 
     except Exception as e:
         st.error(f"Error reading Excel file: {e}")
+
+
+# ===== 🗂️ バッチモード（複数台のロガー/pTATペア） =====
+st.markdown("---")
+with st.expander("🗂️ Batch mode: correlate many logger/pTAT pairs", expanded=False):
+    batch_cols = st.columns(2)
+    with batch_cols[0]:
+        batch_loggers = st.file_uploader("Logger raw data (multiple)", type=None, accept_multiple_files=True, key="batch_loggers")
+    with batch_cols[1]:
+        batch_ptats = st.file_uploader("pTAT raw data (multiple)", type=["csv"], accept_multiple_files=True, key="batch_ptats")
+
+    pair_cols = st.columns([2, 3, 2])
+    with pair_cols[0]:
+        pair_mode = st.radio(
+            "Pair files by", ["pattern", "order"], horizontal=True, key="batch_pair_mode",
+            format_func={"pattern": "File name", "order": "Upload order"}.get)
+    with pair_cols[1]:
+        pair_pattern = st.text_input(
+            "Unit ID regex (optional)", value="", key="batch_pair_pattern", disabled=pair_mode == "order",
+            help=r"e.g. (SN\d+). Blank = file name without words like logger / pTAT / raw")
+    with pair_cols[2]:
+        batch_workers = st.number_input(
+            "Worker processes", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1, step=1,
+            key="batch_workers")
+
+    batch_loggers = batch_loggers or []
+    batch_ptats = batch_ptats or []
+    try:
+        pairs, unmatched_loggers, unmatched_ptats = pair_files(
+            [f.name for f in batch_loggers], [f.name for f in batch_ptats], mode=pair_mode, pattern=pair_pattern or None)
+    except re.error as e:
+        st.error(f"Invalid regex: {e}")
+        pairs, unmatched_loggers, unmatched_ptats = [], [], []
+
+    if pairs:
+        st.dataframe(pd.DataFrame({
+            "Unit": [name for name, _, _ in pairs],
+            "Logger": [batch_loggers[i].name for _, i, _ in pairs],
+            "pTAT": [batch_ptats[j].name for _, _, j in pairs],
+        }), hide_index=True, use_container_width=True)
+    if unmatched_loggers or unmatched_ptats:
+        st.warning("⚠️ Not paired: " + ", ".join(
+            [batch_loggers[i].name for i in unmatched_loggers] + [batch_ptats[j].name for j in unmatched_ptats]))
+
+    if pairs and st.button(f"🚀 Run Batch ({len(pairs)} pairs)", key="run-batch"):
+        batch_results, batch_boundaries, batch_errors = {}, [], {}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            jobs = []
+            for n, (name, i, j) in enumerate(pairs):
+                logger_path = os.path.join(tmpdir, f"{n:03d}_{batch_loggers[i].name}")
+                ptat_path = os.path.join(tmpdir, f"{n:03d}_{batch_ptats[j].name}")
+                with open(logger_path, "wb") as f:
+                    f.write(batch_loggers[i].getvalue())
+                with open(ptat_path, "wb") as f:
+                    f.write(batch_ptats[j].getvalue())
+                jobs.append({
+                    "name": name,
+                    "logger_path": logger_path,
+                    "ptat_path": ptat_path,
+                    "split_mode": split_mode,
+                    "options": {
+                        "ptat_profile": ptat_profile,
+                        "cluster_method": cluster_method,
+                        "splitter": splitter,
+                        "cp_penalty": cp_penalty,
+                        "cp_min_duration_s": cp_min_duration_s,
+                    },
+                })
+
+            progress = st.progress(0.0, text=f"0 / {len(jobs)} pairs done")
+            for done, result in enumerate(run_batch(jobs, workers=int(batch_workers)), start=1):
+                progress.progress(done / len(jobs), text=f"{done} / {len(jobs)} pairs done (last: {result['name']})")
+                if result["error"]:
+                    batch_errors[result["name"]] = result["error"]
+                    st.write(f"❌ {result['name']}: {result['error']}")
+                    continue
+                st.write(f"✅ {result['name']}")
+                batch_results[result["name"]] = result["labeled"]
+                if result["boundaries"] is not None and len(result["boundaries"]):
+                    batch_boundaries.append(result["boundaries"].assign(Unit=result["name"]))
+
+        # 並列実行なので終わった順になる -> ペアの順に戻す
+        order = [name for name, _, _ in pairs]
+        st.session_state["batch_results"] = {name: batch_results[name] for name in order if name in batch_results}
+        st.session_state["batch_boundaries"] = (
+            pd.concat(batch_boundaries, ignore_index=True)[["Unit", "Experiment", "Start", "Confidence"]]
+            if batch_boundaries else None)
+        st.session_state["batch_errors"] = batch_errors
+
+    if st.session_state.get("batch_results"):
+        num_segments = 4 if split_mode == "4 segments" else 5
+        batch_results = {
+            name: relabel_experiments(df, selected_segments[:num_segments])
+            for name, df in st.session_state["batch_results"].items()
+        }
+        batch_boundaries = relabel_boundaries(
+            st.session_state.get("batch_boundaries"), st.session_state["batch_results"], selected_segments[:num_segments])
+        frames = list(batch_results.values())
+        batch_numeric_cols = [
+            col for col in frames[0].select_dtypes(include="number").columns
+            if all(col in df.columns for df in frames[1:])
+        ]
+        if len(batch_numeric_cols) >= 2:
+            axis_cols = st.columns(2)
+            with axis_cols[0]:
+                batch_x = st.selectbox("Select X-axis column", batch_numeric_cols, index=0, key="batch_x")
+            with axis_cols[1]:
+                batch_y_options = [col for col in batch_numeric_cols if col != batch_x]
+                batch_y = st.selectbox("Select Y-axis column", batch_y_options, index=0, key="batch_y")
+
+            overlay = overlay_frame(batch_results, batch_x, batch_y)
+            summary = segment_correlations(overlay, batch_x, batch_y)
+            st.markdown("#### 📈 Per-segment correlation")
+            st.dataframe(summary, hide_index=True, use_container_width=True)
+
+            fig_batch = px.scatter(
+                overlay, x=batch_x, y=batch_y, color="Unit", symbol="Experiment",
+                render_mode="webgl", opacity=0.6, template="simple_white", height=700,
+            )
+            fig_batch.update_traces(marker=dict(size=5))
+            st.plotly_chart(fig_batch, use_container_width=True)
+
+            st.download_button(
+                label="📥 Output XLSX Batch Correlation",
+                data=partial(batch_workbook, summary, overlay, batch_boundaries, batch_x, batch_y),
+                file_name="Batch_Correlation.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="batch-download",
+            )
+        else:
+            st.warning("⚠️ The units have fewer than 2 numeric columns in common.")
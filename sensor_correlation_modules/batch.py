@@ -0,0 +1,215 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# ===== バッチ相関（複数台のロガー/pTATペアをまとめて処理） =====
+# ペアはファイル名から取り出した「ユニットID」で対応づけるか、アップロード順で対応づける。
+# パイプラインは1ペア1ジョブとしてワーカープロセスで並列に実行し、終わった順に結果を返す（進捗表示用）。
+# ワーカーは spawn で起動する（マルチスレッドの Streamlit サーバーを fork しない）。ワークブックは作らず、ラベル付きの表だけ返す。
+# 区間毎の相関は全ユニット分を1つのDataFrameにまとめて groupby の合計（Σx, Σy, Σx², Σy², Σxy）から一括で計算する。
+
+ALL_UNITS = "(All units)"
+# logger/pTAT などの語は区切り文字（_ - 空白 .）で区切られた単語の時だけ除く（"Dialog" の "log" は残す）
+_ROLE_WORDS_RE = re.compile(r"(?:^|(?<=[_\-\s.]))(?:ptat|logger|log|raw|data)(?=$|[_\-\s.])", re.IGNORECASE)
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+# ===== ファイルの対応づけ =====
+def pair_key(filename: str, pattern: str = None):
+    # pattern あり: 最初のグループ（なければ一致全体）。なし: 拡張子と logger/pTAT などの語を除いた英数字
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    if pattern:
+        match = re.search(pattern, stem)
+        if match is None:
+            return None
+        return match.group(1) if match.groups() else match.group(0)
+    return _NON_ALNUM_RE.sub("", _ROLE_WORDS_RE.sub("", stem).lower()) or stem
+
+
+def pair_files(logger_names, ptat_names, mode: str = "pattern", pattern: str = None):
+    # 戻り値: ([(ユニット名, loggerの番号, pTATの番号), ...], 対応のないloggerの番号, 対応のないpTATの番号)
+    if mode == "order":
+        count = min(len(logger_names), len(ptat_names))
+        names = [pair_key(logger_names[i]) for i in range(count)]
+        # 同じ名前が続いた時は "#2", "#3" ... を付けて区別する
+        names = [name if names[:i].count(name) == 0 else f"{name}#{names[:i].count(name) + 1}" for i, name in enumerate(names)]
+        pairs = [(names[i], i, i) for i in range(count)]
+        return pairs, list(range(count, len(logger_names))), list(range(count, len(ptat_names)))
+
+    ptat_index = {}
+    for i, name in enumerate(ptat_names):
+        key = pair_key(name, pattern)
+        if key is not None:
+            ptat_index.setdefault(key, i)
+    pairs, unmatched_loggers, used = [], [], set()
+    for i, name in enumerate(logger_names):
+        key = pair_key(name, pattern)
+        j = ptat_index.get(key)
+        if key is None or j is None or j in used:
+            unmatched_loggers.append(i)
+            continue
+        pairs.append((key, i, j))
+        used.add(j)
+    unmatched_ptats = [j for j in range(len(ptat_names)) if j not in used]
+    return pairs, unmatched_loggers, unmatched_ptats
+
+
+# ===== 並列実行 =====
+def run_pair(job: dict) -> dict:
+    # ワーカープロセスで実行される（spawn でも import できるようにモジュールのトップレベルに置く）
+    from sensor_correlation_modules.pipeline_module_to_4 import full_logger_ptat_pipeline as pipeline_4
+    from sensor_correlation_modules.pipeline_module_to_5 import full_logger_ptat_pipeline as pipeline_5
+
+    pipeline = pipeline_4 if job["split_mode"] == "4 segments" else pipeline_5
+    result = {"name": job["name"], "labeled": None, "boundaries": None, "error": None}
+    try:
+        merged_df, _, labeled_df = pipeline(
+            logger_input_raw=job["logger_path"],
+            ptat_input_raw=job["ptat_path"],
+            merged_excel_output=None,
+            return_labeled=True,
+            **job.get("options", {}),
+        )
+        if merged_df is None:
+            result["error"] = "Failed to read or merge the files"
+            return result
+        result["labeled"] = labeled_df
+        result["boundaries"] = merged_df.attrs.get("boundaries")
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def run_batch(jobs: list, workers: int = None):
+    # 終わった順に結果を yield する。workers=1 ならプロセスを作らずその場で実行
+    workers = max(min(len(jobs), workers or os.cpu_count() or 1), 1)
+    if workers == 1:
+        for job in jobs:
+            yield run_pair(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(run_pair, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# ===== 集計 =====
+def experiment_label_map(df: pd.DataFrame, labels) -> dict:
+    # 単体解析と同じく、出てきた順の Experiment -> 画面で選んだラベル
+    order = df["Experiment"].dropna().unique().tolist()[:len(labels)]
+    return dict(zip(order, labels))
+
+
+def relabel_experiments(df: pd.DataFrame, labels) -> pd.DataFrame:
+    if "Experiment" not in df.columns:
+        return df
+    df = df.copy()
+    df["Experiment"] = df["Experiment"].map(experiment_label_map(df, labels))
+    return df
+
+
+def relabel_boundaries(boundaries: pd.DataFrame, results: dict, labels):
+    # Segment Boundaries の Experiment もユニット毎に relabel_experiments と同じ対応で置き換える
+    if boundaries is None:
+        return None
+    boundaries = boundaries.copy()
+    for unit, df in results.items():
+        if "Experiment" not in df.columns:
+            continue
+        rows = boundaries["Unit"] == unit
+        boundaries.loc[rows, "Experiment"] = boundaries.loc[rows, "Experiment"].map(experiment_label_map(df, labels))
+    return boundaries
+
+
+def overlay_frame(results: dict, col_x: str, col_y: str) -> pd.DataFrame:
+    # results: {ユニット名: Experiment Labeled のDataFrame} -> Unit / Experiment / x / y の縦長DataFrame
+    frames = []
+    for name, df in results.items():
+        if col_x not in df.columns or col_y not in df.columns:
+            continue
+        experiment = df["Experiment"] if "Experiment" in df.columns else pd.Series(np.nan, index=df.index)
+        frames.append(pd.DataFrame({
+            "Unit": name,
+            "Experiment": experiment.to_numpy(),
+            col_x: pd.to_numeric(df[col_x], errors="coerce").to_numpy(),
+            col_y: pd.to_numeric(df[col_y], errors="coerce").to_numpy(),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["Unit", "Experiment", col_x, col_y])
+    return pd.concat(frames, ignore_index=True).dropna(subset=["Experiment", col_x, col_y])
+
+
+def _fit_table(sums: pd.DataFrame) -> pd.DataFrame:
+    n = sums["n"]
+    sxx = sums["xx"] - sums["x"] ** 2 / n
+    syy = sums["yy"] - sums["y"] ** 2 / n
+    sxy = sums["xy"] - sums["x"] * sums["y"] / n
+    slope = sxy / sxx.where(sxx > 0)
+    return pd.DataFrame({
+        "N": n.astype(int),
+        "Pearson r": sxy / np.sqrt((sxx * syy).where(sxx * syy > 0)),
+        "Slope": slope,
+        "Intercept": (sums["y"] - slope * sums["x"]) / n,
+        "Mean X": sums["x"] / n,
+        "Mean Y": sums["y"] / n,
+    })
+
+
+def segment_correlations(overlay: pd.DataFrame, col_x: str, col_y: str) -> pd.DataFrame:
+    # ユニット×区間の相関・回帰直線と、全ユニットをまとめた区間毎の値（Unit = ALL_UNITS）
+    x = overlay[col_x].to_numpy(dtype=float)
+    y = overlay[col_y].to_numpy(dtype=float)
+    terms = pd.DataFrame({
+        "Unit": overlay["Unit"].to_numpy(), "Experiment": overlay["Experiment"].to_numpy(),
+        "n": 1.0, "x": x, "y": y, "xx": x * x, "yy": y * y, "xy": x * y,
+    })
+    per_unit = terms.groupby(["Unit", "Experiment"], sort=False).sum()
+    pooled = per_unit.groupby(level="Experiment", sort=False).sum()
+    pooled.index = pd.MultiIndex.from_product([[ALL_UNITS], pooled.index], names=["Unit", "Experiment"])
+    table = _fit_table(pd.concat([per_unit, pooled]))
+    return table.reset_index()
+
+
+# ===== まとめのワークブック（xlsxwriter でメモリ上に作成） =====
+def batch_workbook(summary: pd.DataFrame, overlay: pd.DataFrame, boundaries: pd.DataFrame,
+                   col_x: str, col_y: str) -> bytes:
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        summary.to_excel(writer, sheet_name="Correlation Summary", index=False)
+        if boundaries is not None and len(boundaries):
+            boundaries.to_excel(writer, sheet_name="Segment Boundaries", index=False)
+
+        # ユニット毎に (x, y) の2列ずつ並べ、グラフの系列はその範囲を参照する
+        units = overlay["Unit"].unique().tolist()
+        blocks = [
+            overlay.loc[overlay["Unit"] == unit, [col_x, col_y]]
+            .set_axis([f"{col_x} ({unit})", f"{col_y} ({unit})"], axis=1)
+            .reset_index(drop=True)
+            for unit in units
+        ]
+        data_sheet = "Overlay Data"
+        if blocks:
+            pd.concat(blocks, axis=1).to_excel(writer, sheet_name=data_sheet, index=False)
+
+        workbook = writer.book
+        chart_sheet = workbook.add_worksheet("Overlay")
+        chart = workbook.add_chart({"type": "scatter"})
+        for i, (unit, block) in enumerate(zip(units, blocks)):
+            chart.add_series({
+                "name": str(unit),
+                "categories": [data_sheet, 1, 2 * i, len(block), 2 * i],
+                "values": [data_sheet, 1, 2 * i + 1, len(block), 2 * i + 1],
+                "marker": {"type": "circle", "size": 3},
+            })
+        chart.set_title({"name": f"{col_y} vs {col_x} (all units)"})
+        chart.set_x_axis({"name": col_x, "major_gridlines": {"visible": True}})
+        chart.set_y_axis({"name": col_y, "major_gridlines": {"visible": True}})
+        chart.set_legend({"position": "right"})
+        chart.set_size({"width": 1100, "height": 700})
+        chart_sheet.insert_chart("B2", chart)
+    return output.getvalue()
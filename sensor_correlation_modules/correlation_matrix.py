@@ -0,0 +1,63 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from sensor_correlation_modules.fit_stats import ALL_EXPERIMENTS, pair_fit_matrix
+
+# ===== 相関行列（全数値チャンネル × 全数値チャンネル） =====
+# Pearson は行列積で作った和から全ペアを一括計算（欠損はペア毎に除外）。
+# Spearman は区間毎に各列を順位（同順位は平均順位）に変換してから同じ計算をする。
+# 順位は列毎の非欠損値で付けるので、片方だけ欠損の行があるペアは pandas の corr(method="spearman") とわずかに違う。
+# 区間（Experiment）毎 + 全区間を1回でまとめて作り、{(method, experiment): DataFrame} で返す。
+
+CORRELATION_METHODS = ["Pearson", "Spearman"]
+
+
+def correlation_matrices(df: pd.DataFrame, cols, group_col: str = "Experiment") -> dict:
+    cols = list(cols)
+    values = df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    groups = [(ALL_EXPERIMENTS, np.ones(len(df), dtype=bool))]
+    if group_col in df.columns:
+        labels = df[group_col].to_numpy()
+        groups += [(label, labels == label) for label in df[group_col].dropna().unique()]
+
+    matrices = {}
+    for label, rows in groups:
+        block = values[rows]
+        ranks = pd.DataFrame(block).rank(method="average").to_numpy(dtype=float)  # 区間内で順位を付ける
+        for method, x in (("Pearson", block), ("Spearman", ranks)):
+            r = pair_fit_matrix(x, x)["Pearson r"]
+            matrices[(method, label)] = pd.DataFrame(r, index=cols, columns=cols)
+    return matrices
+
+
+def matrix_long(matrix: pd.DataFrame) -> pd.DataFrame:
+    # ヒートマップ（散布図のマス目）用の縦長データ: X = 列, Y = 行, r
+    long = matrix.stack(future_stack=True).rename("r").reset_index()
+    long.columns = ["Y", "X", "r"]
+    return long
+
+
+def correlation_matrix_workbook(matrices: dict, label_map: dict = None) -> bytes:
+    # 1枚のシート "Correlation Matrix" に method × 区間 の行列を縦に並べる（-1..1 の3色カラースケール付き）
+    label_map = label_map or {}
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        sheet_name = "Correlation Matrix"
+        workbook = writer.book
+        title_format = workbook.add_format({"bold": True, "font_size": 12})
+        row = 0
+        for (method, label), matrix in matrices.items():
+            matrix.to_excel(writer, sheet_name=sheet_name, startrow=row + 1)
+            worksheet = writer.sheets[sheet_name]
+            worksheet.write(row, 0, f"{method} - {label_map.get(label, label)}", title_format)
+            worksheet.conditional_format(row + 2, 1, row + 1 + len(matrix), len(matrix.columns), {
+                "type": "3_color_scale",
+                "min_type": "num", "min_value": -1, "min_color": "#2166AC",
+                "mid_type": "num", "mid_value": 0, "mid_color": "#F7F7F7",
+                "max_type": "num", "max_value": 1, "max_color": "#B2182B",
+            })
+            row += len(matrix) + 4
+        writer.sheets[sheet_name].set_column(0, 0, 32)
+    return output.getvalue()
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# ===== 回帰・当てはめ統計（センサー温度 -> 表面温度） =====
+# 全センサー列 X (n×p) と全表面温度列 Y (n×q) の組み合わせを、行列積で作った和（Σx, Σy, Σx², Σy², Σxy, 件数）から一括で計算する。
+# 欠損は組み合わせ毎に除外（両方に値がある行だけ使う）。区間（Experiment）毎 + 全区間まとめて（ALL_EXPERIMENTS）。
+# Slope = 伝達係数（センサー1℃あたりの表面温度の変化）、Offset = 平均(表面 - センサー)、RMSE = 回帰直線の残差の二乗平均平方根。
+
+ALL_EXPERIMENTS = "(All)"
+FIT_COLUMNS = ["N", "Slope", "Intercept", "Offset", "Pearson r", "R²", "RMSE"]
+
+
+def _as_matrix(df: pd.DataFrame, cols) -> np.ndarray:
+    return df[list(cols)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+
+def pair_fit_matrix(x: np.ndarray, y: np.ndarray) -> dict:
+    # x: (n, p), y: (n, q) -> 各統計量の (p, q) 行列
+    mx, my = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(mx, x, 0.0), np.where(my, y, 0.0)
+    mx, my = mx.astype(float), my.astype(float)
+
+    n = mx.T @ my
+    sx, sy = x0.T @ my, mx.T @ y0
+    sxx, syy = (x0 * x0).T @ my, mx.T @ (y0 * y0)
+    sxy = x0.T @ y0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cxx = sxx - sx * sx / n
+        cyy = syy - sy * sy / n
+        cxy = sxy - sx * sy / n
+        slope = np.where(cxx > 0, cxy / cxx, np.nan)
+        r = np.where((cxx > 0) & (cyy > 0), cxy / np.sqrt(cxx * cyy), np.nan)
+        r = np.clip(r, -1.0, 1.0)
+        residual = np.maximum(cyy - slope * cxy, 0.0)
+        return {
+            "N": n.astype(int),
+            "Slope": slope,
+            "Intercept": (sy - slope * sx) / n,
+            "Offset": (sy - sx) / n,
+            "Pearson r": r,
+            "R²": r * r,
+            "RMSE": np.sqrt(residual / n),
+        }
+
+
+def _long_table(stats: dict, sensor_cols, skin_cols) -> pd.DataFrame:
+    p, q = len(sensor_cols), len(skin_cols)
+    table = pd.DataFrame({
+        "Skin": np.tile(np.asarray(skin_cols, dtype=object), p),
+        "Sensor": np.repeat(np.asarray(sensor_cols, dtype=object), q),
+    })
+    for name in FIT_COLUMNS:
+        table[name] = stats[name].reshape(p * q)
+    return table
+
+
+def fit_table(df: pd.DataFrame, sensor_cols, skin_cols, group_col: str = "Experiment") -> pd.DataFrame:
+    # 戻り値: Experiment / Skin / Sensor / N / Slope / Intercept / Offset / Pearson r / R² / RMSE
+    sensor_cols, skin_cols = list(sensor_cols), list(skin_cols)
+    x, y = _as_matrix(df, sensor_cols), _as_matrix(df, skin_cols)
+    groups = [(ALL_EXPERIMENTS, np.ones(len(df), dtype=bool))]
+    if group_col in df.columns:
+        labels = df[group_col].to_numpy()
+        groups += [(label, labels == label) for label in df[group_col].dropna().unique()]
+
+    tables = []
+    for label, rows in groups:
+        table = _long_table(pair_fit_matrix(x[rows], y[rows]), sensor_cols, skin_cols)
+        table.insert(0, "Experiment", label)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def sensor_ranking(fits: pd.DataFrame, skin: str, experiment=ALL_EXPERIMENTS, min_samples: int = 10) -> pd.DataFrame:
+    # 表面温度 skin を一番よく説明するセンサーの順位（R² の大きい順、同じなら RMSE の小さい順）
+    ranking = fits[(fits["Skin"] == skin) & (fits["Experiment"] == experiment) & (fits["N"] >= min_samples)]
+    ranking = ranking[ranking["Sensor"] != skin].dropna(subset=["R²"])
+    ranking = ranking.sort_values(["R²", "RMSE"], ascending=[False, True], ignore_index=True)
+    ranking.insert(0, "Rank", np.arange(1, len(ranking) + 1))
+    return ranking.drop(columns=["Skin", "Experiment"])
+
+
+def best_pairs(fits: pd.DataFrame, experiment=ALL_EXPERIMENTS, min_samples: int = 10) -> pd.DataFrame:
+    # 表面温度の列毎に一番 R² の高いセンサー
+    rows = fits[(fits["Experiment"] == experiment) & (fits["N"] >= min_samples) & (fits["Sensor"] != fits["Skin"])]
+    rows = rows.dropna(subset=["R²"]).sort_values(["R²", "RMSE"], ascending=[False, True])
+    return rows.drop_duplicates("Skin").reset_index(drop=True)
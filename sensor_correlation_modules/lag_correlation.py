@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from sensor_correlation_modules.fit_stats import ALL_EXPERIMENTS
+
+# ===== 時間遅れを考慮した相互相関（センサー -> 表面温度） =====
+# 熱は遅れて伝わるので、同じ時刻のサンプル同士の相関だけでなく、表面温度を ±max_lag 秒ずらした相関を全部調べて最大になる遅れを探す。
+# 経過秒で等間隔のグリッドに並べ直し（マージで抜けた行は線形補間）、標準化した列を FFT で一括して相互相関を計算する（O(n log n)）。
+# r(k) = Σ x_t · y_(t+k) / (重なりの件数)。Lag > 0 は「表面温度がセンサーより遅れて変化する」。
+# N は両方に値のある元のサンプル数（補間したグリッドの長さではない）。
+
+DEFAULT_MAX_LAG_S = 300
+LAG_COLUMNS = ["N", "Lag (s)", "r at lag", "r at 0 s"]
+
+
+def uniform_grid(time_s, values: np.ndarray):
+    # 経過秒 -> (等間隔の時刻, 等間隔に並べ直した値 (m, k), サンプル間隔[秒])
+    time_s = np.asarray(time_s, dtype=float)
+    values = np.asarray(values, dtype=float).reshape(len(time_s), -1)
+    steps = np.diff(time_s)
+    dt = float(np.median(steps[steps > 0])) if (steps > 0).any() else 1.0
+    if not len(time_s):
+        return time_s, values, dt
+    grid = time_s[0] + dt * np.arange(int(round((time_s[-1] - time_s[0]) / dt)) + 1)
+    gridded = np.empty((len(grid), values.shape[1]))
+    for j in range(values.shape[1]):
+        valid = ~np.isnan(values[:, j])
+        gridded[:, j] = np.interp(grid, time_s[valid], values[valid, j]) if valid.sum() >= 2 else np.nan
+    return grid, gridded, dt
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = values.std(axis=0)
+        return np.where(std > 0, (values - values.mean(axis=0)) / std, np.nan)
+
+
+def cross_correlation_lags(time_s, x: np.ndarray, y: np.ndarray, max_lag_s: float = DEFAULT_MAX_LAG_S) -> dict:
+    # x: (n, p) センサー, y: (n, q) 表面温度 -> 各統計量の (p, q) 行列
+    time_s = np.asarray(time_s, dtype=float)
+    x = np.asarray(x, dtype=float).reshape(len(time_s), -1)
+    y = np.asarray(y, dtype=float).reshape(len(time_s), -1)
+    p = x.shape[1]
+    _, gridded, dt = uniform_grid(time_s, np.column_stack([x, y]))
+    zx, zy = _standardize(gridded[:, :p]), _standardize(gridded[:, p:])
+    m, q = len(gridded), zy.shape[1]
+    result = {
+        "N": (~np.isnan(x)).astype(int).T @ (~np.isnan(y)).astype(int),
+        "Lag (s)": np.full((p, q), np.nan),
+        "r at lag": np.full((p, q), np.nan),
+        "r at 0 s": np.full((p, q), np.nan),
+    }
+    if m < 3:
+        return result
+
+    max_lag = int(min(max_lag_s / dt, m // 2))
+    lags = np.arange(-max_lag, max_lag + 1)
+    overlap = (m - np.abs(lags)).astype(float)
+    nfft = 1 << int(2 * m - 1).bit_length()  # 循環の回り込みが起きない長さ（2のべき）
+    fx = np.fft.rfft(np.nan_to_num(zx), n=nfft, axis=0)
+    fy = np.fft.rfft(np.nan_to_num(zy), n=nfft, axis=0)
+    for j in range(q):
+        # irfft(conj(X)·Y)[k] = Σ x_t · y_(t+k)  （負の k は末尾に回り込む）
+        corr = np.fft.irfft(np.conj(fx) * fy[:, j:j + 1], n=nfft, axis=0)[lags % nfft] / overlap[:, None]
+        corr = np.clip(corr, -1.0, 1.0)  # 平均・標準偏差は全体で取るので重なりが短いとわずかに ±1 を超える
+        corr[:, np.isnan(zx[0]) | np.isnan(zy[0, j])] = np.nan
+        best = np.nanargmax(np.where(np.isnan(corr), -np.inf, corr), axis=0)
+        result["Lag (s)"][:, j] = lags[best] * dt
+        result["r at lag"][:, j] = corr[best, np.arange(p)]
+        result["r at 0 s"][:, j] = corr[max_lag]
+    return result
+
+
+def lag_table(df: pd.DataFrame, time_s, sensor_cols, skin_cols, max_lag_s: float = DEFAULT_MAX_LAG_S,
+              group_col: str = "Experiment") -> pd.DataFrame:
+    # 戻り値: Experiment / Skin / Sensor / N / Lag (s) / r at lag / r at 0 s
+    sensor_cols, skin_cols = list(sensor_cols), list(skin_cols)
+    time_s = np.asarray(time_s, dtype=float)
+    x = df[sensor_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    y = df[skin_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    groups = [(ALL_EXPERIMENTS, np.ones(len(df), dtype=bool))]
+    if group_col in df.columns:
+        labels = df[group_col].to_numpy()
+        groups += [(label, labels == label) for label in df[group_col].dropna().unique()]
+
+    tables = []
+    p, q = len(sensor_cols), len(skin_cols)
+    for label, rows in groups:
+        stats = cross_correlation_lags(time_s[rows], x[rows], y[rows], max_lag_s)
+        table = pd.DataFrame({
+            "Experiment": label,
+            "Skin": np.tile(np.asarray(skin_cols, dtype=object), p),
+            "Sensor": np.repeat(np.asarray(sensor_cols, dtype=object), q),
+        })
+        for name in LAG_COLUMNS:
+            table[name] = stats[name].reshape(p * q)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def compensate_lag(time_s, values, lag_s: float) -> np.ndarray:
+    # t の行に t + lag_s の値を持ってくる（範囲外は NaN）
+    time_s = np.asarray(time_s, dtype=float)
+    values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    if valid.sum() < 2 or np.isnan(lag_s):
+        return values
+    target = time_s + lag_s
+    shifted = np.interp(target, time_s[valid], values[valid])
+    return np.where((target < time_s[valid][0]) | (target > time_s[valid][-1]), np.nan, shifted)
+
+
+def lagged_name(col: str) -> str:
+    return f"{col} (+lag)"
+
+
+def lag_compensated(df: pd.DataFrame, time_s, col_x: str, col_y: str, max_lag_s: float = DEFAULT_MAX_LAG_S,
+                    group_col: str = "Experiment"):
+    # 区間毎に col_x -> col_y の遅れを求め、col_y をその分ずらした列 lagged_name(col_y) を足したコピーと遅れの表を返す
+    # （元の col_y は書き換えない。ずらした値が元の列名のまま出力されないように）
+    time_s = np.asarray(time_s, dtype=float)
+    lags = lag_table(df, time_s, [col_x], [col_y], max_lag_s, group_col)
+    df = df.copy()
+    if group_col not in df.columns:
+        lag_s = lags["Lag (s)"].iloc[0]
+        df[lagged_name(col_y)] = compensate_lag(time_s, df[col_y], lag_s)
+        return df, lags
+
+    shifted = pd.to_numeric(df[col_y], errors="coerce").to_numpy(dtype=float).copy()
+    labels = df[group_col].to_numpy()
+    for label, lag_s in lags.loc[lags["Experiment"] != ALL_EXPERIMENTS, ["Experiment", "Lag (s)"]].itertuples(index=False):
+        rows = labels == label
+        shifted[rows] = compensate_lag(time_s[rows], shifted[rows], lag_s)
+    df[lagged_name(col_y)] = shifted
+    return df, lags
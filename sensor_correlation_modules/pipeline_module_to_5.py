@@ -1,45 +1,55 @@
 import pandas as pd
-import os
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
+from sensor_correlation_modules.segmentation import (
+    cluster_1d, experiment_boundaries, CHANGE_POINT_PENALTY, CHANGE_POINT_MIN_DURATION_S,
+)
 import xlsxwriter
-from openpyxl import load_workbook
+from viewer_modules.log_readers import read_table_file, read_table_header
+from sensor_correlation_modules.ptat_schema import explicit_columns, select_ptat_columns
+from viewer_modules.range_stats import elapsed_seconds
+from sensor_correlation_modules.segment_chart import (
+    add_segmentation_chart, boundary_columns, excel_time, segmentation_png,
+)
 
 def full_logger_ptat_pipeline(
     logger_input_raw,
     ptat_input_raw,
     merged_excel_output,
-    ptat_columns=[
-        "Time", "Power-IA Power(Watts)", "Power-GT Power(Watts)", "Power-Package Power(Watts)",
-        "SEN1-temp(Degree C)", "SEN2-temp(Degree C)", "SEN3-temp(Degree C)",
-        "SEN4-temp(Degree C)", "SEN5-temp(Degree C)", "SEN6-temp(Degree C)", "TCPU-CPU-temp(Degree C)"
-    ]):
-
-    def convert_to_utf8_csv(input_file):
-        filename, ext = os.path.splitext(input_file)
-        ext = ext.lower()
-        output_file = filename + '_utf8.csv'
+    ptat_columns=None,
+    ptat_profile=None,
+    cluster_method="dp",
+    splitter="power_jump",
+    cp_penalty=CHANGE_POINT_PENALTY,
+    cp_min_duration_s=CHANGE_POINT_MIN_DURATION_S,
+    graph_png=False,
+    return_labeled=False):
+    # return_labeled=True 이면 (merged_df, logger_targets, "Experiment Labeled" 시트와 같은 DataFrame) 을 반환
+    failed = (None, [], None) if return_labeled else (None, [])
+
+    def load_table(input_file, header="infer", usecols=None):
+        # CSV / XLS / XLSX 는 앞부분 바이트로 판별해서 한 번에 읽음 (_utf8.csv 는 만들지 않음)
         try:
-            try:
-                with open(input_file, 'rb') as f:
-                    first_bytes = f.read(3)
-                encoding = 'utf-8-sig' if first_bytes.startswith(b'\xef\xbb\xbf') else 'cp949'
-                df = pd.read_csv(input_file, encoding=encoding, low_memory=False)
-            except Exception:
-                if ext == '.xls':
-                    df = pd.read_excel(input_file, engine='xlrd')
-                elif ext == '.xlsx':
-                    df = pd.read_excel(input_file, engine='openpyxl')
-                else:
-                    raise
-            df.to_csv(output_file, index=False, encoding='utf-8-sig')
-            return output_file
+            return read_table_file(input_file, header=header, usecols=usecols)
         except Exception as e:
             return None
 
-    def extract_logger_columns(input_file, min_val=0, max_val=75, time_label="Time"):
-        output_file = input_file.replace(".csv", "_selected_columns.csv")
-        df = pd.read_csv(input_file, encoding='utf-8-sig', header=None, low_memory=False)
+    def load_ptat(input_file):
+        # 헤더만 먼저 읽어서 프로파일(또는 ptat_columns)로 열을 검증하고, 필요한 열만 로드
+        # 읽기 실패도 ValueError 로 올려서 화면에 원인을 표시 (None 을 돌려주면 메시지 없이 끝남)
+        try:
+            header = read_table_header(input_file)
+        except Exception as e:
+            raise ValueError(f"pTAT file could not be read: {e}") from e
+        if ptat_columns:
+            selection = explicit_columns(header, ptat_columns)
+        else:
+            selection = select_ptat_columns(header, ptat_profile)  # 맞지 않으면 ValueError
+        try:
+            df = read_table_file(input_file, usecols=selection["usecols"])  # 열 위치로 지정（중복・빈 열 이름도 OK）
+        except Exception as e:
+            raise ValueError(f"pTAT file could not be read: {e}") from e
+        return df.rename(columns=selection["rename"])[selection["columns"]]
+
+    def extract_logger_columns(df, min_val=0, max_val=75, time_label="Time"):
         header_row = df.iloc[8]
         time_row = df.iloc[9]
         data = df.iloc[10:].copy()
@@ -66,9 +76,13 @@ def full_logger_ptat_pipeline(
         selected_headers.iloc[0] = time_label
         selected_data.columns = selected_headers
         selected_data = selected_data.rename(columns={time_label: "Time"})
+        # 센서 값은 숫자로 (예전에는 CSV 로 저장 후 다시 읽으면서 변환되었음)
+        selected_data = pd.concat(
+            [selected_data.iloc[:, :1], selected_data.iloc[:, 1:].apply(pd.to_numeric, errors="coerce")], axis=1
+        )
 
-        # 🔸 시간 컬럼 처리 및 정렬
-        selected_data["Time"] = pd.to_datetime(selected_data["Time"], format="%H:%M:%S", errors="coerce")
+        # 🔸 시간 컬럼 처리 및 정렬 (Excel 의 시각 셀은 datetime.time 이므로 문자열로 변환 후 파싱)
+        selected_data["Time"] = pd.to_datetime(selected_data["Time"].astype(str), format="%H:%M:%S", errors="coerce")
         selected_data = selected_data.dropna(subset=["Time"]).sort_values("Time").reset_index(drop=True)
 
         # 🔸 1초 간격 확장
@@ -77,18 +91,12 @@ def full_logger_ptat_pipeline(
         df_expanded.iloc[1::2, 1:] = df_expanded.iloc[::2, 1:].values
         df_expanded = df_expanded.sort_values("Time").reset_index(drop=True)
         df_expanded["Time"] = df_expanded["Time"].dt.strftime("%H:%M:%S")
+        return df_expanded, selected_headers[1:].tolist()
 
-        # 🔸 저장
-        df_expanded.to_csv(output_file, index=False, encoding='utf-8-sig')
-        return output_file, selected_headers[1:].tolist()
-
-    def merge_and_save(logger_path, ptat_path, output_excel):
-        df_logger = pd.read_csv(logger_path, encoding='utf-8-sig')
-        df_ptat = pd.read_csv(ptat_path, encoding='utf-8-sig')
+    def merge_and_save(df_logger, df_ptat, output_excel):
 
         df_logger["Time"] = pd.to_datetime(df_logger["Time"], format="%H:%M:%S", errors='coerce')
         df_ptat["Time"] = df_ptat["Time"].astype(str).str.strip().str.split(":").str[:3].str.join(":")
-        df_ptat = df_ptat[ptat_columns]
         df_ptat["Time"] = pd.to_datetime(df_ptat["Time"], format="%H:%M:%S", errors='coerce')
 
         df_logger.dropna(subset=["Time"], inplace=True)
@@ -108,35 +116,52 @@ def full_logger_ptat_pipeline(
         df["Time"] = pd.to_datetime(df["Time"], format="%H:%M:%S", errors='coerce')
         df = df.dropna(subset=["Time", "Power-Package Power(Watts)"]).reset_index(drop=True)
         df["Power_Smoothed"] = df["Power-Package Power(Watts)"].rolling(10, min_periods=1).mean()
-        kmeans = KMeans(n_clusters=5, random_state=42, n_init='auto')  # 🔸 5개 클러스터
-        df["Cluster"] = kmeans.fit_predict(df[["Power_Smoothed"]])
-
-        cluster_df = df[df["Cluster"] == 0].copy().reset_index(drop=True)
-        avg_powers = []
-        for i in range(len(cluster_df)):
-            t = cluster_df.loc[i, "Time"]
-            future = cluster_df[(cluster_df["Time"] >= t) & (cluster_df["Time"] <= t + pd.Timedelta(seconds=5))]
-            avg_powers.append(future["Power-Package Power(Watts)"].mean() if not future.empty else None)
-
-        cluster_df["Power_5s_Avg"] = avg_powers
-        cluster_df["Power_Jump"] = cluster_df["Power_5s_Avg"] - cluster_df["Power-Package Power(Watts)"]
-
-        jump_candidates = cluster_df[cluster_df["Power_Jump"].notna()].copy()
-        jump_candidates = jump_candidates[jump_candidates["Power_Jump"] > 0]
-        jump_candidates = jump_candidates.sort_values("Power_Jump", ascending=False).reset_index()
-
-        selected_jumps = []
-        min_index_gap = 30
-        for idx in jump_candidates.index:
-            i = jump_candidates.loc[idx, "index"]
-            if all(abs(i - j) >= min_index_gap for j in selected_jumps):
-                selected_jumps.append(i)
-            if len(selected_jumps) == 5:  # 🔸 5개 점프 선택
-                break
+        # 🔸 5개 클러스터 (1차원 DP k-means, 번호는 평균 전력 순서라 0 = 아이들)
+        df["Cluster"] = cluster_1d(df["Power_Smoothed"], 5, method=cluster_method)
+
+        experiment_labels = ["TAT+Fur", "TAT", "Fur", "Prime95", "Charging"]  # 🔸 실험 이름 5개
+        if splitter == "change_point":
+            # 패키지 전력의 변화점(이분할법)에서 상승 폭이 큰 순서로 실험 시작점을 선택
+            cluster_df = df.copy()
+            _, elapsed = elapsed_seconds(cluster_df["Time"])
+            points = experiment_boundaries(
+                cluster_df["Power-Package Power(Watts)"], elapsed, len(experiment_labels),
+                penalty=cp_penalty, min_duration_s=cp_min_duration_s,
+            )
+            selected_jumps = points["index"].tolist()
+        else:
+            cluster_df = df[df["Cluster"] == 0].copy().reset_index(drop=True)
+            avg_powers = []
+            for i in range(len(cluster_df)):
+                t = cluster_df.loc[i, "Time"]
+                future = cluster_df[(cluster_df["Time"] >= t) & (cluster_df["Time"] <= t + pd.Timedelta(seconds=5))]
+                avg_powers.append(future["Power-Package Power(Watts)"].mean() if not future.empty else None)
+
+            cluster_df["Power_5s_Avg"] = avg_powers
+            cluster_df["Power_Jump"] = cluster_df["Power_5s_Avg"] - cluster_df["Power-Package Power(Watts)"]
+
+            jump_candidates = cluster_df[cluster_df["Power_Jump"].notna()].copy()
+            jump_candidates = jump_candidates[jump_candidates["Power_Jump"] > 0]
+            jump_candidates = jump_candidates.sort_values("Power_Jump", ascending=False).reset_index()
+
+            selected_jumps = []
+            min_index_gap = 30
+            for idx in jump_candidates.index:
+                i = jump_candidates.loc[idx, "index"]
+                if all(abs(i - j) >= min_index_gap for j in selected_jumps):
+                    selected_jumps.append(i)
+                if len(selected_jumps) == 5:  # 🔸 5개 점프 선택
+                    break
+
+            points = pd.DataFrame({"index": sorted(selected_jumps), "confidence": float("nan")})
 
         selected_jumps = sorted(selected_jumps)
         split_indices = selected_jumps + [len(cluster_df)]
-        experiment_labels = ["TAT+Fur", "TAT", "Fur", "Prime95", "Charging"]  # 🔸 실험 이름 5개
+        boundaries = pd.DataFrame({
+            "Experiment": experiment_labels[:len(selected_jumps)],
+            "Start": cluster_df.loc[selected_jumps, "Time"].dt.strftime("%H:%M:%S").to_numpy(),
+            "Confidence": points["confidence"].to_numpy(),
+        })
 
         cluster_df["Experiment"] = None
         for i in range(len(split_indices) - 1):
@@ -150,65 +175,59 @@ def full_logger_ptat_pipeline(
             direction="backward"
         )
 
-        image_path = excel_path.replace(".xlsx", "_graph.png")
-        colors = ['blue', 'green', 'orange', 'red', 'purple']
-        plt.figure(figsize=(14, 6))
-        for i in range(len(split_indices) - 1):
-            start, end = split_indices[i], split_indices[i+1]
-            segment = cluster_df.iloc[start:end]
-            plt.plot(segment["Time"], segment["Power-Package Power(Watts)"], label=experiment_labels[i], color=colors[i])
-        for idx in selected_jumps:
-            plt.axvline(cluster_df.loc[idx, "Time"], color='black', linestyle='--')
-        plt.title("Cluster 1: 5 Experiments (Power Jump Based Segmentation)")
-        plt.xlabel("Time")
-        plt.ylabel("Power-Package Power(Watts)")
-        plt.grid(True)
-        plt.legend()
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(image_path)
-        plt.close()
-
-        with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
-            df["Time"] = pd.to_datetime(df["Time"], errors="coerce").dt.strftime("%H:%M:%S")
-            df_with_exp["Time"] = pd.to_datetime(df_with_exp["Time"], errors="coerce").dt.strftime("%H:%M:%S")
-
-            df.to_excel(writer, sheet_name='Full Data', index=False)
-            df_with_exp.to_excel(writer, sheet_name='Experiment Labeled', index=False)
-
-            # Pivot 시트 생성
-            experiment_segments = []
-            for label in df_with_exp["Experiment"].dropna().unique():
-                segment = df_with_exp[df_with_exp["Experiment"] == label][["Time", "Power-Package Power(Watts)"]].copy()
-                segment["Time"] = pd.to_datetime(segment["Time"], errors="coerce").dt.strftime("%H:%M:%S")
-                segment.columns = [f"Time ({label})", f"Power ({label})"]
-                experiment_segments.append(segment.reset_index(drop=True))
-
-            pivoted_df = pd.concat(experiment_segments, axis=1)
-            pivoted_df.to_excel(writer, sheet_name="Experiment Pivoted", index=False)
-
-            # グラフ挿入
-            workbook = writer.book
-            worksheet = workbook.add_worksheet('Graph')
-            worksheet.insert_image('B2', image_path)
-
-        # === Step 2: openpyxl で開き直して veryHidden を設定 ===
-        from openpyxl import load_workbook
-        wb = load_workbook(excel_path)
-        for sheetname in ["Experiment Labeled", "Experiment Pivoted"]:
-            if sheetname in wb.sheetnames:
-                ws = wb[sheetname]
-                ws.sheet_state = "veryHidden"
-        wb.save(excel_path)
-    logger_utf8 = convert_to_utf8_csv(logger_input_raw)
-    ptat_utf8 = convert_to_utf8_csv(ptat_input_raw)
-    if not logger_utf8 or not ptat_utf8:
-        return None, []
-
-    logger_filtered, logger_targets = extract_logger_columns(logger_utf8)
-    if not logger_filtered:
-        return None, []
-
-    merged_df = merge_and_save(logger_filtered, ptat_utf8, merged_excel_output)
-    cluster_and_export(merged_df, merged_excel_output)
+        colors = dict(zip(experiment_labels, ['blue', 'green', 'orange', 'red', 'purple']))
+        graph_title = "Cluster 1: 5 Experiments (Power Jump Based Segmentation)"
+
+        df["Time"] = pd.to_datetime(df["Time"], errors="coerce").dt.strftime("%H:%M:%S")
+        df_with_exp["Time"] = pd.to_datetime(df_with_exp["Time"], errors="coerce").dt.strftime("%H:%M:%S")
+
+        # excel_path=None 이면 워크북은 만들지 않고 라벨링 결과만 반환 (배치 모드)
+        if excel_path is not None:
+            with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
+                df.to_excel(writer, sheet_name='Full Data', index=False)
+                df_with_exp.to_excel(writer, sheet_name='Experiment Labeled', index=False)
+
+                # Pivot 시트 생성
+                experiment_segments = []
+                for label in df_with_exp["Experiment"].dropna().unique():
+                    segment = df_with_exp[df_with_exp["Experiment"] == label][["Time", "Power-Package Power(Watts)"]].copy()
+                    segment["Time"] = excel_time(segment["Time"])
+                    segment.columns = [f"Time ({label})", f"Power ({label})"]
+                    experiment_segments.append(segment.reset_index(drop=True))
+
+                boundary_df = boundary_columns(
+                    cluster_df.loc[selected_jumps, "Time"], cluster_df.loc[selected_jumps, "Power-Package Power(Watts)"])
+                pivoted_df = pd.concat(experiment_segments + [boundary_df], axis=1)
+                pivoted_df.to_excel(writer, sheet_name="Experiment Pivoted", index=False)
+
+                # 그래프 삽입 (Pivot 시트를 참조하는 Excel 차트. PNG 는 graph_png 지정 시에만, 파일로는 저장하지 않음)
+                workbook = writer.book
+                worksheet = workbook.add_worksheet('Graph')
+                add_segmentation_chart(workbook, worksheet, pivoted_df, "Experiment Pivoted", colors, graph_title)
+                if graph_png:
+                    image = segmentation_png(cluster_df, split_indices, selected_jumps, experiment_labels, colors, graph_title)
+                    worksheet.insert_image('B32', "graph.png", {"image_data": image})
+
+                # 시트 숨김(veryHidden)은 쓰는 시점에 설정 (openpyxl 로 워크북을 다시 열어서 저장하지 않음)
+                for sheetname in ["Experiment Labeled", "Experiment Pivoted"]:
+                    writer.sheets[sheetname].very_hidden()
+        return boundaries, df_with_exp
+
+    ptat_raw = load_ptat(ptat_input_raw)
+    logger_raw = load_table(logger_input_raw, header=None)
+    if logger_raw is None or ptat_raw is None:
+        return failed
+    if len(logger_raw) < 10:
+        # 9번째 행이 열 이름, 10번째 행이 "Time" 행. 그보다 짧은 파일은 로거 로그가 아님
+        raise ValueError(f"Logger file has only {len(logger_raw)} rows; expected the header block and data rows")
+
+    logger_filtered, logger_targets = extract_logger_columns(logger_raw)
+    if logger_filtered is None:
+        return failed
+
+    merged_df = merge_and_save(logger_filtered, ptat_raw, merged_excel_output)
+    # 실험 경계(시작 시각・신뢰도)는 merged_df.attrs["boundaries"] 로 전달
+    merged_df.attrs["boundaries"], labeled_df = cluster_and_export(merged_df, merged_excel_output)
+    if return_labeled:
+        return merged_df, logger_targets, labeled_df
     return merged_df, logger_targets
@@ -0,0 +1,60 @@
+from viewer_modules.profile_registry import get_profile, pipeline_profiles, pipeline_role_patterns
+
+# ===== pTAT の列選択（プラットフォーム毎のプロファイル） =====
+# 列は viewer_modules/profiles/*.py の pipeline_roles（役割毎の正規表現。前後の空白・大文字小文字は無視）で探す。
+# name のある役割はパイプラインが使う名前にそろえ、multiple=True の役割（SENx-temp など）は一致した列を元の名前のまま全部使う。
+# ヘッダー行だけ読んで先に検証し、必要な列だけを位置で指定して読み込む（列の多い pTAT ファイルでも全列はパースしない。
+# 列名が重複・空でも位置なら一意に選べる）。
+# profile=None ならヘッダーに必須の役割が全部そろう最初のプロファイル（ファイル名順）を使う。
+
+
+def resolve_columns(header, profile_key: str) -> dict:
+    # 戻り値: {"usecols": 読む列の位置, "rename": 元の名前 -> パイプラインの名前, "columns": 読み込み後の列順, "missing": 見つからない必須の役割}
+    # header は read_table_header の列名（重複は "name.1"）なので、読み込んだ後の列名と同じ
+    usecols, rename, columns, missing = [], {}, [], []
+    for role, pattern in pipeline_role_patterns(profile_key):
+        matches = [i for i, col in enumerate(header) if i not in usecols and pattern.search(str(col).strip())]
+        if not role.get("multiple"):
+            matches = matches[:1]
+        if not matches:
+            if role.get("required"):
+                missing.append(role["role"])
+            continue
+        for i in matches:
+            usecols.append(i)
+            col = header[i]
+            name = role.get("name", col)
+            if name in columns:
+                continue  # 同じ名前になる列は最初のものだけ
+            rename[col] = name
+            columns.append(name)
+    return {"usecols": usecols, "rename": rename, "columns": columns, "missing": missing}
+
+
+def detect_profile(header):
+    for profile_key in pipeline_profiles():
+        if not resolve_columns(header, profile_key)["missing"]:
+            return profile_key
+    return None
+
+
+def select_ptat_columns(header, profile_key: str = None) -> dict:
+    # ヘッダーだけで検証。合わなければ読み込む前に ValueError
+    profile_key = profile_key or detect_profile(header)
+    if profile_key is None:
+        raise ValueError("pTAT columns not recognized by any profile (need Time and Package Power columns)")
+    selection = resolve_columns(header, profile_key)
+    if selection["missing"]:
+        label = get_profile(profile_key)["label"]
+        raise ValueError(f"pTAT file does not match profile '{label}': missing {', '.join(selection['missing'])}")
+    selection["profile"] = profile_key
+    return selection
+
+
+def explicit_columns(header, ptat_columns) -> dict:
+    # 列名をそのまま指定された時（従来の ptat_columns）も同じ形で返す
+    usecols = [header.index(col) for col in ptat_columns if col in header]
+    missing = [col for col in ptat_columns if col not in header]
+    if missing:
+        raise ValueError(f"pTAT columns not found: {', '.join(missing)}")
+    return {"usecols": usecols, "rename": {}, "columns": list(ptat_columns), "missing": [], "profile": None}
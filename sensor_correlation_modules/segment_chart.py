@@ -0,0 +1,110 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from viewer_modules.log_readers import clock_seconds
+
+# ===== 区間分割のプレビュー（Excel ネイティブのグラフ） =====
+# "Experiment Pivoted" シートの値を参照する散布図（直線）を作るだけなので、Matplotlib の import・ラスタライズが不要。
+# 時刻は Excel の時刻値（1日 = 1.0）で書いておき、X 軸を hh:mm:ss 表示にする。
+# 境界は2つ目の系列（マーカー + 0 W までの縦線）で表す。PNG は graph_png=True の時だけメモリ上で作る。
+
+BOUNDARY_TIME = "Boundary Time"
+BOUNDARY_POWER = "Boundary Power"
+
+
+def excel_time(time_text) -> np.ndarray:
+    # "hh:mm:ss" -> Excel の時刻値（不正は NaN）
+    return clock_seconds(time_text) / 86400
+
+
+def boundary_columns(times, powers) -> pd.DataFrame:
+    return pd.DataFrame({
+        BOUNDARY_TIME: excel_time(pd.Series(times).dt.strftime("%H:%M:%S")),
+        BOUNDARY_POWER: np.asarray(powers, dtype=float),
+    })
+
+
+def _last_row(values: pd.Series) -> int:
+    # 列の最後の値がある行（シート上の行番号、ヘッダー = 0）
+    last = values.last_valid_index()
+    return 0 if last is None else int(last) + 1
+
+
+def add_segmentation_chart(workbook, worksheet, pivoted_df: pd.DataFrame, sheet_name: str,
+                           colors: dict, title: str, cell: str = "B2"):
+    time_format = workbook.add_format({"num_format": "hh:mm:ss"})
+    columns = list(pivoted_df.columns)
+    chart = workbook.add_chart({"type": "scatter", "subtype": "straight"})
+
+    for col, name in enumerate(columns):
+        if not name.startswith("Time ("):
+            continue
+        label = name[len("Time ("):-1]
+        last = _last_row(pivoted_df[f"Power ({label})"])
+        chart.add_series({
+            "name": label,
+            "categories": [sheet_name, 1, col, last, col],
+            "values": [sheet_name, 1, col + 1, last, col + 1],
+            "line": {"color": colors.get(label, "gray"), "width": 1.25},
+            "marker": {"type": "none"},
+        })
+
+    if BOUNDARY_TIME in columns:
+        col = columns.index(BOUNDARY_TIME)
+        last = _last_row(pivoted_df[BOUNDARY_POWER])
+        chart.add_series({
+            "name": "Boundary",
+            "categories": [sheet_name, 1, col, last, col],
+            "values": [sheet_name, 1, col + 1, last, col + 1],
+            "line": {"none": True},
+            "marker": {"type": "diamond", "size": 7, "fill": {"color": "black"}, "border": {"color": "black"}},
+            "y_error_bars": {
+                "type": "percentage", "value": 100, "direction": "minus", "end_style": 0,
+                "line": {"color": "black", "dash_type": "dash"},
+            },
+        })
+
+    # 時刻列は Excel 上でも hh:mm:ss で見えるように
+    pivot_sheet = workbook.get_worksheet_by_name(sheet_name)
+    for col, name in enumerate(columns):
+        if name.startswith("Time (") or name == BOUNDARY_TIME:
+            pivot_sheet.set_column(col, col, 10, time_format)
+
+    chart.set_title({"name": title})
+    chart.set_x_axis({
+        "name": "Time", "num_format": "hh:mm:ss", "num_font": {"rotation": -45},
+        "major_gridlines": {"visible": True},
+    })
+    chart.set_y_axis({"name": "Power-Package Power(Watts)", "major_gridlines": {"visible": True}})
+    chart.set_legend({"position": "bottom"})
+    chart.show_hidden_data()  # 参照先の Pivot シートは veryHidden
+    chart.set_size({"width": 1344, "height": 576})
+    worksheet.insert_chart(cell, chart)
+
+
+def segmentation_png(cluster_df: pd.DataFrame, split_indices, selected_jumps, labels, colors: dict, title: str) -> BytesIO:
+    # 従来の Matplotlib 画像（ファイルには保存しない）
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(14, 6))
+    ax = fig.subplots()
+    for i in range(len(split_indices) - 1):
+        start, end = split_indices[i], split_indices[i + 1]
+        segment = cluster_df.iloc[start:end]
+        ax.plot(segment["Time"], segment["Power-Package Power(Watts)"], label=labels[i], color=colors[labels[i]])
+    for idx in selected_jumps:
+        ax.axvline(cluster_df.loc[idx, "Time"], color='black', linestyle='--')
+    ax.set_title(title)
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Power-Package Power(Watts)")
+    ax.grid(True)
+    ax.legend()
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+
+    image = BytesIO()
+    fig.savefig(image, format="png")
+    image.seek(0)
+    return image
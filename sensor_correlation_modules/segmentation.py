@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+# ===== 1次元クラスタリング（パッケージ電力のレベル分け） =====
+# 1次元なら k-means は並べ替え + 動的計画法で厳密解が求まる（初期値に依存せず毎回同じ結果）。
+# クラスタ番号は平均電力の小さい順（0 = アイドル側）にそろえる。sklearn は "sklearn" を選んだ時だけ import する。
+
+HISTOGRAM_BINS = 256
+
+
+def _dp_boundaries(x: np.ndarray, w: np.ndarray, k: int) -> np.ndarray:
+    # 並べ替え済みの x（重み w）を k 個の連続区間に分けた時の区切り位置（各区間の先頭インデックス）
+    n = len(x)
+    cw = np.concatenate([[0.0], np.cumsum(w)])
+    c1 = np.concatenate([[0.0], np.cumsum(w * x)])
+    c2 = np.concatenate([[0.0], np.cumsum(w * x * x)])
+
+    def cost(m, i):
+        # 区間 [m, i) の重み付き二乗誤差
+        weight = cw[i] - cw[m]
+        total = c1[i] - c1[m]
+        return np.maximum(c2[i] - c2[m] - total * total / np.maximum(weight, 1e-300), 0.0)
+
+    prev = np.full(n + 1, np.inf)
+    prev[1:] = cost(np.zeros(n, dtype=int), np.arange(1, n + 1))
+    opts = []
+    for j in range(2, k + 1):
+        cur = np.full(n + 1, np.inf)
+        opt = np.zeros(n + 1, dtype=int)
+        # 分割統治（最適な区切りは i について単調）を深さ毎にまとめてベクトル化
+        lo_i, hi_i = np.array([j]), np.array([n])
+        lo_m, hi_m = np.array([j - 1]), np.array([n - 1])
+        while len(lo_i):
+            mid = (lo_i + hi_i) // 2
+            top = np.minimum(hi_m, mid - 1)
+            lengths = top - lo_m + 1
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            task = np.repeat(np.arange(len(mid)), lengths)
+            m = lo_m[task] + np.arange(lengths.sum()) - offsets[task]
+            values = prev[m] + cost(m, mid[task])
+            best = np.minimum.reduceat(values, offsets)
+            first = np.unique(task[values <= best[task]], return_index=True)[1]
+            best_m = m[np.flatnonzero(values <= best[task])[first]]
+            cur[mid], opt[mid] = best, best_m
+
+            left = lo_i <= mid - 1
+            right = mid + 1 <= hi_i
+            lo_i, hi_i, lo_m, hi_m = (
+                np.concatenate([lo_i[left], mid[right] + 1]),
+                np.concatenate([mid[left] - 1, hi_i[right]]),
+                np.concatenate([lo_m[left], best_m[right]]),
+                np.concatenate([best_m[left], hi_m[right]]),
+            )
+        opts.append(opt)
+        prev = cur
+
+    starts = []
+    end = n
+    for opt in reversed(opts):
+        end = opt[end]
+        starts.append(end)
+    return np.array([0] + starts[::-1], dtype=int)
+
+
+def _labels_from_thresholds(values: np.ndarray, thresholds) -> np.ndarray:
+    labels = np.searchsorted(np.asarray(thresholds, dtype=float), values, side="right")
+    return np.where(np.isnan(values), -1, labels)
+
+
+def kmeans_dp(values, k: int) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    x = np.sort(values[~np.isnan(values)])
+    k = max(min(k, len(np.unique(x))), 1)
+    if not len(x):
+        return np.full(len(values), -1)
+    starts = _dp_boundaries(x, np.ones(len(x)), k)
+    # 区間の境目（隣り合う値の中点）をしきい値にする
+    thresholds = (x[starts[1:] - 1] + x[starts[1:]]) / 2
+    return _labels_from_thresholds(values, thresholds)
+
+
+def histogram_threshold(values, k: int, bins: int = HISTOGRAM_BINS) -> np.ndarray:
+    # ヒストグラムのビン（度数を重みにする）で同じ最適化を解く。データ数によらずビン数だけの計算量
+    values = np.asarray(values, dtype=float)
+    valid = values[~np.isnan(values)]
+    if not len(valid):
+        return np.full(len(values), -1)
+    counts, edges = np.histogram(valid, bins=bins)
+    used = counts > 0
+    centers = ((edges[:-1] + edges[1:]) / 2)[used]
+    k = max(min(k, len(centers)), 1)
+    starts = _dp_boundaries(centers, counts[used].astype(float), k)
+    thresholds = edges[1:][used][starts[1:] - 1]
+    return _labels_from_thresholds(values, thresholds)
+
+
+def kmeans_sklearn(values, k: int) -> np.ndarray:
+    from sklearn.cluster import KMeans
+
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    raw = KMeans(n_clusters=k, random_state=42, n_init="auto").fit_predict(values[valid].reshape(-1, 1))
+    # sklearn の番号は任意なので平均の小さい順に振り直す
+    means = np.array([values[valid][raw == c].mean() for c in range(k)])
+    rank = np.empty(k, dtype=int)
+    rank[np.argsort(means)] = np.arange(k)
+    labels = np.full(len(values), -1)
+    labels[valid] = rank[raw]
+    return labels
+
+
+CLUSTER_METHODS = {
+    "dp": kmeans_dp,
+    "histogram": histogram_threshold,
+    "sklearn": kmeans_sklearn,
+}
+
+
+def cluster_1d(values, k: int, method: str = "dp") -> np.ndarray:
+    # 戻り値: 各サンプルのクラスタ番号（平均の小さい順に 0..k-1、欠損は -1）
+    if method not in CLUSTER_METHODS:
+        raise ValueError(f"Unknown cluster method: {method}")
+    return CLUSTER_METHODS[method](values, k)
+
+
+# ===== 変化点検出（パッケージ電力の平均の変化、二分割法） =====
+# 区間の二乗誤差を累積和で O(1) にして、各分割は候補位置をまとめてベクトル計算（全体で n·log n 程度）。
+# ペナルティ = penalty × ノイズ分散 × log(n)（penalty=2 で BIC 相当）。分割による誤差の減少がこれを超えた所だけ採用。
+# 信頼度 = 減少量 / (減少量 + ペナルティ)。採用された境界は 0.5〜1、1 に近いほど明確な段差。
+
+CHANGE_POINT_PENALTY = 2.0
+CHANGE_POINT_MIN_DURATION_S = 30
+
+
+def noise_variance(values) -> float:
+    # 隣り合うサンプルの差の MAD から推定（段差そのものに引っ張られない）
+    steps = np.diff(np.asarray(values, dtype=float))
+    if not len(steps):
+        return 0.0
+    mad = np.median(np.abs(steps - np.median(steps)))
+    return float((mad / 0.6745) ** 2 / 2)
+
+
+def detect_change_points(values, penalty: float = CHANGE_POINT_PENALTY, min_size: int = 30) -> pd.DataFrame:
+    x = pd.Series(values, dtype=float).interpolate(limit_direction="both").fillna(0.0).to_numpy()
+    n = len(x)
+    min_size = max(int(min_size), 1)
+    threshold = penalty * max(noise_variance(x), 1e-12) * np.log(max(n, 2))
+    c1 = np.concatenate([[0.0], np.cumsum(x)])
+    c2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    def sse(a, b):
+        total = c1[b] - c1[a]
+        return c2[b] - c2[a] - total * total / (b - a)
+
+    found = []
+    stack = [(0, n)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2 * min_size:
+            continue
+        candidates = np.arange(start + min_size, end - min_size + 1)
+        gains = sse(start, end) - sse(start, candidates) - sse(candidates, end)
+        best = int(np.argmax(gains))
+        if gains[best] <= threshold:
+            continue
+        split = int(candidates[best])
+        found.append((split, float(gains[best])))
+        stack += [(start, split), (split, end)]
+
+    found.sort()
+    bounds = [0] + [split for split, _ in found] + [n]
+    means = [x[a:b].mean() for a, b in zip(bounds[:-1], bounds[1:])]
+    gains = np.array([gain for _, gain in found])
+    return pd.DataFrame({
+        "index": np.array([split for split, _ in found], dtype=int),
+        "mean_before": means[:-1],
+        "mean_after": means[1:],
+        "step": np.subtract(means[1:], means[:-1]),
+        "gain": gains,
+        "confidence": gains / (gains + threshold) if len(gains) else gains,
+    })
+
+
+def experiment_boundaries(power, time_seconds, n_experiments: int,
+                          penalty: float = CHANGE_POINT_PENALTY,
+                          min_duration_s: float = CHANGE_POINT_MIN_DURATION_S) -> pd.DataFrame:
+    # 実験の開始 = 電力が上がる変化点。段差の大きい順に n_experiments 個選んで時間順に並べる
+    time_seconds = np.asarray(time_seconds, dtype=float)
+    steps = np.diff(time_seconds)
+    sample_s = float(np.median(steps[steps > 0])) if (steps > 0).any() else 1.0
+    min_size = int(np.ceil(min_duration_s / sample_s))
+    points = detect_change_points(power, penalty=penalty, min_size=min_size)
+    rising = points[points["step"] > 0].nlargest(n_experiments, "step")
+    rising = rising.sort_values("index", ignore_index=True)
+    rising.insert(1, "time_s", time_seconds[rising["index"]] if len(rising) else [])
+    return rising
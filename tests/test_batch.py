@@ -0,0 +1,21 @@
+from sensor_correlation_modules.batch import pair_files, pair_key
+
+
+def test_pair_key_strips_role_words_only_as_separate_words():
+    assert pair_key("Unit1_logger.csv") == pair_key("pTAT-Unit1.csv") == "unit1"
+    assert pair_key("Dialog_1.csv") == "dialog1"
+    assert pair_key("Rawhide_data.csv") == "rawhide"
+
+
+def test_pair_files_does_not_merge_units_containing_role_words():
+    loggers = ["Dialog_1.csv", "Dia_1_logger.csv"]
+    ptats = ["Dia_1_ptat.csv", "Dialog_1 pTAT.csv"]
+    pairs, unmatched_loggers, unmatched_ptats = pair_files(loggers, ptats)
+    assert pairs == [("dialog1", 0, 1), ("dia1", 1, 0)]
+    assert unmatched_loggers == [] and unmatched_ptats == []
+
+
+def test_pair_files_reports_unmatched():
+    pairs, unmatched_loggers, unmatched_ptats = pair_files(["A_log.csv", "B_log.csv"], ["B_ptat.csv", "C_ptat.csv"])
+    assert pairs == [("b", 1, 0)]
+    assert unmatched_loggers == [0] and unmatched_ptats == [1]
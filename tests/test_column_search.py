@@ -0,0 +1,20 @@
+from viewer_modules.column_search import build_search_index, search_columns
+
+COLUMNS = [
+    "Time", "Timestamp", "Power-Package Power(Watts)", "Power-IA Power(Watts)",
+    "Rest of Package Power", "CPU-temp(Degree C)",
+]
+
+
+def test_search_keeps_every_substring_match():
+    # 従来の部分一致（query in 列名）でヒットした列は全部残る
+    index = build_search_index(COLUMNS)
+    for query in ["er", "Temp", "ow", "(w"]:
+        expected = {col for col in COLUMNS if query.lower() in col.lower()}
+        assert set(search_columns(index, query)) >= expected
+
+
+def test_search_abbreviations_only_for_multi_word_queries():
+    index = build_search_index(COLUMNS)
+    assert "Timestamp" not in search_columns(index, "Temp")
+    assert "Power-Package Power(Watts)" in search_columns(index, "pkg pwr")
@@ -0,0 +1,45 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from viewer_modules.log_readers import read_csv_after_header, read_csv_table
+
+# pyarrow で読んだ結果が pd.read_csv と同じ列名・dtype・値になること
+
+CASES = [
+    b"Time,A,B,\n10:00:00,1,2,\n10:00:01,3,4,\n",  # 行末のカンマ -> "Unnamed: 3"（全部空 -> float64）
+    b"Time,A,,A\n10:00:00,1,,2\n10:00:01,3,,4\n",  # 空の列名と重複した列名
+    b"Time,A,B\n10:00:00,1,NA\n10:00:01,2,\n",  # 欠損だけの列
+    b"Time,Note\n10:00:00,abc\n10:00:01,\n",  # 文字列列の欠損
+]
+
+
+@pytest.mark.parametrize("data", CASES)
+def test_read_csv_table_matches_pandas(data):
+    pd.testing.assert_frame_equal(read_csv_table(data), pd.read_csv(BytesIO(data)))
+
+
+@pytest.mark.parametrize("usecols", [[0, 3], ["Time", "A.1"], [2, 1]])
+def test_read_csv_table_usecols_by_position(usecols):
+    # 列名の重複・空の列名があっても位置（または "name.1"）で選べる
+    data = CASES[1]
+    expected = pd.read_csv(BytesIO(data), usecols=[0, 3] if usecols == ["Time", "A.1"] else usecols)
+    pd.testing.assert_frame_equal(read_csv_table(data, usecols=usecols), expected)
+
+
+def test_read_csv_after_header_counts_only_newlines():
+    # プリアンブルに \x0c や単独の \r があってもヘッダー行の位置がずれない
+    data = b"GPUmon\x0cversion 1\r\nmode\rA\r\nTime,Fan1 Current Speed\r\n10:00:00,1000\r\n10:00:01,1100\r\n"
+    df = read_csv_after_header(data, ["Time", "Fan1 Current Speed"])
+    assert list(df.columns) == ["Time", "Fan1 Current Speed"]
+    assert df["Fan1 Current Speed"].tolist() == [1000, 1100]
+
+
+def test_read_csv_table_keeps_rows_wider_than_preamble():
+    # header=None（ロガー）: プリアンブルが本文より列が少なくてもデータ行を読み飛ばさない
+    data = b"Title,Logger\nModel,X\nTime,CH1,CH2\n10:00:00,1,2\n10:00:01,3,4\n"
+    df = read_csv_table(data, header=None)
+    assert df.shape == (5, 3)
+    assert df.iloc[4].tolist() == ["10:00:01", "3", "4"]
+    assert pd.isna(df.iloc[0, 2])
@@ -0,0 +1,28 @@
+import pytest
+
+from sensor_correlation_modules.ptat_schema import select_ptat_columns
+from viewer_modules.profile_registry import pipeline_profiles
+
+
+def test_pipeline_roles_come_from_profile_registry():
+    assert {"ptat", "ptat_generic"} <= set(pipeline_profiles())
+
+
+def test_select_ptat_columns_uses_profile_package_power_role():
+    # package_power は viewer と同じ正規表現（"Package Power Limit" などは選ばない）
+    header = ["Time", "Package Power Limit(W)", "Power-Package Power(Watts)", "SEN1-temp(Degree C)"]
+    selection = select_ptat_columns(header, "ptat")
+    assert selection["usecols"] == [0, 2, 3]
+    assert selection["columns"] == ["Time", "Power-Package Power(Watts)", "SEN1-temp(Degree C)"]
+
+
+def test_select_ptat_columns_auto_detects_generic_profile():
+    header = ["Timestamp", "CPU Package Power", "Skin Temp"]
+    selection = select_ptat_columns(header)
+    assert selection["profile"] == "ptat_generic"
+    assert selection["rename"] == {"Timestamp": "Time", "CPU Package Power": "Power-Package Power(Watts)", "Skin Temp": "Skin Temp"}
+
+
+def test_select_ptat_columns_rejects_unknown_header():
+    with pytest.raises(ValueError):
+        select_ptat_columns(["Time", "Fan Speed"])
@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+
+from viewer_modules.range_stats import build_range_stats, range_summary
+
+
+def test_range_summary_energy_only_for_power_cols():
+    df = pd.DataFrame({"Pkg": [10.0, 10.0, 10.0], "Temp": [40.0, 41.0, 42.0]})
+    stats = build_range_stats(df, ["10:00:00", "10:00:01", "10:00:02"])
+    summary = range_summary(stats, ["Pkg", "Temp"], 0, 2, power_cols=["Pkg"]).set_index("Column")
+    assert summary.loc["Pkg", "Energy (W·s)"] == 20.0
+    assert np.isnan(summary.loc["Temp", "Energy (W·s)"])
+    assert summary.loc["Temp", "Mean"] == 41.0
+
+
+def test_range_summary_skips_missing_columns():
+    stats = build_range_stats(pd.DataFrame({"A": [1.0, 2.0]}))
+    assert range_summary(stats, ["B"], 0, 1).empty
@@ -0,0 +1,127 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# ===== Clip reason タイムライン（ランレングス圧縮） =====
+# 列を1回だけ factorize して、同じ理由が続く区間を (start, end, reason) にまとめる。
+# 10時間のログ（約36k行）でも区間は数百個になり、理由毎の合計時間・割合も同時に出せる。
+# "PL1,Thermal" のような複合セルは個別の理由（フラグ）に分解した bool 行列でも持つ。
+
+_REASON_SPLIT_RE = re.compile(r"\s*[,;|/]\s*")
+
+
+def sample_durations(time_seconds) -> np.ndarray:
+    # 各サンプルが表す時間[秒]（最後のサンプルは中央値の間隔）
+    time_seconds = np.asarray(time_seconds, dtype=float)
+    if len(time_seconds) < 2:
+        return np.ones(len(time_seconds))
+    steps = np.diff(time_seconds)
+    return np.append(steps, np.median(steps))
+
+
+def encode_clip_timeline(values, time_seconds) -> dict:
+    codes, categories = pd.factorize(pd.Series(values).reset_index(drop=True), sort=True)  # 欠損は -1
+    n = len(codes)
+    time_seconds = np.asarray(time_seconds, dtype=float)
+    durations = sample_durations(time_seconds)
+    elapsed = np.concatenate([[0.0], np.cumsum(durations)])
+
+    if n:
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1])
+    else:
+        starts = np.array([], dtype=int)
+    ends = np.append(starts[1:], n) - 1  # 両端含む
+    run_codes = codes[starts]
+
+    clipped = run_codes >= 0
+    starts, ends, run_codes = starts[clipped], ends[clipped], run_codes[clipped]
+    intervals = pd.DataFrame({
+        "start": starts,
+        "end": ends,
+        "code": run_codes,
+        "reason": np.asarray(categories, dtype=object)[run_codes],
+        "start_s": time_seconds[starts] if n else [],
+        "duration_s": elapsed[ends + 1] - elapsed[starts],
+    })
+
+    return {
+        "codes": codes,
+        "categories": list(categories),
+        "intervals": intervals,
+        "total_s": elapsed[-1],
+    }
+
+
+def clip_duration_table(timeline: dict) -> pd.DataFrame:
+    intervals = timeline["intervals"]
+    summary = (
+        intervals.groupby("reason", sort=False)
+        .agg(Intervals=("start", "size"), Duration=("duration_s", "sum"))
+        .reset_index()
+        .rename(columns={"reason": "Reason", "Duration": "Duration (s)"})
+    )
+    total = timeline["total_s"]
+    summary["Share (%)"] = summary["Duration (s)"] / total * 100 if total else np.nan
+    return summary.sort_values("Duration (s)", ascending=False, ignore_index=True)
+
+
+def clock_ticks(time_seconds, time_labels, count: int = 10):
+    # 経過秒の軸に "hh:mm:ss" の目盛りを付ける
+    n = len(time_seconds)
+    if not n:
+        return [], []
+    positions = np.unique(np.linspace(0, n - 1, min(count, n)).astype(int))
+    labels = pd.Series(time_labels).reset_index(drop=True)
+    return [float(time_seconds[i]) for i in positions], [str(labels.iloc[i]) for i in positions]
+
+
+# ===== 複合Clip reasonのフラグ分解 =====
+def split_reasons(value) -> list:
+    return [reason for reason in _REASON_SPLIT_RE.split(str(value).strip()) if reason]
+
+
+def build_clip_flags(values) -> dict:
+    # 分解は種類（カテゴリ）毎に1回だけ行い、行方向はコード配列でまとめて展開する
+    codes, categories = pd.factorize(pd.Series(values).reset_index(drop=True), sort=True)
+    category_flags = [split_reasons(category) for category in categories]
+    flags = sorted({flag for names in category_flags for flag in names})
+    flag_ids = {flag: i for i, flag in enumerate(flags)}
+
+    category_matrix = np.zeros((len(categories) + 1, len(flags)), dtype=bool)  # 最終行 = 欠損（-1）
+    for row, names in enumerate(category_flags):
+        category_matrix[row, [flag_ids[name] for name in names]] = True
+
+    return {
+        "flags": flags,
+        "flag_ids": flag_ids,
+        "matrix": category_matrix[codes],  # (行数, フラグ数)
+    }
+
+
+def flag_mask(index: dict, flag: str) -> np.ndarray:
+    flag_id = index["flag_ids"].get(flag)
+    if flag_id is None:
+        return np.zeros(len(index["matrix"]), dtype=bool)
+    return index["matrix"][:, flag_id]
+
+
+def flag_duration_table(index: dict, durations, mask=None) -> pd.DataFrame:
+    # 例: mask = パッケージ電力 > X  -> 「X W超の間に各理由で制限されていた時間」
+    durations = np.asarray(durations, dtype=float)
+    selected = np.ones(len(durations), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    flag_seconds = index["matrix"].T @ np.where(selected, durations, 0.0)
+    total = durations.sum()
+    return pd.DataFrame({
+        "Flag": index["flags"],
+        "Samples": index["matrix"][selected].sum(axis=0),
+        "Duration (s)": flag_seconds,
+        "Share (%)": flag_seconds / total * 100 if total else np.nan,
+    }).sort_values("Duration (s)", ascending=False, ignore_index=True)
+
+
+def flag_co_occurrence(index_a: dict, index_b: dict, durations) -> pd.DataFrame:
+    # 行 = index_a のフラグ, 列 = index_b のフラグ, 値 = 両方が立っていた時間[秒]
+    durations = np.asarray(durations, dtype=float)
+    seconds = index_a["matrix"].T.astype(float) @ (index_b["matrix"] * durations[:, None])
+    return pd.DataFrame(seconds, index=index_a["flags"], columns=index_b["flags"])
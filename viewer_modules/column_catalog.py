@@ -0,0 +1,99 @@
+import re
+
+from viewer_modules.profile_registry import default_profile, get_profile, match_roles
+
+# ===== 列カタログ（ファイル毎に1回だけ列名を分類する） =====
+# pTAT/DTTのログは数千列になるため、各ページで df.columns を何度も走査しないよう
+# ここで役割（role）・コアID・検索トークン毎のインデックスを作っておく。
+# 役割の判定規則・単位・デフォルト列・参照テーブルはプロファイル（viewer_modules/profiles/）で宣言する。
+
+_CORE_ID_RE = re.compile(r"^CPU0*(\d+)", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[a-z]+|[0-9]+")
+
+
+def normalize_core_id(raw_core_id: str) -> str:
+    # "CPU03" -> "CPU3"
+    return _CORE_ID_RE.sub(r"CPU\1", raw_core_id)
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def build_column_catalog(columns, kind: str = "pTAT", profile: str = None) -> dict:
+    columns = list(dict.fromkeys(columns))
+    profile = profile or default_profile(kind)
+
+    roles = {role: [] for role in get_profile(profile)["roles"]}
+    cores = {}
+    core_ids = {}
+    tokens = {}
+
+    for col in columns:
+        col = str(col)
+        for role in match_roles(profile, col):
+            roles[role].append(col)
+
+        match = _CORE_ID_RE.match(col)
+        if match:
+            core_id = f"CPU{match.group(1)}"
+            core_ids[col] = core_id
+            cores.setdefault(core_id, []).append(col)
+
+        for token in dict.fromkeys(tokenize(col)):
+            tokens.setdefault(token, []).append(col)
+
+    return {
+        "kind": kind,
+        "profile": profile,
+        "columns": columns,
+        "roles": roles,
+        "core_ids": core_ids,
+        "cores": cores,
+        "tokens": tokens,
+    }
+
+
+def role_cols(catalog: dict, role: str) -> list:
+    # カタログはキャッシュ共有なのでコピーを返す
+    return list(catalog["roles"].get(role, []))
+
+
+def first_col(catalog: dict, role: str):
+    cols = role_cols(catalog, role)
+    return cols[0] if cols else None
+
+
+def default_cols(catalog: dict, plot: str, exclude=()) -> list:
+    # プロファイルの default_plots[plot]: 役割毎の最初の列 -> fill_role の列で limit 列まで補完（重複なし）
+    spec = get_profile(catalog["profile"]).get("default_plots", {}).get(plot, {})
+    selected = []
+    for col in [first_col(catalog, role) for role in spec.get("roles", [])]:
+        if col and col not in selected and col not in exclude:
+            selected.append(col)
+    limit = spec.get("limit")
+    for col in role_cols(catalog, spec["fill_role"]) if spec.get("fill_role") else []:
+        if limit is not None and len(selected) >= limit:
+            break
+        if col not in selected and col not in exclude:
+            selected.append(col)
+    return selected
+
+
+def axis_title(catalog: dict, role: str, label: str) -> str:
+    # "Frequency" -> "Frequency (MHz)"（単位はプロファイルの units）
+    unit = get_profile(catalog["profile"]).get("units", {}).get(role)
+    return f"{label} ({unit})" if unit else label
+
+
+def lookup_table(catalog: dict, name: str):
+    return get_profile(catalog["profile"]).get("tables", {}).get(name)
+
+
+def get_core_types(catalog: dict, df) -> dict:
+    # {"CPU03": "P-core", ...}  コアタイプは先頭行の値を使う
+    result = {}
+    for col in role_cols(catalog, "core_type"):
+        raw_core_id = col.split("-")[0]
+        result[raw_core_id] = df[col].iloc[0]
+    return result
@@ -0,0 +1,139 @@
+from viewer_modules.column_catalog import tokenize
+
+# ===== 列名検索インデックス（Y軸の検索ボックス用） =====
+# キー入力毎のrerunで全列を線形走査しないよう、列名トークンの語彙と
+# トライグラム → 語彙トークンの転置インデックスを事前に作っておく。
+# 従来の部分一致（query in 列名）でヒットする列は必ず含めて先頭に並べ、候補は列名全体の n-gram（1〜3文字）の
+# 転置インデックスから絞り込んでから実際に部分一致を確かめる（全列の線形走査はしない）。
+# 複数語のクエリだけ "pkg pwr" → "Power-Package Power(Watts)" のような略語（部分列）一致を後ろに追加する。
+
+_SCORE_EXACT = 3.0
+_SCORE_PREFIX = 2.5
+_SCORE_SUBSTRING = 2.0
+_SCORE_ABBREV = 1.0
+
+
+def _trigrams(token: str) -> set:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _is_subsequence(query: str, token: str) -> bool:
+    it = iter(token)
+    return all(ch in it for ch in query)
+
+
+def _ngrams(text: str, size: int) -> set:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def build_search_index(columns) -> dict:
+    columns = list(dict.fromkeys(str(col) for col in columns))
+    lowered = [col.lower() for col in columns]
+
+    col_grams = {}   # 列名全体の1〜3文字 -> 列ID（部分一致の候補用。トークンをまたぐ "ia power" なども拾える）
+    for col_id, low in enumerate(lowered):
+        for size in (1, 2, 3):
+            for gram in _ngrams(low, size):
+                col_grams.setdefault(gram, set()).add(col_id)
+
+    vocab = {}       # トークン -> 列ID
+    for col_id, low in enumerate(lowered):
+        for token in dict.fromkeys(tokenize(low)):
+            vocab.setdefault(token, []).append(col_id)
+
+    grams = {}       # トライグラム -> トークン
+    by_initial = {}  # 先頭文字 -> トークン（前方一致・略語一致用）
+    for token in vocab:
+        by_initial.setdefault(token[0], []).append(token)
+        for gram in _trigrams(token):
+            grams.setdefault(gram, set()).add(token)
+
+    return {
+        "columns": columns,
+        "lowered": lowered,
+        "col_grams": col_grams,
+        "vocab": vocab,
+        "grams": grams,
+        "by_initial": by_initial,
+    }
+
+
+def _match_token(index: dict, query_token: str, abbreviate: bool) -> dict:
+    # 語彙トークン -> スコア。abbreviate=False では略語（部分列）一致をしない（"temp" -> "timestamp" を拾わない）
+    vocab = index["vocab"]
+    hits = {}
+    if query_token in vocab:
+        hits[query_token] = _SCORE_EXACT
+
+    if len(query_token) >= 3:
+        candidates = None
+        for gram in _trigrams(query_token):
+            found = index["grams"].get(gram)
+            if not found:
+                candidates = set()
+                break
+            candidates = set(found) if candidates is None else candidates & found
+        for token in candidates or ():
+            if token != query_token and query_token in token:
+                hits[token] = _SCORE_PREFIX if token.startswith(query_token) else _SCORE_SUBSTRING
+
+    for token in index["by_initial"].get(query_token[0], ()):
+        if token in hits:
+            continue
+        if token.startswith(query_token):
+            hits[token] = _SCORE_PREFIX
+        elif abbreviate and len(query_token) >= 2 and _is_subsequence(query_token, token):
+            # 略語一致は語の長さに対するカバー率で重み付け
+            hits[token] = _SCORE_ABBREV * len(query_token) / len(token)
+    return hits
+
+
+def _substring_ids(index: dict, query: str) -> list:
+    # query を含む列ID（列ID順）。n-gram の転置リストの共通部分を候補にして、最後に部分一致を確かめる
+    postings = [index["col_grams"].get(gram) for gram in _ngrams(query, min(len(query), 3))]
+    if not all(postings):
+        return []
+    postings.sort(key=len)
+    candidates = set(postings[0])
+    for posting in postings[1:]:
+        candidates &= posting
+        if not candidates:
+            return []
+    lowered = index["lowered"]
+    return sorted(col_id for col_id in candidates if query in lowered[col_id])
+
+
+def search_columns(index: dict, query: str, exclude=(), limit=None) -> list:
+    columns = index["columns"]
+    query = (query or "").strip().lower()
+    if not query:
+        return [col for col in columns if col not in exclude]
+
+    # 従来の部分一致でヒットする列（必ず含める）
+    substring_ids = _substring_ids(index, query)
+
+    query_tokens = list(dict.fromkeys(tokenize(query)))
+    scores = {}
+    abbreviate = len(query_tokens) > 1
+    for i, query_token in enumerate(query_tokens):
+        best = {}
+        for token, score in _match_token(index, query_token, abbreviate).items():
+            for col_id in index["vocab"][token]:
+                if score > best.get(col_id, 0.0):
+                    best[col_id] = score
+        if i == 0:
+            scores = best
+        else:
+            scores = {col_id: scores[col_id] + score for col_id, score in best.items() if col_id in scores}
+        if not scores:
+            break
+
+    # 部分一致の列が先、トークン一致だけの列が後。それぞれスコア順（同点は短い列名が先）
+    ranked = [(0, -scores.get(col_id, 0.0), len(columns[col_id]), col_id) for col_id in substring_ids]
+    substring_set = set(substring_ids)
+    ranked += [(1, -score, len(columns[col_id]), col_id)
+               for col_id, score in scores.items() if col_id not in substring_set]
+    ranked = [entry for entry in sorted(ranked) if columns[entry[3]] not in exclude]
+    if limit is not None:
+        ranked = ranked[:limit]
+    return [columns[entry[3]] for entry in ranked]
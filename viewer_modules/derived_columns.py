@@ -0,0 +1,108 @@
+import pandas as pd
+
+# ===== 派生列レイヤー（元のdfは書き換えない） =====
+# EPP(0-255 -> 0-100)・mW -> W・OS power slider のラベル化などの変換は
+# 純粋なベクトル演算として定義し、ファイル毎に1回だけ計算して使い回す。
+# dfへ上書きしないので、rerunで変換済みの値を再度変換してしまうこともない。
+# 複数列からの計算チャンネル（和・差・移動平均）は dict の定義で宣言し、まとめて1ブロックで作る。
+
+OS_POWER_SLIDER_LABELS = {
+    25: "Energy saver",
+    50: "Best Power Efficiency",
+    75: "Balanced",
+    100: "Best Performance",
+}
+
+
+def epp_percent(values: pd.Series) -> pd.Series:
+    # round(x / 2.55) と同じ（偶数丸め）
+    return (pd.to_numeric(values, errors="coerce") / 2.55).round()
+
+
+def mw_to_w(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values, errors="coerce") / 1000
+
+
+def os_slider_label(values: pd.Series) -> pd.Series:
+    return values.map(OS_POWER_SLIDER_LABELS)
+
+
+DERIVED_TRANSFORMS = {
+    "epp_percent": epp_percent,
+    "mw_to_w": mw_to_w,
+    "os_slider_label": os_slider_label,
+}
+
+
+def derived_column(cache: dict, df: pd.DataFrame, transform: str, col: str) -> pd.Series:
+    # cache はファイル毎の dict（(変換名, 列名) -> Series）
+    key = (transform, col)
+    if key not in cache:
+        cache[key] = DERIVED_TRANSFORMS[transform](df[col])
+    return cache[key]
+
+
+# ===== 計算チャンネル（宣言的な定義 -> 1ブロックでまとめて実体化） =====
+# 定義例:
+#   {"name": "IA+GT(W)", "op": "sum", "cols": ["IA(W)", "GT(W)"]}
+#   {"name": "PL1 headroom(W)", "op": "diff", "cols": ["TCPU_PL1 Limit(W)", "TCPU_D0_Current Power(W)"]}
+#   {"name": "Power 30s avg(W)", "op": "rolling_mean", "cols": ["TCPU_D0_Current Power(W)"], "window": 30}
+CHANNEL_OPS = ["sum", "diff", "rolling_mean", "mw_to_w"]
+
+
+def mw_channels(columns) -> list:
+    return [
+        {"name": col.replace("(mW)", "(W)"), "op": "mw_to_w", "cols": [col]}
+        for col in columns
+    ]
+
+
+def _numeric(df: pd.DataFrame, col: str) -> pd.Series:
+    return pd.to_numeric(df[col], errors="coerce")
+
+
+def evaluate_channel(df: pd.DataFrame, channel: dict) -> pd.Series:
+    op = channel["op"]
+    cols = channel["cols"]
+    if op == "sum":
+        values = sum(_numeric(df, col) for col in cols)
+    elif op == "diff":
+        values = _numeric(df, cols[0]) - _numeric(df, cols[1])
+    elif op == "rolling_mean":
+        values = _numeric(df, cols[0]).rolling(int(channel.get("window", 10)), min_periods=1).mean()
+    elif op in DERIVED_TRANSFORMS:
+        values = DERIVED_TRANSFORMS[op](df[cols[0]])
+    else:
+        raise ValueError(f"Unknown channel op: {op}")
+    return values.rename(channel["name"])
+
+
+def _channel_key(channel: dict) -> tuple:
+    return ("channel", channel["name"], channel["op"], tuple(channel["cols"]), channel.get("window"))
+
+
+def materialize_channels(cache: dict, df: pd.DataFrame, channels) -> pd.DataFrame:
+    # 未計算のチャンネルだけ計算し（ファイル毎にメモ化）、結果を1つのDataFrameとして返す。
+    # 呼び出し側は pd.concat で1回だけ結合する（列を1本ずつ挿入して断片化させない）
+    series = []
+    for channel in channels:
+        if not all(col in df.columns for col in channel["cols"]):
+            continue
+        key = _channel_key(channel)
+        if key not in cache:
+            cache[key] = evaluate_channel(df, channel)
+        series.append(cache[key])
+    if not series:
+        return pd.DataFrame(index=df.index)
+    return pd.concat(series, axis=1)
+
+
+def attach_channels(df: pd.DataFrame, block: pd.DataFrame) -> pd.DataFrame:
+    # 既存と同名の列は位置を保ったまま上書き、新しい列は1回の concat で末尾に追加
+    existing = [col for col in block.columns if col in df.columns]
+    if existing:
+        df[existing] = block[existing]
+    new_cols = [col for col in block.columns if col not in df.columns]
+    if not new_cols:
+        return df
+    return pd.concat([df, block[new_cols]], axis=1)
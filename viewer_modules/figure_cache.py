@@ -0,0 +1,29 @@
+import hashlib
+import json
+
+# ===== 図のキャッシュ（トレース構成が変わらない図はrerunで作り直さない） =====
+# キー = ファイルハッシュ + 列 + カラーマップ + スタイル + 軸設定 をJSON化したもののハッシュ。
+# フォントスライダー等、図に関係ない操作でのrerunでは同じキーになり、作成済みの図を再利用する。
+
+FIGURE_CACHE_SIZE = 24
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def figure_key(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_or_build(cache: dict, key: str, build, max_entries: int = FIGURE_CACHE_SIZE):
+    # build() の戻り値（図・警告など）をそのまま保持する。古いものから捨てる（LRU）
+    if key in cache:
+        value = cache.pop(key)
+    else:
+        value = build()
+    cache[key] = value
+    while len(cache) > max_entries:
+        cache.pop(next(iter(cache)))
+    return value
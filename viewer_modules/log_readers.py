@@ -0,0 +1,354 @@
+import codecs
+import csv
+import importlib.util
+from functools import lru_cache
+from io import BytesIO, StringIO
+
+import chardet
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# ===== ログ読み込みの共通部品（viewer / converter / sensor correlation） =====
+# CSVは pyarrow のマルチスレッドパーサーで読み、壊れた行があるファイルだけ従来の pandas（on_bad_lines="skip"）で読み直す。
+# header=None（ロガーなど）は行を読み飛ばさず、一番多い列数に合わせて読む。
+# 時刻は行毎の Python 処理をせず、整数演算で「0時からの秒」にしてから一括で "hh:mm:ss" へ変換する。
+# 不正・欠損の時刻は例外にせず NaN として残し、呼び出し側で落とすかどうかを決める。
+# 文字コードは先頭の一部のバイトだけで1回判定する（BOM -> UTF-8 -> Shift_JIS(cp932)/CP949 -> chardet）。
+# UTF-8 と判定した時はファイル全体も UTF-8 で読めるか確かめ、後半にだけある日本語・韓国語の行を化けさせない。
+# CSV / XLS / XLSX も拡張子ではなく先頭のマジックバイトで判定し、最初から正しいリーダーで1回だけ読む。
+
+TIME_FORMATS = ["%H:%M:%S", "%H:%M:%S.%f", "%I:%M:%S %p"]
+HEADER_SCAN_BYTES = 256 * 1024
+ENCODING_SAMPLE_BYTES = 256 * 1024
+DECODE_CHUNK_BYTES = 4 * 1024 * 1024
+_OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # .xls
+_ZIP_MAGIC = b"PK\x03\x04"  # .xlsx
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+# pandas.read_csv の既定の欠損値表記（pyarrow 側も同じものを欠損として扱う）
+CSV_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+# ===== 文字コード判定 =====
+def _decodes(sample: bytes, encoding: str) -> bool:
+    # サンプル末尾で途切れたマルチバイト文字はエラーにしない
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _looks_japanese(sample: bytes) -> bool:
+    # 韓国語(CP949)を cp932 で読むと半角カナだらけになる。日本語ならかな・漢字が多い
+    text = codecs.getincrementaldecoder("cp932")(errors="ignore").decode(sample, final=False)
+    japanese = sum(1 for ch in text if "\u3040" <= ch <= "\u30ff" or "\u4e00" <= ch <= "\u9fff")
+    halfwidth_kana = sum(1 for ch in text if "\uff61" <= ch <= "\uff9f")
+    return japanese >= halfwidth_kana
+
+
+@lru_cache(maxsize=64)
+def _sample_encoding(sample: bytes) -> str:
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if _decodes(sample, "utf-8"):
+        return "utf-8"
+    candidates = [encoding for encoding in ("cp932", "cp949") if _decodes(sample, encoding)]
+    if len(candidates) == 2:
+        return "cp932" if _looks_japanese(sample) else "cp949"
+    if candidates:
+        return candidates[0]
+    return chardet.detect(sample)["encoding"] or "utf-8"
+
+
+def _decodes_all(data: bytes, encoding: str):
+    # ファイル全体を DECODE_CHUNK_BYTES ずつデコードしてみる。戻り値: 最初の不正なバイトのだいたいの位置（全部読めれば None）
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for start in range(0, len(data), DECODE_CHUNK_BYTES):
+        chunk = data[start:start + DECODE_CHUNK_BYTES]
+        try:
+            decoder.decode(chunk, final=start + DECODE_CHUNK_BYTES >= len(data))
+        except UnicodeDecodeError as e:
+            return max(start + e.start - 4, 0)
+    return None
+
+
+def _full_encoding(data: bytes, error_offset: int) -> str:
+    # 先頭は UTF-8 として読めたが後半に不正なバイトがある（ASCIIの後に日本語の行など）:
+    # 不正なバイトのある行から判定し直し、ファイル全体を読める文字コードを使う
+    line_start = data.rfind(b"\n", 0, error_offset) + 1
+    guess = _sample_encoding(bytes(data[line_start:line_start + ENCODING_SAMPLE_BYTES]))
+    for encoding in dict.fromkeys([guess, "cp932", "cp949"]):
+        if _decodes_all(data, encoding) is None:
+            return encoding
+    return guess
+
+
+def detect_encoding(data: bytes) -> str:
+    # 先頭 ENCODING_SAMPLE_BYTES で判定。結果はサンプルの内容をキーにキャッシュ（rerun・再読込で再判定しない）
+    # UTF-8 と判定した時だけファイル全体も UTF-8 で読めるか確かめる（読めなければ Shift_JIS(cp932)/CP949 で読み直す）
+    encoding = _sample_encoding(bytes(data[:ENCODING_SAMPLE_BYTES]))
+    if encoding == "utf-8" and len(data) > ENCODING_SAMPLE_BYTES:
+        error_offset = _decodes_all(data, "utf-8")
+        if error_offset is not None:
+            return _full_encoding(data, error_offset)
+    return encoding
+
+
+def _as_bytes(source) -> bytes:
+    # bytes / ファイルパス / アップロードファイル（file-like）のどれでも受け付ける
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    source.seek(0)
+    return source.read()
+
+
+def _head_bytes(source, size: int) -> bytes:
+    # 先頭 size バイトだけ（ファイル全体は読まない。file-like は位置を先頭へ戻す）
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:size])
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read(size)
+    source.seek(0)
+    head = source.read(size)
+    source.seek(0)
+    return head
+
+
+def _column_names(names) -> list:
+    # pandas と同じ列名にする: 空の列名（行末のカンマなど）は "Unnamed: 列番号"、重複は "name.1"
+    return _dedupe_columns([name if name != "" else f"Unnamed: {i}" for i, name in enumerate(names)])
+
+
+def _dedupe_columns(names) -> list:
+    # pandas と同じく重複した列名は "name.1", "name.2" ... にする
+    seen = {}
+    result = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        result.append(name if count == 0 else f"{name}.{count}")
+    return result
+
+
+def _arrow_encoding(encoding: str) -> str:
+    # pyarrow は UTF-8 の BOM を自動で読み飛ばす
+    return "utf8" if encoding.lower().replace("_", "-") in ("utf-8", "utf8", "utf-8-sig") else encoding
+
+
+def _read_csv_arrow(data: bytes, sep: str, header, encoding: str, arrow_dtypes: bool,
+                    usecols=None, names=None) -> pd.DataFrame:
+    # usecols: 読む列の位置。列名の重複・空の列名があっても選べるよう、仮の列名 f0, f1, ... で読んで names に戻す
+    read_options = pa_csv.ReadOptions(encoding=_arrow_encoding(encoding), autogenerate_column_names=header is None)
+    if usecols is not None and header is not None:
+        read_options = pa_csv.ReadOptions(
+            encoding=_arrow_encoding(encoding), column_names=[f"f{i}" for i in range(len(names))], skip_rows=1)
+    parse_options = pa_csv.ParseOptions(delimiter=sep)
+    convert_options = pa_csv.ConvertOptions(
+        null_values=CSV_NA_VALUES, strings_can_be_null=True,
+        include_columns=[f"f{i}" for i in usecols] if usecols is not None else None)
+    table = pa_csv.read_csv(BytesIO(data), read_options, parse_options, convert_options)
+    if any(pa.types.is_binary(field.type) for field in table.schema):
+        raise ValueError("invalid bytes for the encoding")
+
+    # "hh:mm:ss" などは pyarrow が時刻型に推論するので、元の文字列のまま読み直す（pandas と同じ結果にする）
+    temporal = [
+        field.name for field in table.schema
+        if pa.types.is_temporal(field.type)
+    ]
+    if temporal:
+        convert_options.column_types = {name: pa.string() for name in temporal}
+        table = pa_csv.read_csv(BytesIO(data), read_options, parse_options, convert_options)
+
+    # 全部空の列は null 型（pandas へ変換すると object）になるので、pandas と同じ float64 にする
+    for i, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+
+    if arrow_dtypes:
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    else:
+        df = table.to_pandas()
+        # 文字列列の欠損は None で返ってくるので pandas と同じ NaN にそろえる
+        for i, column in enumerate(table.columns):
+            if pa.types.is_string(column.type) and column.null_count:
+                df.isetitem(i, df.iloc[:, i].where(df.iloc[:, i].notna(), np.nan))
+    if usecols is not None:
+        df.columns = list(usecols) if header is None else [names[i] for i in usecols]
+    else:
+        df.columns = list(range(df.shape[1])) if header is None else _column_names(table.column_names)
+    return df
+
+
+def _header_names(head: bytes, sep: str, encoding: str) -> list:
+    # 1行目だけを解析した列名（空の列名・重複名は pandas と同じく "Unnamed: i" / "name.1"）
+    text = codecs.getincrementaldecoder(encoding)(errors="ignore").decode(head, final=False)
+    first_line = text.lstrip("\ufeff").splitlines()[0] if text.strip() else ""
+    return _column_names(next(csv.reader([first_line], delimiter=sep), []))
+
+
+def _column_positions(names, usecols) -> list:
+    # 列名 / 位置の混ざった usecols -> ファイル内の順の位置
+    lookup = {name: i for i, name in enumerate(names)}
+    missing = [col for col in usecols if not isinstance(col, int) and col not in lookup]
+    if missing:
+        raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+    return sorted({col if isinstance(col, int) else lookup[col] for col in usecols})
+
+
+def _max_fields(data: bytes, sep: str, encoding: str) -> int:
+    # 一番列の多い行の列数（引用符内の区切り文字・改行は数えない）
+    text = data.decode(encoding, errors="replace").lstrip("\ufeff")
+    return max((len(row) for row in csv.reader(StringIO(text, newline=""), delimiter=sep)), default=1)
+
+
+def read_csv_table(source, sep: str = ",", header="infer", encoding: str = None,
+                   encoding_errors: str = "strict", arrow_dtypes: bool = False, usecols=None) -> pd.DataFrame:
+    # encoding=None で自動判定。arrow_dtypes=True で Arrow バックの dtype のまま返す（既定は従来どおり numpy / object）
+    # usecols: 読む列の位置（0始まり）か列名のリスト（それ以外の列はパースしない）。重複した列名は "name.1" で指定する
+    data = _as_bytes(source)
+    encoding = encoding or detect_encoding(data)
+    names = None
+    if usecols is not None:
+        names = _header_names(data[:HEADER_SCAN_BYTES], sep, encoding) if header is not None else None
+        usecols = _column_positions(names or [], usecols)
+    if pa is not None:
+        try:
+            return _read_csv_arrow(data, sep, header, encoding, arrow_dtypes, usecols, names)
+        except (pa.ArrowInvalid, ValueError):
+            pass  # 列数の合わない行・不正なバイトなど -> 従来の読み方
+    if header is None:
+        # header=None（ロガーなど）は先頭のプリアンブルが本文より列が少ないことがある。
+        # 行を読み飛ばすとデータ行が全部消えるので、一番多い列数で読む（短い行は NaN で埋まる）
+        return pd.read_csv(
+            BytesIO(data), sep=sep, header=None, names=range(_max_fields(data, sep, encoding)),
+            encoding=encoding, encoding_errors=encoding_errors, low_memory=False, usecols=usecols,
+        )
+    return pd.read_csv(
+        BytesIO(data), sep=sep, header=header, encoding=encoding, encoding_errors=encoding_errors,
+        on_bad_lines="skip", low_memory=False, usecols=usecols,
+    )
+
+
+# ===== ファイル形式の判定（CSVとして読んでみて失敗したらExcel、はしない） =====
+def sniff_format(data: bytes) -> str:
+    if data.startswith(_OLE2_MAGIC):
+        return "xls"
+    if data.startswith(_ZIP_MAGIC):
+        return "xlsx"
+    return "text"
+
+
+def _excel_engine(fmt: str) -> str:
+    # calamine（Rust実装）が入っていれば xls / xlsx ともにそちらが速い
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return "xlrd" if fmt == "xls" else "openpyxl"
+
+
+def read_table_file(source, header="infer", usecols=None) -> pd.DataFrame:
+    # ロガー・pTATなどのファイルを中身の形式で判定して読む（一時ファイルへの書き出しなし）
+    data = _as_bytes(source)
+    fmt = sniff_format(data)
+    if fmt == "text":
+        return read_csv_table(data, header=header, usecols=usecols)
+    return pd.read_excel(
+        BytesIO(data), engine=_excel_engine(fmt), header=0 if header == "infer" else header, usecols=usecols)
+
+
+def read_table_header(source, sep: str = ",") -> list:
+    # 列名だけ（CSV は先頭 HEADER_SCAN_BYTES の1行目だけ解析、Excel は行を読まない）。空の列名・重複名は pandas と同じく "Unnamed: i" / "name.1"
+    head = _head_bytes(source, HEADER_SCAN_BYTES)
+    fmt = sniff_format(head)
+    if fmt != "text":
+        return [str(col) for col in pd.read_excel(BytesIO(_as_bytes(source)), engine=_excel_engine(fmt), nrows=0).columns]
+    return _header_names(head, sep, detect_encoding(head))
+
+
+@lru_cache(maxsize=1)
+def _clock_label_table() -> list:
+    return [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)]
+
+
+def clock_text(seconds) -> np.ndarray:
+    # 0時からの秒 -> "hh:mm:ss"（欠損は NaN）
+    seconds = np.asarray(seconds, dtype=float)
+    codes = np.where(np.isfinite(seconds), seconds, -1).astype(np.int64)
+    codes[codes >= 86400] = -1
+    return np.asarray(pd.Categorical.from_codes(codes, categories=_clock_label_table()), dtype=object)
+
+
+def fanck_clock_seconds(values) -> np.ndarray:
+    # FanCK の時刻列は yyyymmddhhmmss などの整数。下6桁を hh/mm/ss に分解する
+    numbers = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+    valid = np.isfinite(numbers) & (numbers >= 0)
+    ts = np.where(valid, numbers, 0).astype(np.int64) % 1_000_000
+    hours, minutes, secs = ts // 10000, ts // 100 % 100, ts % 100
+    valid &= (hours < 24) & (minutes < 60) & (secs < 60)
+    return np.where(valid, hours * 3600 + minutes * 60 + secs, np.nan)
+
+
+def clock_seconds(values, fmt: str = "%H:%M:%S") -> np.ndarray:
+    # "hh:mm:ss" テキスト -> 0時からの秒（C実装のパーサーで1回だけ解析、不正は NaN）
+    parsed = pd.to_datetime(pd.Series(values), format=fmt, errors="coerce")
+    return (parsed.dt.hour * 3600 + parsed.dt.minute * 60 + parsed.dt.second).to_numpy(dtype=float)
+
+
+def guess_time_format(values, formats=TIME_FORMATS, sample_size: int = 20) -> str:
+    # 先頭の数サンプルが全部解析できる最初のフォーマット（どれも合わなければ先頭のもの）
+    sample = pd.Series(values).dropna().astype(str).str.strip().head(sample_size)
+    for fmt in formats:
+        if sample.empty or pd.to_datetime(sample, format=fmt, errors="coerce").notna().all():
+            return fmt
+    return formats[0]
+
+
+# ===== プリアンブル付きCSV（GPUmon など）のヘッダー行検出 =====
+def find_header_row(data: bytes, required, sep: str = ",", encoding: str = None):
+    # 先頭 HEADER_SCAN_BYTES だけを見て、required の列名が全部揃う最初の行番号を返す
+    required = {name.lower() for name in required}
+    encoding = encoding or detect_encoding(data)
+    # 行は "\n" だけで区切る（read_csv_after_header のバイト列の切り方と同じ。splitlines は \r, \x0c, \x85 などでも区切る）
+    head = data[:HEADER_SCAN_BYTES].decode(encoding, errors="ignore").split("\n")
+    for row, line in enumerate(head):
+        fields = {field.strip().strip('"').lower() for field in line.split(sep)}
+        if required <= fields:
+            return row
+    return None
+
+
+def find_column(columns, name: str):
+    # 前後の空白・大文字小文字を無視して列名を探す
+    for col in columns:
+        if str(col).strip().lower() == name.lower():
+            return col
+    return None
+
+
+def read_csv_after_header(data: bytes, required, sep: str = ",", encoding: str = None) -> pd.DataFrame:
+    encoding = encoding or detect_encoding(data)
+    if encoding.startswith("utf-16"):
+        # 行単位でバイト列を切るので UTF-8 に変換してから
+        data, encoding = data.decode(encoding, errors="ignore").encode("utf-8"), "utf-8"
+    header_row = find_header_row(data, required, sep=sep, encoding=encoding)
+    if header_row is None:
+        raise ValueError(f"Header row with {', '.join(required)} not found")
+    body = data.split(b"\n", header_row)[-1]
+    return read_csv_table(body, sep=sep, encoding=encoding, encoding_errors="ignore")
@@ -0,0 +1,61 @@
+import importlib
+import pkgutil
+import re
+from functools import lru_cache
+from pathlib import Path
+
+# ===== 列プロファイルの登録（プラットフォーム/ツールのバージョン毎に1ファイル） =====
+# viewer_modules/profiles/*.py がそれぞれ PROFILE（dict）を持つ: kind / label / roles / units / default_plots / tables。
+# センサー相関パイプラインで使う pTAT の列は pipeline_roles（役割毎の dict のリスト）。pattern を省いた役割は roles の同名の正規表現を使う。
+# kind 毎の既定はファイル名順で最初のプロファイル。それ以外は build_column_catalog(..., profile=ファイル名) で指定する。
+# 役割の正規表現は1本の正規表現（役割毎の先読みグループ）にまとめてコンパイルし、列毎に1回の match で全部の役割を判定する。
+
+_PROFILE_DIR = Path(__file__).with_name("profiles")
+
+
+@lru_cache(maxsize=None)
+def load_profiles() -> dict:
+    # {ファイル名: PROFILE}（ファイル名順）
+    return {
+        module.name: importlib.import_module(f"viewer_modules.profiles.{module.name}").PROFILE
+        for module in sorted(pkgutil.iter_modules([str(_PROFILE_DIR)]), key=lambda module: module.name)
+    }
+
+
+def get_profile(profile_key: str) -> dict:
+    return load_profiles()[profile_key]
+
+
+@lru_cache(maxsize=None)
+def role_matcher(profile_key: str):
+    # (?:(?=(?P<r0>.*?(?:pattern0))))?(?:(?=(?P<r1>.*?(?:pattern1))))?...  一致した役割のグループだけ None 以外になる
+    roles = list(get_profile(profile_key)["roles"].items())
+    pattern = "".join(f"(?:(?=(?P<r{i}>.*?(?:{rule}))))?" for i, (_, rule) in enumerate(roles))
+    return re.compile(pattern, re.IGNORECASE | re.DOTALL), {f"r{i}": role for i, (role, _) in enumerate(roles)}
+
+
+def match_roles(profile_key: str, col: str) -> list:
+    matcher, names = role_matcher(profile_key)
+    return [names[group] for group, value in matcher.match(col).groupdict().items() if value is not None]
+
+
+def default_profile(kind: str) -> str:
+    for profile_key, profile in load_profiles().items():
+        if profile["kind"] == kind:
+            return profile_key
+    raise KeyError(f"No column profile for {kind}")
+
+
+def pipeline_profiles() -> dict:
+    # {ファイル名: PROFILE}（pipeline_roles を持つプロファイルだけ。ファイル名順）
+    return {profile_key: profile for profile_key, profile in load_profiles().items() if "pipeline_roles" in profile}
+
+
+@lru_cache(maxsize=None)
+def pipeline_role_patterns(profile_key: str) -> tuple:
+    # ((役割のdict, コンパイル済みの正規表現), ...)。正規表現の書き方・フラグは roles と同じ（大文字小文字・改行を無視して search）
+    profile = get_profile(profile_key)
+    return tuple(
+        (role, re.compile(role.get("pattern") or profile["roles"][role["role"]], re.IGNORECASE | re.DOTALL))
+        for role in profile["pipeline_roles"]
+    )
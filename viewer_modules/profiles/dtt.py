@@ -0,0 +1,42 @@
+# ===== DTT ログ（Intel Dynamic Tuning Technology） =====
+# roles: 役割名 -> 列名を探す正規表現（大文字小文字は無視。区別する部分は (?-i:...)）
+
+PROFILE = {
+    "kind": "DTT",
+    "label": "DTT",
+    "roles": {
+        "time": r"time",
+        "power": r"(?=.*(?-i:\(W\))).*power",
+        "mw": r"(?-i:\(mW\))",
+        "cpu_temp": r"(?-i:TCPU_D0_Temperature\(C\)|\ASEN\d+_D0_Temperature\(C\))",
+        "epp": r"epp",
+        "mode": r"os power slider",
+        "core_type": r"core type",
+        # 電力・Power limit の個別の列（前後の空白は無視）
+        "current_power_d0": r"\A\s*(?-i:TCPU_D0_Current Power\(W\))\s*\Z",
+        "current_power_d1": r"\A\s*(?-i:TCPU_D1_Current Power\(W\))\s*\Z",
+        "current_power_d2": r"\A\s*(?-i:TCPU_D2_Current Power\(W\))\s*\Z",
+        "pl1_limit": r"\A\s*(?-i:TCPU_PL1 Limit\(W\))\s*\Z",
+        "pl1_min": r"\A\s*(?-i:TCPU_PL1 Min Power Limit\(W\))\s*\Z",
+        "pl1_max": r"\A\s*(?-i:TCPU_PL1 Max Power Limit\(W\))\s*\Z",
+        "pl2_limit": r"\A\s*(?-i:TCPU_PL2 Limit\(W\))\s*\Z",
+    },
+    "units": {
+        "power": "W",
+        "mw": "mW",
+        "cpu_temp": "°C",
+    },
+    # デフォルトで表示する列: roles の各役割の最初の列 -> 足りない分を fill_role の列で limit 列まで補完
+    "default_plots": {
+        "power": {
+            "roles": ["current_power_d0", "pl1_limit", "pl1_min", "pl1_max", "pl2_limit"],
+            "fill_role": "power",
+            "limit": 5,
+        },
+        "powerlimit": {
+            "roles": ["current_power_d0", "current_power_d1", "current_power_d2",
+                      "pl1_limit", "pl1_min", "pl1_max", "pl2_limit"],
+        },
+    },
+    "tables": {},
+}
@@ -0,0 +1,61 @@
+# ===== pTAT ログ（Intel Power and Thermal Analysis Tool） =====
+# roles: 役割名 -> 列名を探す正規表現（大文字小文字は無視。区別する部分は (?-i:...)）
+# pipeline_roles: センサー相関パイプラインが読む列。name のある役割はその名前にそろえ、multiple=True は一致した列を全部使う
+
+PROFILE = {
+    "kind": "pTAT",
+    "label": "pTAT",
+    "roles": {
+        "time": r"time",
+        "power": r"power",
+        # パッケージ電力そのものの列だけ（"Package Power Limit" などは含めない）
+        "package_power": r"\A\s*(?:power-)?package power\s*\((?:watts|w)\)\s*\Z",
+        "ia_power": r"ia power",
+        "rest_of_package": r"rest of package",
+        "mmio_1": r"(?=.*mmio)(?=.*1).*watts",
+        "mmio_2": r"(?=.*mmio)(?=.*2).*watts",
+        "frequency": r"\ACPU\d+-Frequency\(MHz\)\Z",
+        # CPUx-DTS か cpu + temp(erature) の列（TCPU で始まる列は除く）
+        "cpu_temp": r"\A(?!(?-i:TCPU))(?:.*(?-i:CPU\d+-DTS)|(?=.*cpu).*temp)",
+        "ia_clip": r"ia clip reason",
+        "gt_clip": r"gt clip reason",
+        "phidget": r"(?=.*phidget).*degree",
+        "epp": r"(?=.*pcore)(?=.*performance).*preference",
+        "epp_mode": r"performance preference|oem18",
+        "mode": r"oem18",
+        "core_type": r"core type",
+    },
+    "units": {
+        "power": "W",
+        "frequency": "MHz",
+        "cpu_temp": "°C",
+    },
+    # デフォルトで表示する列: roles の各役割の最初の列 -> 足りない分を fill_role の列で limit 列まで補完
+    "default_plots": {
+        "power": {
+            "roles": ["package_power", "ia_power", "rest_of_package", "mmio_1", "mmio_2"],
+            "fill_role": "power",
+            "limit": 7,
+        },
+    },
+    "pipeline_roles": [
+        {"role": "time", "name": "Time", "pattern": r"\A\s*time\s*\Z", "required": True},
+        {"role": "ia_power", "name": "Power-IA Power(Watts)", "pattern": r"\A\s*power-ia power\(watts\)\s*\Z"},
+        {"role": "gt_power", "name": "Power-GT Power(Watts)", "pattern": r"\A\s*power-gt power\(watts\)\s*\Z"},
+        {"role": "package_power", "name": "Power-Package Power(Watts)", "required": True},
+        {"role": "sensor_temp", "pattern": r"\A\s*sen\d+-temp\(degree c\)\s*\Z", "multiple": True},
+        {"role": "tcpu_temp", "name": "TCPU-CPU-temp(Degree C)", "pattern": r"\A\s*tcpu-cpu-temp\(degree c\)\s*\Z"},
+    ],
+    "tables": {
+        "dytc_modes": {
+            "columns": ["Mode-oem18", "DYTC 8 (AMO) - AC", "DYTC 8 (AMO) - DC", "DYTC9 (OSD) - AC", "DYTC9 (OSD) - DC"],
+            "rows": [
+                ["Energy saver", 2, 2, 1, 1],
+                ["Best Power Efficiency", 3, 4, 2, 2],
+                ["Balanced", 5, 6, 3, 3],
+                ["Best Performance", 7, 8, 4, 4],
+                ["Cool mode", 9, 10, 5, 5],
+            ],
+        },
+    },
+}
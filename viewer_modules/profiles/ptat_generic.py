@@ -0,0 +1,21 @@
+# ===== pTAT ログ（列名が標準と違うエクスポート: …Package…Power / SENx・Skin などの temp） =====
+# viewer の役割・単位・表は標準の pTAT と同じ。パッケージ電力とパイプラインの列だけ緩い正規表現で探す
+
+from viewer_modules.profiles.ptat import PROFILE as _PTAT
+
+PROFILE = {
+    **_PTAT,
+    "label": "pTAT (generic column names)",
+    "roles": {
+        **_PTAT["roles"],
+        "package_power": r"package.*power",
+    },
+    "pipeline_roles": [
+        {"role": "time", "name": "Time", "pattern": r"\A\s*(?:time|timestamp)\s*\Z", "required": True},
+        {"role": "ia_power", "name": "Power-IA Power(Watts)", "pattern": r"\bia\b.*power"},
+        {"role": "gt_power", "name": "Power-GT Power(Watts)", "pattern": r"\bgt\b.*power"},
+        {"role": "package_power", "name": "Power-Package Power(Watts)", "required": True},
+        {"role": "sensor_temp", "multiple": True,
+         "pattern": r"\A\s*(?:sen\d+|sensor\s*\d*|skin|tskin\d*|thermistor\s*\d*)[\s_-]*temp(?:erature)?\b"},
+    ],
+}
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+# ===== 選択範囲の統計エンジン =====
+# 列毎に累積和・二乗累積和・台形積分の累積・min/max用スパーステーブルを1回だけ作り、
+# 任意のインデックス範囲の mean/min/max/std/energy を列あたり O(1) で返す。
+# テーブルは問い合わせのあった列だけ遅延生成してキャッシュする。
+# energy（W·s）は呼び出し側が渡した電力列（カタログの power 役割）だけ計算する。
+
+
+def _clock_seconds(text: str) -> float:
+    # "hh:mm:ss" -> 0時からの秒
+    hours, minutes, seconds = (int(part) for part in str(text).strip().split(":"))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def elapsed_seconds(time_vals):
+    # "hh:mm:ss" / datetime -> (先頭の時刻[秒], 先頭からの経過秒)  日付またぎ補正・欠損は線形補間
+    series = pd.Series(time_vals).reset_index(drop=True)
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series.astype(str), format="%H:%M:%S", errors="coerce")
+    seconds = (series.dt.hour * 3600 + series.dt.minute * 60 + series.dt.second).astype(float)
+    if seconds.isna().all():
+        return None, np.arange(len(series), dtype=float)
+    seconds = seconds.interpolate(limit_direction="both").to_numpy()
+
+    steps = np.diff(seconds)
+    steps[steps < -43200] += 86400  # 0時をまたいだ場合
+    steps[steps < 0] = 0
+    return seconds[0], np.concatenate([[0.0], np.cumsum(steps)])
+
+
+def build_range_stats(df: pd.DataFrame, time_vals=None) -> dict:
+    n = len(df)
+    clock_start, time_seconds = None, np.arange(n, dtype=float)
+    if time_vals is not None:
+        clock_start, time_seconds = elapsed_seconds(time_vals)
+    return {
+        "df": df,
+        "n": n,
+        "clock_start": clock_start,
+        "time_seconds": time_seconds,
+        "dt": np.diff(time_seconds),
+        "tables": {},
+    }
+
+
+def _sparse_table(values: np.ndarray, fill: float, op) -> list:
+    level = np.where(np.isnan(values), fill, values)
+    table = [level]
+    width = 1
+    while width * 2 <= len(values):
+        level = op(level[:-width], level[width:])
+        table.append(level)
+        width *= 2
+    return table
+
+
+def _column_tables(stats: dict, col: str) -> dict:
+    tables = stats["tables"].get(col)
+    if tables is not None:
+        return tables
+
+    values = pd.to_numeric(stats["df"][col], errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+
+    # 台形積分（どちらかの端点が欠損の区間は0扱い）
+    pair_valid = valid[:-1] & valid[1:]
+    trapezoid = np.where(pair_valid, (filled[:-1] + filled[1:]) / 2 * stats["dt"], 0.0)
+
+    tables = {
+        "count": np.concatenate([[0], np.cumsum(valid)]),
+        "sum": np.concatenate([[0.0], np.cumsum(filled)]),
+        "sumsq": np.concatenate([[0.0], np.cumsum(filled * filled)]),
+        "energy": np.concatenate([[0.0], np.cumsum(trapezoid)]),
+        "min": _sparse_table(values, np.inf, np.minimum),
+        "max": _sparse_table(values, -np.inf, np.maximum),
+    }
+    stats["tables"][col] = tables
+    return tables
+
+
+def _range_extreme(table: list, start: int, end: int) -> tuple:
+    level = (end - start + 1).bit_length() - 1
+    row = table[level]
+    return row[start], row[end - (1 << level) + 1]
+
+
+def index_range_for_time(stats: dict, start_seconds: float, end_seconds: float):
+    # 経過秒の範囲 -> インデックス範囲（両端含む）
+    time_seconds = stats["time_seconds"]
+    start = int(np.searchsorted(time_seconds, start_seconds, side="left"))
+    end = int(np.searchsorted(time_seconds, end_seconds, side="right")) - 1
+    return min(start, stats["n"] - 1), max(end, 0)
+
+
+def index_range_for_clock(stats: dict, start_text: str, end_text: str):
+    # "hh:mm:ss" の範囲 -> インデックス範囲（時刻列が無いファイルは None）
+    if stats["clock_start"] is None:
+        return None
+    start_seconds = (_clock_seconds(start_text) - stats["clock_start"]) % 86400
+    end_seconds = (_clock_seconds(end_text) - stats["clock_start"]) % 86400
+    return index_range_for_time(stats, start_seconds, end_seconds)
+
+
+def range_summary(stats: dict, columns, start: int, end: int, power_cols=()) -> pd.DataFrame:
+    # 範囲が空・df に無い列は行を作らない（空の DataFrame になることがある）
+    power_cols = set(power_cols)
+    start = max(int(start), 0)
+    end = min(int(end), stats["n"] - 1)
+    rows = []
+    for col in columns:
+        if start > end or col not in stats["df"].columns:
+            continue
+        tables = _column_tables(stats, col)
+        count = tables["count"][end + 1] - tables["count"][start]
+        total = tables["sum"][end + 1] - tables["sum"][start]
+        total_sq = tables["sumsq"][end + 1] - tables["sumsq"][start]
+
+        mean = total / count if count else np.nan
+        std = np.sqrt(max(total_sq - count * mean * mean, 0.0) / (count - 1)) if count > 1 else np.nan
+        low = min(_range_extreme(tables["min"], start, end))
+        high = max(_range_extreme(tables["max"], start, end))
+
+        rows.append({
+            "Column": col,
+            "Start": start,
+            "End": end,
+            "Duration (s)": stats["time_seconds"][end] - stats["time_seconds"][start],
+            "Samples": int(count),
+            "Mean": mean,
+            "Min": low if np.isfinite(low) else np.nan,
+            "Max": high if np.isfinite(high) else np.nan,
+            "Std": std,
+            "Energy (W·s)": tables["energy"][end] - tables["energy"][start] if col in power_cols else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+
+def named_range_table(stats: dict, named_ranges, columns, power_cols=()) -> pd.DataFrame:
+    # [{"name": "PL1 steady", "start": 100, "end": 900}, ...] を1つの表にまとめる
+    frames = []
+    for named in named_ranges:
+        summary = range_summary(stats, columns, named["start"], named["end"], power_cols)
+        summary.insert(0, "Range", named["name"])
+        frames.append(summary)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,94 @@
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# ===== ページ分割テーブル（大きなDataFrameを全部ブラウザへ送らない） =====
+# フィルタ・ソートはサーバー側で行ごとの位置配列として計算してキャッシュし、
+# 表示するのは現在のページの行だけ（st.dataframe に渡すのは最大 page_size 行）。
+
+PAGE_SIZES = [100, 500, 1000, 5000]
+ALL_COLUMNS = "(All columns)"
+_MAX_CACHED_VIEWS = 8
+
+_NUMERIC_QUERY_RE = re.compile(r"^\s*(<=|>=|<|>|==|=)\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def filter_mask(df: pd.DataFrame, column: str, query: str) -> np.ndarray:
+    # 数値列は ">25" / "<=3" / "=1" の比較、それ以外は大文字小文字を無視した部分一致
+    columns = list(df.columns) if column == ALL_COLUMNS else [column]
+    match = _NUMERIC_QUERY_RE.match(query)
+    mask = np.zeros(len(df), dtype=bool)
+    for col in columns:
+        values = df[col]
+        if match and pd.api.types.is_numeric_dtype(values):
+            op, number = match.group(1), float(match.group(2))
+            compare = {
+                "<": values.lt, "<=": values.le, ">": values.gt, ">=": values.ge, "=": values.eq, "==": values.eq,
+            }[op]
+            mask |= compare(number).to_numpy(dtype=bool, na_value=False)
+        else:
+            mask |= values.astype(str).str.contains(query, case=False, regex=False, na=False).to_numpy()
+    return mask
+
+
+def table_positions(df: pd.DataFrame, filter_column: str, query: str, sort_column, ascending: bool) -> np.ndarray:
+    positions = np.arange(len(df))
+    if query:
+        positions = positions[filter_mask(df, filter_column, query)]
+    if sort_column:
+        values = pd.Series(df[sort_column].to_numpy()[positions])
+        order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+def paged_table(df: pd.DataFrame, key: str, frame_id=None, page_size: int = 500):
+    # frame_id: 同じデータなら同じ値（ファイルID・ハッシュなど）。変わったら位置配列を作り直す
+    cache = st.session_state.setdefault(f"{key}_positions", {})
+    if cache.get("frame_id") != frame_id:
+        cache.clear()
+        cache["frame_id"] = frame_id
+
+    columns = [str(col) for col in df.columns]
+    ctrl_cols = st.columns([2, 3, 2, 1, 1])
+    with ctrl_cols[0]:
+        filter_column = st.selectbox("Filter column", [ALL_COLUMNS] + columns, key=f"{key}_filter_col")
+    with ctrl_cols[1]:
+        query = st.text_input("Filter (text, or >25 / <=3 for numbers)", value="", key=f"{key}_query").strip()
+    with ctrl_cols[2]:
+        sort_column = st.selectbox("Sort by", [""] + columns, key=f"{key}_sort_col")
+    with ctrl_cols[3]:
+        ascending = st.toggle("Ascending", value=True, key=f"{key}_ascending")
+    with ctrl_cols[4]:
+        page_size = st.selectbox(
+            "Rows/page", PAGE_SIZES, index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 1,
+            key=f"{key}_page_size")
+
+    view_key = ("view", filter_column, query, sort_column, ascending)
+    positions = cache.get(view_key)
+    if positions is None:
+        positions = table_positions(df, filter_column, query, sort_column or None, ascending)
+        cache[view_key] = positions
+        view_keys = [k for k in cache if k not in ("frame_id", "last_view")]
+        for old_key in view_keys[:-_MAX_CACHED_VIEWS]:
+            cache.pop(old_key)
+
+    total = len(positions)
+    page_count = max((total - 1) // page_size + 1, 1)
+    # 条件が変わったら先頭ページへ、ページ数が減ったら範囲内へ戻す
+    if cache.get("last_view") != (view_key, page_size):
+        cache["last_view"] = (view_key, page_size)
+        st.session_state[f"{key}_page"] = 1
+    elif st.session_state.get(f"{key}_page", 1) > page_count:
+        st.session_state[f"{key}_page"] = page_count
+    page = st.number_input(f"Page (1-{page_count})", min_value=1, max_value=page_count, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    window = df.iloc[positions[start:start + page_size]]
+
+    st.dataframe(window, use_container_width=True)
+    if total:
+        st.caption(f"Rows {start + 1:,}–{start + len(window):,} of {total:,}" + (f" (filtered from {len(df):,})" if total != len(df) else ""))
+    else:
+        st.caption(f"No rows match (of {len(df):,})")